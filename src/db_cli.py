@@ -0,0 +1,201 @@
+# File: db_cli.py
+"""
+jobs.db 离线工具（在项目根目录下运行，读取 config/config.yaml）
+
+用法:
+    python src/db_cli.py reanalyze                 # 使用当前 prompt 重新分析全部归档岗位
+    python src/db_cli.py reanalyze --job-id xxx --dry-run
+    python src/db_cli.py search "运维开发 Kubernetes" --limit 20
+    python src/db_cli.py export --incremental       # 只导出上次导出后变化的岗位
+    python src/db_cli.py export --format parquet    # 导出 Parquet 数据集（需要 pyarrow）
+    python src/db_cli.py maintain --retention-days 180  # 归档半年前的岗位并压缩数据库
+    python src/db_cli.py ai-usage                   # 最近一次运行的 AI token、耗时和费用
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+
+from utils.config_manager import ConfigManager
+from utils.db_utils import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+
+def open_database(config, group_commit=False):
+    database_config = config.database
+    return DatabaseManager(
+        database_config.filename,
+        journal_mode=database_config.journal_mode,
+        synchronous=database_config.synchronous,
+        cache_size_mb=database_config.cache_size_mb,
+        group_commit=group_commit,
+    )
+
+
+def cmd_reanalyze(args, config):
+    from utils.ai_analyzer import AiAnalyzer
+    from utils.ai_ledger import AiLedger, summarize_run, format_summary
+    from utils.payload_archive import reanalyze_archived
+    from utils.session_manager import SessionManager
+
+    db_manager = open_database(config)
+    ledger = AiLedger(db_manager)
+    analyzer = AiAnalyzer(ledger=ledger)
+
+    async def run():
+        try:
+            return await reanalyze_archived(db_manager, analyzer, args.job_id or None,
+                                            concurrency=args.concurrency, save=not args.dry_run)
+        finally:
+            await SessionManager.close()
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        db_manager.close()
+    matched = sum(1 for _, result, _ in results if result)
+    print(f"重新分析 {len(results)} 个岗位，匹配 {matched} 个" + ("（未写回数据库）" if args.dry_run else ""))
+    summary = summarize_run(config.database.filename, ledger.run_id, config.ai.token_prices)
+    if summary:
+        print(format_summary(summary))
+    if analyzer.resume_tokens_saved:
+        print(f"精简简历节省输入约 {analyzer.resume_tokens_saved} tokens")
+
+
+def cmd_search(args, config):
+    db_manager = open_database(config)
+    try:
+        start = time.perf_counter()
+        results = db_manager.search_jobs(args.query, limit=args.limit, raw=args.raw)
+        elapsed = (time.perf_counter() - start) * 1000
+    finally:
+        db_manager.close()
+    for row in results:
+        print(f"{-row['rank']:>8.3g}  {row['companyName']} | {row['jobName']} | {row['salaryDesc']} | "
+              f"{row['cityName']}  ({row['encryptJobId']})")
+        if row['snippet']:
+            print(f"          {' '.join(row['snippet'].split())}")
+    print(f"共 {len(results)} 条结果，耗时 {elapsed:.1f} ms")
+
+
+def cmd_export(args, config):
+    from utils.exporter import reset_watermark, export_parquet
+
+    # 确保数据库已迁移到最新版本
+    open_database(config).close()
+    export_dir = args.output or config.database.excel_path
+    if args.reset:
+        name = "parquet:job_details" if args.format == "parquet" else "xlsx"
+        conn = sqlite3.connect(config.database.filename)
+        with conn:
+            reset_watermark(conn, name)
+        conn.close()
+        print(f"已清除 {name} 导出水位")
+
+    if args.format == "parquet":
+        start = time.perf_counter()
+        exported = export_parquet(config.database.filename, export_dir, incremental=args.incremental)
+        summary = ", ".join(f"{table} {rows} 行" for table, rows in exported.items())
+        print(f"已导出 Parquet 到 {os.path.join(export_dir, 'parquet')}: {summary}，"
+              f"耗时 {time.perf_counter() - start:.1f}s")
+        return
+
+    from utils.general import export_to_xlsx
+    path = export_to_xlsx(config.database.filename, export_dir, incremental=args.incremental)
+    print(f"已导出到 {path}" if path else "没有新增或更新的岗位")
+
+
+def _format_size(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+def cmd_maintain(args, config):
+    from utils.db_maintenance import compact_database
+
+    db_path = config.database.filename
+    # 确保数据库已迁移到最新版本
+    open_database(config).close()
+    archive_path = args.archive or os.path.join(os.path.dirname(db_path) or ".", "jobs_archive.db")
+    report = compact_database(db_path, args.retention_days, archive_path,
+                              vacuum=not args.no_vacuum, dry_run=args.dry_run)
+    print(f"保留 {report['cutoff']} 之后更新过的岗位：归档 {report['archived_jobs']} 个，"
+          f"保留 {report['remaining_jobs']} 个")
+    if args.dry_run:
+        return
+    print(f"归档库: {archive_path}")
+    print(f"数据库大小: {_format_size(report['size_before'])} -> {_format_size(report['size_after'])}，"
+          f"回收 {_format_size(report['reclaimed'])}")
+    if "vacuum_seconds" in report:
+        print(f"VACUUM/ANALYZE 耗时 {report['vacuum_seconds']:.1f}s")
+    for name, before in report["timings_before"].items():
+        print(f"  {name}: {before:.1f} ms -> {report['timings_after'][name]:.1f} ms")
+
+
+def cmd_ai_usage(args, config):
+    from utils.ai_ledger import summarize_run, format_summary
+
+    # 确保数据库已迁移到最新版本
+    open_database(config).close()
+    if args.list:
+        conn = sqlite3.connect(config.database.filename)
+        try:
+            rows = conn.execute("""
+                SELECT run_id, MIN(created_at), COUNT(*), SUM(prompt_tokens), SUM(completion_tokens)
+                FROM ai_calls GROUP BY run_id ORDER BY MIN(id) DESC LIMIT ?
+            """, (args.list,)).fetchall()
+        finally:
+            conn.close()
+        for run_id, start, calls, prompt, completion in rows:
+            print(f"{run_id}  {start[:19]}  请求 {calls}，输入 {prompt or 0} / 输出 {completion or 0} tokens")
+        return
+    summary = summarize_run(config.database.filename, args.run, config.ai.token_prices)
+    print(format_summary(summary) if summary else "没有AI请求记录")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="jobs.db 离线工具")
+    parser.add_argument("--config", default="config/config.yaml")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reanalyze_parser = subparsers.add_parser("reanalyze", help="基于归档的原始数据重新进行 AI 分析")
+    reanalyze_parser.add_argument("--job-id", action="append", help="指定 encryptJobId，可重复")
+    reanalyze_parser.add_argument("--concurrency", type=int, default=4)
+    reanalyze_parser.add_argument("--dry-run", action="store_true", help="只输出结果，不写回数据库")
+    reanalyze_parser.set_defaults(func=cmd_reanalyze)
+
+    search_parser = subparsers.add_parser("search", help="全文检索岗位名称/公司/职位描述/AI分析")
+    search_parser.add_argument("query", help="空格分隔的检索词，同时匹配")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--raw", action="store_true", help="直接使用 FTS5 查询语法，如 'Python OR Golang'")
+    search_parser.set_defaults(func=cmd_search)
+
+    export_parser = subparsers.add_parser("export", help="导出 xlsx / Parquet")
+    export_parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx")
+    export_parser.add_argument("--incremental", action="store_true", help="只导出上次导出后新增或更新的岗位")
+    export_parser.add_argument("--reset", action="store_true", help="清除增量导出水位")
+    export_parser.add_argument("--output", help="导出目录，默认 database.excel_path")
+    export_parser.set_defaults(func=cmd_export)
+
+    maintain_parser = subparsers.add_parser("maintain", help="归档过期岗位并执行 VACUUM/ANALYZE（请在主程序未运行时执行）")
+    maintain_parser.add_argument("--retention-days", type=int, default=180, help="保留最近多少天内更新过的岗位")
+    maintain_parser.add_argument("--archive", help="归档库路径，默认与数据库同目录的 jobs_archive.db")
+    maintain_parser.add_argument("--no-vacuum", action="store_true", help="只归档，不执行 VACUUM")
+    maintain_parser.add_argument("--dry-run", action="store_true", help="只统计将要归档的岗位数量")
+    maintain_parser.set_defaults(func=cmd_maintain)
+
+    usage_parser = subparsers.add_parser("ai-usage", help="AI 请求的 token、耗时和费用汇总")
+    usage_parser.add_argument("--run", help="运行编号，默认最近一次运行")
+    usage_parser.add_argument("--list", type=int, metavar="N", help="列出最近 N 次运行")
+    usage_parser.set_defaults(func=cmd_ai_usage)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    ConfigManager.load_config(args.config)
+    args.func(args, ConfigManager.get_config())
+
+
+if __name__ == '__main__':
+    main()
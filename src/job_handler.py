@@ -5,9 +5,17 @@ import asyncio
 from utils.general import *
 from ws_client.ws_client import WsClient
 import queue
+from datetime import timedelta
 from utils.config_manager import ConfigManager
-from utils.ai_analyzer import AiAnalyzer
+from utils.ai_analyzer import AiAnalyzer, AiAnalysisError
+from utils.ai_ledger import AiLedger
+from utils.circuit_breaker import CircuitOpenError
 from utils.db_utils import DatabaseManager
+from utils.async_db import AsyncDatabaseManager
+from utils.payload_archive import build_job_requirements
+from utils.near_dup import minhash, PendingVerdicts
+from utils.job_priority import JobScorer, PriorityGate
+from utils.zhipin_client import ZhipinClient, ZhipinError, ZhipinRequestError
 
 class JobHandler(threading.Thread):
     def __init__(self, job_queue: queue.Queue, ws_queue: queue.Queue, done_event, running_event, ):
@@ -19,23 +27,48 @@ class JobHandler(threading.Thread):
         self.loop = None
 
         config = ConfigManager.get_config()
-        self.ai_analyzer = AiAnalyzer()
         crawler_config = config.crawler
-        self.rate_limit = TokenBucket(rate=crawler_config.rate_limit["rate"], capacity=crawler_config.rate_limit["capacity"])
-        self.db_manager = DatabaseManager(config.database.filename)
+        # 获取详情和投递共用 crawler.rate_limit 限速
+        self.zhipin = ZhipinClient.get_instance()
+        database_config = config.database
+        self.db_manager = DatabaseManager(
+            database_config.filename,
+            journal_mode=database_config.journal_mode,
+            synchronous=database_config.synchronous,
+            cache_size_mb=database_config.cache_size_mb,
+            commit_interval=database_config.commit_interval,
+            archive_payloads=database_config.archive_payloads,
+        )
+        self.async_db = AsyncDatabaseManager(self.db_manager)
+        self.ai_ledger = AiLedger(self.db_manager)
+        self.ai_analyzer = AiAnalyzer(ledger=self.ai_ledger)
         self.inactive_keywords = config.job_check.inactive_status
         self.resume_image_enabled = config.application.send_resume_image
         self.min_salary, self.max_salary = config.job_check.salary_range
         self.check_visited = config.job_check.check_visited
+        self.detail_cache_ttl = timedelta(hours=crawler_config.detail_cache_ttl_hours)
         self.test_mode = config.job_check.test_mode
+        self.near_dup = config.job_check.near_dup
+        self.near_dup_threshold = config.job_check.near_dup_threshold
+        self.near_dup_same_company = config.job_check.near_dup_same_company
+        self.pending_verdicts = PendingVerdicts(self.near_dup_threshold)
+        self.priority = config.job_check.priority
+        self.scorer = JobScorer(self.priority, config.job_check.salary_range)
+        self.priority_gate = PriorityGate(self.priority.workers)
+        self.deferred_jobs = {}  # 推迟到当前搜索条件结束后处理的低分岗位
+        self.max_applications = config.application.max_applications
+        self.applied_count = 0  # 本次运行投递成功的岗位数
+        self.applying = 0  # 已预留投递名额（正在分析或投递）的岗位数
         self.cookies= {}
         self.headers = {}
+        self.account_id = None  # 当前登录账号，按账号记录访问情况
 
-    async def _original_process_single_job(self, job_data):
+    async def _original_process_single_job(self, job_data, cached_card=None):
         result = {
             'job_id': None,
             'job_data': None,
             'analysis_result': None,
+            'analysis_source': None,
             'applied_result': None,
             'analysis_think': None
         }
@@ -43,11 +76,19 @@ class JobHandler(threading.Thread):
         link = job_data['job_link']
         job_id, lid, security_id = parse_params(link)
         result['job_id'] = job_id
+        if self.max_applications and self.applied_count + self.applying >= self.max_applications:
+            # 已投递和已预留的名额达到投递上限，不再获取详情，下次运行时处理
+            return None
+        reserved = False
         # 实际的请求处理逻辑
         try:
-            # 获取职位详细信息（限速）
-            await self.rate_limit.get_token()  # 限速调用
-            job_detail = await get_job_info(security_id, lid)
+            if cached_card is not None:
+                # 岗位未变化且详情未过期，不再请求 card.json
+                job_detail = {'code': 0, 'zpData': {'jobCard': cached_card}}
+                result['from_cache'] = True
+            else:
+                # 获取职位详细信息（限速）
+                job_detail = await self.zhipin.get_job_info(security_id, lid)
             result['job_data'] = job_detail
             # 检查HR活跃状态
             active_status = job_detail['zpData']['jobCard'].get('activeTimeDesc', '')
@@ -59,16 +100,53 @@ class JobHandler(threading.Thread):
 
             # 构建岗位要求
             card = job_detail['zpData']['jobCard']
-            job_requirements = (
-                f"公司名称：{card['brandName']}\n"
-                f"职位名称：{card['jobName']}\n"
-                f"岗位职责：{card['postDescription']}\n"
-                f"经验要求：{card['experienceName']}\n"
-                f"学历要求：{card['degreeName']}"
-            )
+            job_requirements = build_job_requirements(card)
+
+            if self.max_applications:
+                if self.applied_count + self.applying >= self.max_applications:
+                    # 不分析、不记录访问，下次运行时重新处理
+                    result['parked'] = True
+                    logger.info(f"job {job_data['job_name']}: 已达到本次运行的投递上限 {self.max_applications}，暂缓分析")
+                    return result
+                # 分析前预留投递名额，不会为达到上限后无法投递的岗位调用 AI；处理结束时释放
+                self.applying += 1
+                reserved = True
 
-            # 不限速调用
-            ai_result, ai_think = await self.ai_analyzer.ai_hr_check(job_requirements)
+            # 相似岗位复用分析结果
+            reused, pending = None, None
+            if self.near_dup != "off":
+                reused, pending = await self._near_duplicate_verdict(job_id, card, job_data['job_name'])
+
+            combined = None
+            greeting_message = None
+            try:
+                if reused is not None:
+                    ai_result, ai_think = reused
+                    result['analysis_source'] = 'near_dup'
+                else:
+                    # 不限速调用
+                    if self.ai_analyzer.combined_greeting:
+                        combined = await self.ai_analyzer.ai_check_and_greet(job_requirements, job_id)
+                    if combined is not None:
+                        ai_result, ai_think, greeting_message = combined
+                    else:
+                        ai_result, ai_think = await self.ai_analyzer.ai_hr_check(job_requirements, job_id)
+                    result['analysis_source'] = 'ai'
+                    if pending is not None:
+                        self.pending_verdicts.done(*pending, (ai_result, ai_think))
+            except (CircuitOpenError, AiAnalysisError) as e:
+                fallback = self.ai_analyzer.fallback_check(job_requirements)
+                if fallback is None:
+                    # 不记录分析结果，也不标记为已访问，下次运行时重新处理
+                    result['parked'] = True
+                    logger.info(f"job {job_data['job_name']}: {e}，暂缓分析")
+                    return result
+                ai_result, ai_think = fallback
+                result['analysis_source'] = 'rules'
+            finally:
+                if pending is not None:
+                    # 没有得到分析结果时（熔断、异常、取消），等待中的相似岗位各自分析
+                    self.pending_verdicts.done(*pending, None)
             result['analysis_result'] = ai_result
             if ai_think:
                 result['analysis_think'] = ai_think
@@ -76,16 +154,24 @@ class JobHandler(threading.Thread):
 
 
             if ai_result:
-                # 判断是否启用 AI 打招呼语
-                greeting_message = None
-                if self.ai_analyzer.greeting_enable_ai:
+                # 判断是否启用 AI 打招呼语（合并模式下已经生成）
+                if self.ai_analyzer.greeting_enable_ai and combined is None:
                     # 调用 ai_greeting 方法获取打招呼语
-                    greeting_message = await self.ai_analyzer.ai_greeting(job_requirements)
+                    greeting_message = await self.ai_analyzer.ai_greeting(job_requirements, job_id)
+                if self.ai_analyzer.greeting_enable_ai:
                     logger.info(f"job {job_data['job_name']}: 打招呼语： {greeting_message}")
 
-                # 限速调用
-                await self.rate_limit.get_token()  # 限速调用
-                apply_result = await start_chat(security_id, job_id, lid)
+                try:
+                    # 限速调用
+                    apply_result = await self.zhipin.start_chat(security_id, job_id, lid)
+                except (ZhipinError, ZhipinRequestError) as e:
+                    result['applied_result'] = {'code': -1, 'message': str(e)}
+                    raise
+                result['applied_result'] = apply_result
+                if apply_result.get('code') == 0:
+                    self.applied_count += 1
+                    if self.applied_count == self.max_applications:
+                        logger.info(f"已投递 {self.applied_count} 个岗位，达到本次运行的投递上限")
 
                 if greeting_message:
                     # 将打招呼语作为文本消息发送到 ws_client
@@ -100,6 +186,9 @@ class JobHandler(threading.Thread):
 
             return result
 
+        except (ZhipinError, ZhipinRequestError) as e:
+            logger.error(f"job {job_data['job_name']}, {job_id}: {e}")
+            return result
         except Exception as e:
             logger.error(
                 f"Error processing job {job_data['job_name']}, {job_id}:\n"
@@ -107,11 +196,42 @@ class JobHandler(threading.Thread):
                 f"Traceback: {traceback.format_exc()}"
             )
             return result
+        finally:
+            if reserved:
+                self.applying -= 1
+
+    async def _near_duplicate_verdict(self, job_id, card, job_name):
+        """
+        查找已分析过（或本批次正在分析）的相似岗位
+        :return: (可复用的 (分析结果, 思考过程) 或 None, 需要由本岗位发布分析结果的 (公司, Future) 或 None)
+        """
+        signature = minhash(card.get('postDescription'))
+        if signature is None:
+            return None, None
+        company = (card.get('brandName') or "") if self.near_dup_same_company else ""
+        similar = await self.async_db.find_near_duplicate(
+            job_id, signature, self.near_dup_threshold, company or None)
+        if similar is None:
+            leader = self.pending_verdicts.find(company, signature)
+            if leader is None:
+                return None, (company, self.pending_verdicts.add(company, signature, job_id))
+            leader_id, score, future = leader
+            verdict = await future
+            if verdict is None:
+                return None, None
+            similar = {'encryptJobId': leader_id, 'jobName': None, 'analysisResult': verdict[0],
+                       'analysis_think': verdict[1], 'similarity': score}
+        if similar['analysisResult'] and self.near_dup != "reuse":
+            return None, None
+        logger.info(f"job {job_name}: 与 {similar['jobName'] or similar['encryptJobId']} 相似度 {similar['similarity']:.2f}，"
+                    f"复用分析结果 {similar['analysisResult']}")
+        think = f"[相似岗位 {similar['encryptJobId']}，相似度 {similar['similarity']:.2f}] {similar['analysis_think'] or ''}"
+        return (similar['analysisResult'], think.strip()), None
 
-    async def _process_single_job(self, job_data):
+    async def _process_single_job(self, job_data, cached_card=None):
         try:
             return await asyncio.wait_for(
-                self._original_process_single_job(job_data),
+                self._original_process_single_job(job_data, cached_card),
                 timeout=240.0  # 每个任务单独超时
             )
         except asyncio.TimeoutError:
@@ -123,10 +243,82 @@ class JobHandler(threading.Thread):
             #raise
             return None
 
-    async def _process_batch(self, jobs_batch):
-        tasks = [self._process_single_job(job) for job in jobs_batch]
+    async def _process_prioritized(self, job_data, score, cached_card=None):
+        await self.priority_gate.acquire(score)
+        try:
+            return await self._process_single_job(job_data, cached_card)
+        finally:
+            self.priority_gate.release()
+
+    async def _process_batch(self, jobs_batch, cached_cards=None):
+        cached_cards = cached_cards or {}
+        if not self.priority.enabled:
+            tasks = [self._process_single_job(job, cached_cards.get(parse_params(job['job_link'])[0]))
+                     for job in jobs_batch]
+            return await asyncio.gather(*tasks)
+        # 按分数从高到低创建任务，同时处理的岗位数由 priority_gate 限制，详情、分析和投递都是高分岗位优先
+        ranked = self.scorer.rank(jobs_batch)
+        logger.info(f"按优先级处理 {len(ranked)} 个岗位，分数 {ranked[0][0]} ~ {ranked[-1][0]}")
+        tasks = [self._process_prioritized(job, score, cached_cards.get(parse_params(job['job_link'])[0]))
+                 for score, job in ranked]
         return await asyncio.gather(*tasks)
 
+    def _defer_low_priority(self, jobs):
+        """低于 defer_below 的岗位放入 deferred_jobs，返回其余岗位"""
+        kept = []
+        for job in jobs:
+            if self.scorer.score(job) < self.priority.defer_below:
+                self.deferred_jobs[parse_params(job['job_link'])[0]] = job
+            else:
+                kept.append(job)
+        if len(kept) < len(jobs):
+            logger.info(f"{len(jobs) - len(kept)} 个岗位分数低于 {self.priority.defer_below}，推迟处理"
+                        f"（共 {len(self.deferred_jobs)} 个）")
+        return kept
+
+    async def _handle_batch(self, jobs_batch, defer=True):
+        """处理一批岗位，数据库操作在线程池/写入线程中执行，不阻塞事件循环"""
+        # 满足薪资要求的岗位
+        filter_salary_jobs = filter_jobs_by_salary(jobs_batch, self.min_salary, self.max_salary)
+
+        filtered_jobs = filter_salary_jobs
+        if self.check_visited:
+            # 未被访问过的岗位
+            filtered_jobs = await self.async_db.filter_visited(filter_salary_jobs, self.account_id)
+        if defer and self.priority.enabled and self.priority.defer_below is not None:
+            filtered_jobs = self._defer_low_priority(filtered_jobs)
+
+        results = []
+        if filtered_jobs:
+            # 最近获取过且列表信息未变化的岗位直接使用归档的详情
+            cached_cards = await self.async_db.get_fresh_cards(filtered_jobs, self.detail_cache_ttl)
+            if cached_cards:
+                logger.info(f"{len(cached_cards)}/{len(filtered_jobs)} 个岗位使用缓存的详情")
+            try:
+                results = await asyncio.wait_for(
+                    self._process_batch(filtered_jobs, cached_cards),
+                    timeout=900  # 单位：秒
+                )
+                logger.info(f"Processed batch with {len(results)} jobs")
+                results = [result for result in results if result is not None]
+            except asyncio.TimeoutError:
+                logger.info("Batch processing timed out after 900 seconds")
+                results = []
+        try:
+            # 等待提交，保证下一批的访问检查能看到本批数据
+            await self.async_db.save_jobs_details(jobs_batch, results, self.account_id)
+        except Exception as e:
+            logger.error(f"保存岗位数据失败: {e}")
+
+    async def _flush_deferred(self):
+        """处理推迟的低分岗位"""
+        if not self.deferred_jobs:
+            return
+        deferred_jobs = list(self.deferred_jobs.values())
+        self.deferred_jobs.clear()
+        logger.info(f"处理推迟的 {len(deferred_jobs)} 个岗位")
+        await self._handle_batch(deferred_jobs, defer=False)
+
     def run(self):
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
@@ -141,28 +333,16 @@ class JobHandler(threading.Thread):
             if batch[0]=="tasks":
                 self.done_event.clear()
                 _, jobs_batch = batch
-                # 满足薪资要求的岗位
-                filter_salary_jobs = filter_jobs_by_salary(jobs_batch, self.min_salary, self.max_salary)
-                
-                filtered_jobs = filter_salary_jobs
-                if self.check_visited:
-                    # 未被访问过的岗位
-                    filtered_jobs = self.db_manager.filter_visited(filter_salary_jobs)
-                
-                results = []
-                if filtered_jobs:
-                    try:
-                        results = self.loop.run_until_complete(
-                            asyncio.wait_for(
-                                self._process_batch(filtered_jobs),
-                                timeout=900  # 单位：秒
-                            )
-                        )
-                        logger.info(f"Processed batch with {len(results)} jobs")
-                        results = [result for result in results if result is not None]
-                    except asyncio.TimeoutError:
-                        logger.info("Batch processing timed out after 600 seconds")
-                        results = []
-                self.db_manager.save_jobs_details(jobs_batch, results)
+                self.loop.run_until_complete(self._handle_batch(jobs_batch))
+                self.done_event.set()
+                self.job_queue.task_done()
+            elif batch[0]=="flush":
+                # 当前搜索条件的页面处理完毕，处理推迟的低分岗位
+                self.done_event.clear()
+                self.loop.run_until_complete(self._flush_deferred())
                 self.done_event.set()
                 self.job_queue.task_done()
+            elif batch[0]=="account":
+                # 切换账号
+                _, self.account_id = batch
+                self.job_queue.task_done()
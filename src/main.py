@@ -50,9 +50,12 @@ from queue import Queue
 import threading
 from utils.general import *
 from utils.db_utils import DatabaseManager
+from utils.exporter import export_parquet
+from utils.ai_ledger import summarize_run, format_summary
 from job_handler import JobHandler
 from ws_client.ws_client import WsClient
-from utils.session_manager import SessionManager
+from utils.cookie_sync import CookieSync
+from utils.zhipin_client import close_sync
 import asyncio
 import concurrent.futures
 import signal
@@ -64,6 +67,8 @@ async def start_loop(loop):
     loop.run_forever()
 
 stop_flag = asyncio.Event()
+# 打开搜索页面时出现验证页面的重试次数（每次等待风控暂停结束，可以在浏览器中完成验证）
+PAGE_VERIFY_RETRIES = 3
 
 def signal_handler(sig, frame):
     logging.info(f"接收到信号 {sig}, 设置停止标志")
@@ -135,8 +140,14 @@ async def main(config):
     jobhandler.start()
     ws_client.start()
 
+    cookie_sync = CookieSync()
+    # 风控检测与全局限速，与获取详情、投递等接口共用
+    throttle = jobhandler.zhipin.throttle
     for account in config.accounts:
         manager = await login(page, account, loop)
+        # 读取登录后的全部 cookies，之后只同步变化
+        await cookie_sync.attach(page)
+        job_queue.put(["account", account.username])
         try:
             url_list = build_search_url(config.job_search)
             i = 1
@@ -191,7 +202,9 @@ async def main(config):
                                         'job_link': job_link,
                                         'company_name': item.get('brandName'),
                                         # company_tags 需要从 jobLabels 或 skills 映射，这里简化处理
-                                        'company_tags': item.get('jobLabels', []) + item.get('skills', [])
+                                        'company_tags': item.get('jobLabels', []) + item.get('skills', []),
+                                        # 原始条目，保存时归档到 job_payloads
+                                        'raw': item
                                     }
                                     processed_jobs.append(processed_job)
 
@@ -201,10 +214,15 @@ async def main(config):
                                 has_more_data = has_more
                             else:
                                 logger.error(f"接口响应错误: code={data.get('code')}, message={data.get('message')}")
+                                if throttle is not None:
+                                    throttle.observe(response.status, data, response.url, "joblist")
                                 # 可以选择在这里停止，或者标记为没有更多数据
                                 has_more_data = False
                         except json.JSONDecodeError:
                             logger.error(f"无法解析JSON响应: {response.url}")
+                            if throttle is not None:
+                                # 验证页面等不是 JSON 的响应
+                                throttle.observe(response.status, await response.text(), response.url, "joblist")
                             has_more_data = False
                         except Exception as e:
                             logger.error(f"处理响应时出错 {response.url}: {e}")
@@ -216,7 +234,19 @@ async def main(config):
 
                 # --- 导航到页面 ---
                 try:
-                    await page.goto(url, wait_until='domcontentloaded', timeout=config.crawler.page_load_timeout * 1000)
+                    for attempt in range(1, PAGE_VERIFY_RETRIES + 1):
+                        if throttle is not None:
+                            await throttle.wait()
+                        await page.goto(url, wait_until='domcontentloaded', timeout=config.crawler.page_load_timeout * 1000)
+                        # 被重定向到验证页面：等待暂停结束后重新打开
+                        if throttle is None or not throttle.observe(200, None, page.url, "page"):
+                            break
+                        has_more_data = True
+                        logger.warning(f"第{attempt}次打开页面时出现验证页面，暂停结束后重试: {url}")
+                    else:
+                        logger.error(f"多次出现验证页面，跳过这个URL: {url}")
+                        page.remove_listener("response", handle_response)
+                        continue
                 except TimeoutError:
                     logger.error(f"页面加载超时: {url}")
                     page.remove_listener("response", handle_response) # 移除监听器
@@ -232,10 +262,7 @@ async def main(config):
                     # 处理当前已获取的数据
                     if api_jobs_data:
                         logger.info(f"处理 {len(api_jobs_data)} 个已获取的岗位...")
-                        # 更新会话信息 (cookies, headers)
-                        cookies = {cookie['name']: cookie['value'] for cookie in await page.context.cookies()}
-                        headers = {'User-Agent': await page.evaluate("() => navigator.userAgent")}
-                        SessionManager.update_session(cookies, headers)
+                        # 会话信息 (cookies, headers) 由 cookie_sync 在浏览器中变化时同步
 
                         # 将数据放入处理队列
                         job_queue.put(["tasks", list(api_jobs_data)]) # 发送副本
@@ -246,12 +273,17 @@ async def main(config):
                         if stop_flag.is_set():
                             logging.info("接收到停止信号，程序将在30s内退出")
                             ws_done.wait(30)
+                            jobhandler.async_db.close()
+                            jobhandler.db_manager.close() # 提交排队中的数据库写操作
+                            close_sync() # 关闭 ws_client 同步调用使用的后台事件循环
                             page.remove_listener("response", handle_response) # 移除监听器
                             await page.context.close()
                             sys.exit(0)
 
                     # 如果 API 显示还有更多数据，则滚动页面
                     if has_more_data:
+                        if throttle is not None:
+                            await throttle.wait()
                         logger.info("滚动页面以加载更多数据...")
                         await page.mouse.wheel(0, 1000)
                         await page.wait_for_timeout(5000)
@@ -263,13 +295,14 @@ async def main(config):
                 # --- 处理最后一批数据（如果滚动后还有剩余） ---
                 if api_jobs_data:
                     logger.info(f"处理最后一批 {len(api_jobs_data)} 个岗位...")
-                    cookies = {cookie['name']: cookie['value'] for cookie in await page.context.cookies()}
-                    headers = {'User-Agent': await page.evaluate("() => navigator.userAgent")}
-                    SessionManager.update_session(cookies, headers)
                     job_queue.put(["tasks", list(api_jobs_data)])
                     api_jobs_data.clear()
                     job_queue.join()
 
+                # --- 处理推迟的低分岗位 ---
+                job_queue.put(["flush"])
+                job_queue.join()
+
                 # --- 移除监听器 ---
                 page.remove_listener("response", handle_response)
                 logger.info(f"完成处理URL: {url}")
@@ -287,8 +320,21 @@ async def main(config):
                 await page.context.close()
 
     running_event.clear()
+    jobhandler.async_db.close()
+    jobhandler.db_manager.close() # 导出前确保所有写操作已提交
+    close_sync() # 关闭 ws_client 同步调用使用的后台事件循环
+    ai_summary = summarize_run(config.database.filename, jobhandler.ai_ledger.run_id, config.ai.token_prices)
+    if ai_summary:
+        logger.info(format_summary(ai_summary))
+    if jobhandler.ai_analyzer.resume_tokens_saved:
+        logger.info(f"精简简历本次运行节省输入约 {jobhandler.ai_analyzer.resume_tokens_saved} tokens")
+    if jobhandler.zhipin.histograms:
+        logger.info(jobhandler.zhipin.format_stats())
     if config.database.export_excel:
-        export_to_xlsx(config.database.filename, config.database.excel_path)
+        export_to_xlsx(config.database.filename, config.database.excel_path,
+                       incremental=config.database.export_incremental)
+    if config.database.export_parquet:
+        export_parquet(config.database.filename, config.database.excel_path, incremental=True)
     sys.exit(0)
 
 if __name__=='__main__':
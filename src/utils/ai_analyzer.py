@@ -1,35 +1,72 @@
 import logging
 import os
 import asyncio
+import json
 import re
+import time
 
 import aiohttp
 
+from .ai_router import AiEndpoint, AiRouter
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 from .config_manager import ConfigManager
-from .session_manager import SessionManager
+from .llm_cache import LlmCache, LlmCacheMiss
+from . import resume_profile
 
 logger = logging.getLogger(__name__)
 
+# 合并模式下要求模型输出的格式，覆盖 prompt 中"只返回 true 或 false"的要求
+COMBINED_FORMAT_PROMPT = (
+    '请先按上述规则判断岗位是否合适；如果合适，再按以下要求生成打招呼语：\n{greeting_prompt}\n\n'
+    '只输出一个 JSON 对象，不要输出其他内容：{{"match": true 或 false, "greeting": "打招呼语，不合适时为空字符串"}}'
+)
+
+
+class AiAnalysisError(Exception):
+    """重试后仍然没有得到分析结果，不能当作"不匹配"保存"""
+
 
 class AiAnalyzer:
-    def __init__(self):
+    def __init__(self, ledger=None):
+        """
+        :param ledger: AiLedger 实例，传入时记录每次请求的 token、耗时和结果
+        """
         config_ai = ConfigManager.get_config().ai
-        self.api_url = config_ai.api_url
-        self.api_key = config_ai.api_key
-        self.model = config_ai.model
+        self.ledger = ledger
         self.temperature = config_ai.temperature
         self.job_requirements_prompt=config_ai.job_requirements_prompt
-        self.provider = config_ai.provider
         self.resume_file_name = config_ai.resume_for_ai_file
         self.resume_for_ai = self._load_user_requirements()
+        # 精简简历，首次请求时生成
+        self.resume_profile_mode = config_ai.resume_profile
+        self.resume_profile_dir = config_ai.resume_profile_dir
+        self._resume_profile = None
+        self._resume_lock = asyncio.Lock()
+        self._saved_per_call = 0
+        self.resume_tokens_saved = 0  # 实际发送的请求累计节省的输入 token（估算，不含缓存命中）
         self.ai_prompt = config_ai.prompt
-        self.headers = self._get_provider_handlers()
+        self.router = AiRouter(
+            self._build_endpoints(config_ai),
+            hedge_after=config_ai.hedge_after,
+            stats_file=config_ai.stats_file,
+        )
+        # 模型服务连续失败时熔断，熔断期间按 fallback 暂缓分析或使用规则判断
+        self.breaker = CircuitBreaker("AI服务", config_ai.breaker_failures, config_ai.breaker_reset)
+        self.fallback = config_ai.fallback
+        self.fallback_rules = config_ai.fallback_rules
+        # 请求录制/回放
+        self.cache = None
+        if config_ai.cache_mode != "off":
+            self.cache = LlmCache(config_ai.cache_file, config_ai.cache_mode, config_ai.cache_replay_latency)
+            logger.info(f"AI请求缓存: {config_ai.cache_mode} ({config_ai.cache_file})")
 
         # 读取打招呼模板和是否启用 AI 打招呼语
         config = ConfigManager.get_config()
         greeting_config = config.application.greeting
         self.greeting_enable_ai = greeting_config.enable_ai
         self.greeting_prompt = greeting_config.greeting_prompt
+        # 一次请求同时完成匹配判断和打招呼语生成
+        self.combined_greeting = config_ai.combined_greeting and self.greeting_enable_ai
 
     def _load_user_requirements(self):
         """从文件加载用户简历"""
@@ -40,72 +77,186 @@ class AiAnalyzer:
             logger.warning(f"未找到用于ai分析的简历文件 {self.resume_file_name}")
             return ""
 
-    def _get_provider_handlers(self):
-        """处理不同提供商的请求差异"""
-        if self.provider == "azure":
-            headers = {
-                "api-key": f"{self.api_key}",
-                "Content-Type": "application/json"
-            }
-            return headers
-        elif self.provider == "openai":
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            return headers
-        else:
-            raise ValueError(f"不支持的AI提供商: {self.provider}")
-
-    async def ai_greeting(self, job_detail):
+    @staticmethod
+    def _build_endpoints(config_ai):
+        """ai.endpoints 为空时使用 ai 下的单个端点配置"""
+        if config_ai.endpoints:
+            return [
+                AiEndpoint(endpoint.name or f"{endpoint.provider}-{i}", endpoint.provider, endpoint.api_url,
+                           endpoint.api_key, endpoint.model, endpoint.max_concurrency, endpoint.temperature)
+                for i, endpoint in enumerate(config_ai.endpoints)
+            ]
+        return [AiEndpoint("default", config_ai.provider, config_ai.api_url, config_ai.api_key, config_ai.model,
+                           config_ai.max_concurrency)]
+
+    async def _resume(self):
+        """请求中使用的简历：未启用精简时为原文"""
+        if self.resume_profile_mode == "off":
+            return self.resume_for_ai
+        if self._resume_profile is None:
+            async with self._resume_lock:
+                if self._resume_profile is None:
+                    profile = await resume_profile.load_or_build(
+                        self.resume_for_ai, self.resume_profile_mode, self.resume_profile_dir,
+                        lambda messages: self._chat(messages, "resume_profile"))
+                    original_tokens = resume_profile.estimate_tokens(self.resume_for_ai)
+                    self._saved_per_call = original_tokens - resume_profile.estimate_tokens(profile)
+                    logger.info(f"使用精简简历：约 {original_tokens} → {original_tokens - self._saved_per_call} tokens，"
+                                f"每次请求节省约 {self._saved_per_call} tokens")
+                    self._resume_profile = profile
+        return self._resume_profile
+
+    async def _chat(self, messages, call_type, job_id=None, attempt=1):
+        """
+        通过路由发送请求，返回模型输出的原始文本
+        :param call_type: 请求类型，记录到 ai_calls 表
+        :param attempt: 调用方的第几次重试
+        """
+        payload = {"messages": messages, "temperature": self.temperature}
+        trace = {}
+        data, cached, error = None, False, None
+        start = time.perf_counter()
+        try:
+            data = await self.cache.get(payload) if self.cache else None
+            cached = data is not None
+            if data is None:
+                await self.breaker.guard()
+                try:
+                    data = await self.router.chat(payload, trace)
+                except asyncio.CancelledError:
+                    self.breaker.release()
+                    raise
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                self.breaker.record_success()
+                if call_type != "resume_profile" and self._resume_profile is not None:
+                    self.resume_tokens_saved += self._saved_per_call
+                if self.cache:
+                    await self.cache.put(payload, data, time.perf_counter() - start)
+            return data['choices'][0]['message']['content']
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if self.ledger:
+                self.ledger.record(call_type, messages, data, time.perf_counter() - start, trace,
+                                   job_id=job_id, attempt=attempt, cached=cached, error=error)
+
+    @staticmethod
+    def _split_think(origin_content):
+        """拆分思考过程和回答，返回 (think, content)"""
+        match = re.match(r"<think>(.*?)</think>(.*)", origin_content, re.DOTALL)
+        if match:
+            return match.group(1), match.group(2)
+        return None, origin_content
+
+    @staticmethod
+    def parse_combined(content):
+        """
+        解析合并模式的回答
+        :return: (是否匹配, 打招呼语)，格式不符合要求时返回 None
+        """
+        # 兼容 ```json 代码块和 JSON 前后的多余文字
+        start, end = content.find("{"), content.rfind("}")
+        if start < 0 or end < start:
+            return None
+        try:
+            data = json.loads(content[start:end + 1])
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or not isinstance(data.get("match"), bool):
+            return None
+        if not data["match"]:
+            return False, None
+        greeting = data.get("greeting")
+        if not isinstance(greeting, str) or not greeting.strip():
+            return None
+        return True, greeting.strip()
+
+    async def ai_check_and_greet(self, job_detail, job_id=None):
+        """
+        一次请求完成匹配判断，匹配时同时生成打招呼语，简历只发送一次
+        :return: (是否匹配, 思考过程, 打招呼语)；请求失败或回答格式不正确时返回 None，由调用方改用两次请求
+        """
+        messages = [
+            {"role": "system", "content": self.ai_prompt},
+            {"role": "user", "content": f"岗位要求：{job_detail}"},
+            {"role": "user", "content": f"用户简历：{await self._resume()}"},
+            {"role": "user", "content": f"用户对工作岗位的要求：{self.job_requirements_prompt}"},
+            {"role": "system", "content": COMBINED_FORMAT_PROMPT.format(greeting_prompt=self.greeting_prompt)},
+        ]
+        try:
+            ai_think, content = self._split_think(await self._chat(messages, "combined", job_id))
+        except LlmCacheMiss as e:
+            logger.warning(str(e))
+            return None
+        except Exception as e:
+            logger.warning(f"AI合并请求失败，改用分开请求: {str(e)}")
+            return None
+        parsed = self.parse_combined(content)
+        if parsed is None:
+            logger.warning(f"AI合并请求的回答格式不正确，改用分开请求: {content[:200]}")
+            return None
+        check_result, greeting_message = parsed
+        return check_result, ai_think, greeting_message
+
+    def fallback_check(self, job_detail):
+        """
+        熔断期间的规则判断：包含任一 include_keywords（未配置时视为包含）且不包含 exclude_keywords 时匹配
+        :return: (是否匹配, 判断依据)；fallback 为 park 时返回 None，岗位暂缓分析
+        """
+        if self.fallback != "rules":
+            return None
+        text = job_detail.lower()
+        excluded = [k for k in self.fallback_rules.exclude_keywords if k.lower() in text]
+        if excluded:
+            return False, f"[规则判断] 包含排除关键词: {', '.join(excluded)}"
+        included = [k for k in self.fallback_rules.include_keywords if k.lower() in text]
+        if self.fallback_rules.include_keywords and not included:
+            return False, "[规则判断] 不包含任何关键词"
+        return True, f"[规则判断] 包含关键词: {', '.join(included)}" if included else "[规则判断] 未配置关键词"
+
+    async def ai_greeting(self, job_detail, job_id=None):
         for attempt in range(5):
             try:
-                session = await SessionManager.get_async_session()
                 # 构建请求体
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": self.greeting_prompt
-                        },
-                        {
-                            "role": "user",
-                            "content": f"目标职位关键要求：{job_detail}\n\n求职者真实简历：{self.resume_for_ai}"
-                        },
-                        {
-                            "role": "system",
-                            "content": "请生成符合上述要求的打招呼语，仅输出最终内容，不要用任何标记符号"
-                        }
-                    ],
-
-                    "temperature": self.temperature,
-                }
-
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=120
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    origin_content = data['choices'][0]['message']['content']
-                    # 尝试使用 re 模块匹配
-                    match = re.match(
-                        r"<think>(.*?)</think>(.*)",
-                        origin_content,
-                        re.DOTALL
-                    )
-                    if match:
-                        greeting_message = match.group(2).strip()
-                    else:
-                        greeting_message = origin_content.strip()
-                    return greeting_message
+                messages = [
+                    {
+                        "role": "system",
+                        "content": self.greeting_prompt
+                    },
+                    {
+                        "role": "user",
+                        "content": f"目标职位关键要求：{job_detail}\n\n求职者真实简历：{await self._resume()}"
+                    },
+                    {
+                        "role": "system",
+                        "content": "请生成符合上述要求的打招呼语，仅输出最终内容，不要用任何标记符号"
+                    }
+                ]
+                origin_content = await self._chat(messages, "greeting", job_id, attempt + 1)
+                # 尝试使用 re 模块匹配
+                match = re.match(
+                    r"<think>(.*?)</think>(.*)",
+                    origin_content,
+                    re.DOTALL
+                )
+                if match:
+                    greeting_message = match.group(2).strip()
+                else:
+                    greeting_message = origin_content.strip()
+                return greeting_message
 
             except aiohttp.ClientError as e:
                 logger.warning(f"网络请求失败 ({attempt+1}/5): {str(e)}")
                 await asyncio.sleep(2 ** attempt)
+            except CircuitOpenError as e:
+                logger.warning(f"不生成打招呼语: {e}")
+                break
+            except LlmCacheMiss as e:
+                logger.warning(str(e))
+                break
             except KeyError as e:
                 logger.error(f"响应格式错误: {str(e)}")
                 break
@@ -118,50 +269,41 @@ class AiAnalyzer:
 
         return None
 
-    async def ai_hr_check(self, job_detail):
+    async def ai_hr_check(self, job_detail, job_id=None):
         for attempt in range(5):
             try:
-                session = await SessionManager.get_async_session()
                 # 构建请求体
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {"role": "system", "content": self.ai_prompt},
-                        {"role": "user", "content": f"岗位要求：{job_detail}"},
-                        {"role":"user","content":f"用户简历：{self.resume_for_ai}"},
-                        {"role":"user","content":f"用户对工作岗位的要求：{self.job_requirements_prompt}"}
-                    ],
-                    "temperature": self.temperature,
-                    #"max_tokens": 50 DeepSeek-R1包含思考过程，max_tokens太低会使回答不完整
-                }
-
-                async with session.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=120
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-
-                    origin_content = data['choices'][0]['message']['content'].lower()
-                    match = re.match(
-                        r"<think>(.*?)</think>(.*)",
-                        origin_content,
-                        re.DOTALL
-                    )
-                    ai_think = None
-                    if match:
-                        ai_think = match.group(1)
-                        content = match.group(2)
-                    else:
-                        content = origin_content
-                    check_result = "true" in content
-                    return check_result, ai_think
+                # DeepSeek-R1包含思考过程，不设置 max_tokens，太低会使回答不完整
+                messages = [
+                    {"role": "system", "content": self.ai_prompt},
+                    {"role": "user", "content": f"岗位要求：{job_detail}"},
+                    {"role":"user","content":f"用户简历：{await self._resume()}"},
+                    {"role":"user","content":f"用户对工作岗位的要求：{self.job_requirements_prompt}"}
+                ]
+                origin_content = (await self._chat(messages, "hr_check", job_id, attempt + 1)).lower()
+                match = re.match(
+                    r"<think>(.*?)</think>(.*)",
+                    origin_content,
+                    re.DOTALL
+                )
+                ai_think = None
+                if match:
+                    ai_think = match.group(1)
+                    content = match.group(2)
+                else:
+                    content = origin_content
+                check_result = "true" in content
+                return check_result, ai_think
 
             except aiohttp.ClientError as e:
                 logger.warning(f"网络请求失败 ({attempt+1}/5): {str(e)}")
                 await asyncio.sleep(2 ** attempt)
+            except CircuitOpenError:
+                # 由调用方暂缓分析或使用规则判断，不记为不匹配
+                raise
+            except LlmCacheMiss as e:
+                # 回放模式下未命中：暂缓，不能把"不匹配"写入数据库
+                raise AiAnalysisError(str(e)) from e
             except KeyError as e:
                 logger.error(f"响应格式错误: {str(e)}")
                 break
@@ -172,4 +314,5 @@ class AiAnalyzer:
                 logger.error(f"AI分析失败 ({attempt+1}/5): {str(e)}")
                 await asyncio.sleep(1)
 
-        return False,None
+        # 与熔断相同，由调用方暂缓分析或使用规则判断
+        raise AiAnalysisError("AI分析失败，没有得到结果")
@@ -0,0 +1,166 @@
+# ai_ledger.py
+"""
+AI 请求记录
+AiAnalyzer 的每次模型请求（包括重试、回放）都写入 ai_calls 表：端点、模型、请求类型、岗位、
+输入/输出 token、耗时、第几次重试、尝试的端点数和结果。同一次运行的记录共享 run_id。
+summarize_run 按运行汇总 token、耗时和费用，以及每个分析/投递岗位的平均费用。
+"""
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .circuit_breaker import CircuitOpenError
+from .resume_profile import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 计入"已分析岗位"的请求类型
+ANALYSIS_CALL_TYPES = ("hr_check", "combined")
+
+
+class AiLedger:
+    def __init__(self, db_manager, run_id: Optional[str] = None):
+        """
+        :param db_manager: DatabaseManager 实例，记录通过其写入线程提交
+        """
+        self.db = db_manager
+        self.run_id = run_id or f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+    def record(self, call_type: str, messages: List[Dict], response: Optional[Dict], latency: float,
+               trace: Dict, job_id: Optional[str] = None, attempt: int = 1, cached: bool = False,
+               error: Optional[BaseException] = None):
+        """记录一次请求，写入失败不影响请求本身"""
+        usage = (response or {}).get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+        estimated = False
+        if response and (prompt_tokens is None or completion_tokens is None):
+            # 部分兼容接口不返回 usage
+            estimated = True
+            prompt_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+            choices = response.get("choices") or [{}]
+            completion_tokens = estimate_tokens(choices[0].get("message", {}).get("content") or "")
+        if isinstance(error, CircuitOpenError):
+            outcome = "rejected"
+        elif error is not None:
+            outcome = "error"
+        else:
+            outcome = "cached" if cached else "ok"
+        row = {
+            "run_id": self.run_id,
+            "created_at": datetime.now(),
+            "call_type": call_type,
+            "job_id": job_id,
+            "endpoint": trace.get("endpoint"),
+            "model": trace.get("model") or (response or {}).get("model"),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "usage_estimated": estimated,
+            "latency_ms": round(latency * 1000, 1),
+            "attempt": attempt,
+            "tries": trace.get("tries", 0 if cached else 1),
+            "outcome": outcome,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+        }
+        try:
+            self.db.record_ai_calls([row])
+        except Exception as e:
+            logger.warning(f"写入AI请求记录失败: {e}")
+
+
+def _cost(prompt_tokens: int, completion_tokens: int, price: Optional[List[float]]) -> Optional[float]:
+    if not price:
+        return None
+    return (prompt_tokens or 0) / 1e6 * price[0] + (completion_tokens or 0) / 1e6 * price[1]
+
+
+def summarize_run(db_path: str, run_id: Optional[str] = None,
+                  prices: Optional[Dict[str, List[float]]] = None) -> Optional[Dict]:
+    """
+    汇总一次运行的请求记录
+    :param run_id: 为空时汇总最近一次运行
+    :param prices: {模型名: [每百万输入 token 价格, 每百万输出 token 价格]}，回放的请求不计费
+    """
+    prices = prices or {}
+    conn = sqlite3.connect(db_path)
+    try:
+        if run_id is None:
+            row = conn.execute("SELECT run_id FROM ai_calls ORDER BY id DESC LIMIT 1").fetchone()
+            if row is None:
+                return None
+            run_id = row[0]
+        start, end = conn.execute(
+            "SELECT MIN(created_at), MAX(created_at) FROM ai_calls WHERE run_id = ?", (run_id,)).fetchone()
+        if start is None:
+            return None
+        summary = {"run_id": run_id, "start": start, "end": end, "by_type": {}, "by_model": {}}
+        for call_type, calls, errors, rejected, retries, prompt, completion, latency in conn.execute("""
+            SELECT call_type, COUNT(*), SUM(outcome = 'error'), SUM(outcome = 'rejected'), SUM(attempt > 1),
+                   SUM(prompt_tokens), SUM(completion_tokens),
+                   AVG(CASE WHEN outcome IN ('ok', 'cached') THEN latency_ms END)
+            FROM ai_calls WHERE run_id = ? GROUP BY call_type
+        """, (run_id,)):
+            summary["by_type"][call_type] = {
+                "calls": calls, "errors": errors, "rejected": rejected, "retries": retries, "prompt_tokens": prompt or 0,
+                "completion_tokens": completion or 0, "avg_latency_ms": round(latency or 0, 1),
+            }
+
+        cost, priced = 0.0, True
+        for model, prompt, completion, estimated in conn.execute("""
+            SELECT model, SUM(prompt_tokens), SUM(completion_tokens), SUM(usage_estimated)
+            FROM ai_calls WHERE run_id = ? AND outcome = 'ok' GROUP BY model
+        """, (run_id,)):
+            model_cost = _cost(prompt, completion, prices.get(model))
+            summary["by_model"][model] = {"prompt_tokens": prompt or 0, "completion_tokens": completion or 0,
+                                          "estimated_calls": estimated, "cost": model_cost}
+            if model_cost is None:
+                priced = False
+            else:
+                cost += model_cost
+        summary["cost"] = cost if priced else None
+
+        placeholders = ", ".join("?" for _ in ANALYSIS_CALL_TYPES)
+        summary["analysed_jobs"] = conn.execute(f"""
+            SELECT COUNT(DISTINCT job_id) FROM ai_calls
+            WHERE run_id = ? AND call_type IN ({placeholders}) AND outcome IN ('ok', 'cached') AND job_id IS NOT NULL
+        """, (run_id, *ANALYSIS_CALL_TYPES)).fetchone()[0]
+        # 本次运行中分析过、且在运行期间投递成功的岗位
+        summary["applied_jobs"] = conn.execute(f"""
+            SELECT COUNT(DISTINCT a.job_id) FROM applications a
+            WHERE a.status = 'applied' AND a.applied_at >= ? AND a.job_id IN (
+                SELECT job_id FROM ai_calls WHERE run_id = ? AND call_type IN ({placeholders})
+            )
+        """, (start, run_id, *ANALYSIS_CALL_TYPES)).fetchone()[0]
+    finally:
+        conn.close()
+    if summary["cost"] is not None:
+        summary["cost_per_analysed_job"] = summary["cost"] / summary["analysed_jobs"] if summary["analysed_jobs"] else None
+        summary["cost_per_applied_job"] = summary["cost"] / summary["applied_jobs"] if summary["applied_jobs"] else None
+    return summary
+
+
+def format_summary(summary: Dict) -> str:
+    """汇总结果的文本形式，用于日志和命令行输出"""
+    lines = [f"AI请求汇总（运行 {summary['run_id']}，{summary['start'][:19]} ~ {summary['end'][:19]}）"]
+    for call_type, stats in summary["by_type"].items():
+        lines.append(
+            f"  {call_type:<15} 请求 {stats['calls']}，失败 {stats['errors']}，熔断拒绝 {stats['rejected']}，"
+            f"重试 {stats['retries']}，"
+            f"输入 {stats['prompt_tokens']} / 输出 {stats['completion_tokens']} tokens，"
+            f"平均耗时 {stats['avg_latency_ms']} ms")
+    for model, stats in summary["by_model"].items():
+        estimated = f"（{stats['estimated_calls']} 次为估算）" if stats["estimated_calls"] else ""
+        cost = f"，费用 {stats['cost']:.4f}" if stats["cost"] is not None else "，未配置价格"
+        lines.append(f"  模型 {model}: 输入 {stats['prompt_tokens']} / 输出 {stats['completion_tokens']} tokens"
+                     f"{estimated}{cost}")
+    lines.append(f"  分析岗位 {summary['analysed_jobs']} 个，投递 {summary['applied_jobs']} 个")
+    if summary["cost"] is not None:
+        line = f"  总费用 {summary['cost']:.4f}"
+        if summary["cost_per_analysed_job"] is not None:
+            line += f"，每个分析岗位 {summary['cost_per_analysed_job']:.4f}"
+        if summary["cost_per_applied_job"] is not None:
+            line += f"，每个投递岗位 {summary['cost_per_applied_job']:.4f}"
+        lines.append(line)
+    return "\n".join(lines)
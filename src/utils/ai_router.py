@@ -0,0 +1,212 @@
+# ai_router.py
+"""
+多端点 AI 路由
+每个端点有独立的服务商、密钥、模型和并发上限。请求优先发送到近期延迟和错误率最低的端点，
+失败时依次切换到下一个端点；开启 hedge_after 后，请求超过该时间未返回会同时向次优端点发送一份，取先返回的结果。
+各端点的统计信息可以通过 stats() 获取，或定期写入 stats_file。
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from .session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+# 指数滑动平均系数
+EWMA_ALPHA = 0.3
+# 失败率折算的耗时惩罚（秒）
+FAILURE_PENALTY = 30.0
+# 失败率的半衰期（秒），故障端点一段时间后会被重新尝试
+ERROR_HALF_LIFE = 60.0
+
+
+class AiEndpoint:
+    def __init__(self, name: str, provider: str, api_url: str, api_key: str, model: str,
+                 max_concurrency: int = 4, temperature: Optional[float] = None):
+        self.name = name
+        self.provider = provider
+        self.api_url = api_url
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.headers = self._build_headers(provider, api_key)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # 统计
+        self.requests = 0
+        self.errors = 0
+        self.inflight = 0  # 排队中和进行中的请求
+        self.latency = None  # 成功请求耗时的滑动平均（秒）
+        self._error_rate = 0.0  # 失败率的滑动平均
+        self._error_time = 0.0
+        self.last_error = None
+
+    @staticmethod
+    def _build_headers(provider: str, api_key: str) -> Dict[str, str]:
+        """处理不同提供商的请求差异"""
+        if provider == "azure":
+            return {"api-key": f"{api_key}", "Content-Type": "application/json"}
+        elif provider == "openai":
+            return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        raise ValueError(f"不支持的AI提供商: {provider}")
+
+    @property
+    def error_rate(self) -> float:
+        """失败率，随距上次失败的时间衰减"""
+        if not self._error_rate:
+            return 0.0
+        return self._error_rate * 0.5 ** ((time.monotonic() - self._error_time) / ERROR_HALF_LIFE)
+
+    def score(self) -> float:
+        """预估耗时，越小越优先；还没有成功请求的端点优先尝试"""
+        latency = self.latency if self.latency is not None else 0.0
+        # 超过并发上限的请求需要排队等待前面的请求完成
+        waves = 1 + self.inflight // self.max_concurrency
+        return latency * waves + self.error_rate * FAILURE_PENALTY
+
+    def record(self, elapsed: Optional[float], error: Optional[BaseException] = None):
+        self.requests += 1
+        error_rate = self.error_rate
+        self._error_time = time.monotonic()
+        if error is None:
+            self.latency = elapsed if self.latency is None else \
+                EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+            self._error_rate = error_rate * (1 - EWMA_ALPHA)
+        else:
+            self.errors += 1
+            self._error_rate = EWMA_ALPHA + (1 - EWMA_ALPHA) * error_rate
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "inflight": self.inflight,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "last_error": self.last_error,
+        }
+
+
+class AiRouter:
+    def __init__(self, endpoints: List[AiEndpoint], hedge_after: float = 0, timeout: float = 120,
+                 stats_file: str = "", stats_interval: float = 30):
+        """
+        :param hedge_after: 请求超过该秒数未返回时向次优端点再发送一份，0 表示不启用
+        :param stats_file: 定期写入端点统计的 JSON 文件，为空时不写入
+        """
+        if not endpoints:
+            raise ValueError("至少需要配置一个AI端点")
+        self.endpoints = endpoints
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.stats_file = stats_file
+        self.stats_interval = stats_interval
+        self.hedged = 0
+        self._last_export = 0.0
+
+    def ranked(self) -> List[AiEndpoint]:
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score())
+
+    async def chat(self, payload: Dict, trace: Optional[Dict] = None) -> Dict:
+        """
+        发送 chat/completions 请求，payload 中不需要包含 model
+        :param trace: 传入时写入实际返回结果的端点名称、模型（endpoint / model）和尝试的端点数（tries）
+        :return: 响应 JSON
+        """
+        trace = trace if trace is not None else {}
+        trace["tries"] = 0
+        candidates = self.ranked()
+        last_error = None
+        while candidates:
+            endpoint = candidates.pop(0)
+            try:
+                if self.hedge_after and candidates:
+                    return await self._hedged(endpoint, candidates, payload, trace)
+                return await self._send(endpoint, payload, trace)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                last_error = e
+                if candidates:
+                    logger.warning(f"AI端点 {endpoint.name} 请求失败，切换到 {candidates[0].name}: {e}")
+        raise last_error
+
+    async def _hedged(self, primary: AiEndpoint, candidates: List[AiEndpoint], payload: Dict, trace: Dict) -> Dict:
+        """主端点超过 hedge_after 未返回时，同时请求次优端点"""
+        first = asyncio.ensure_future(self._send(primary, payload, trace))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+        secondary = candidates.pop(0)
+        self.hedged += 1
+        logger.debug(f"AI端点 {primary.name} 超过 {self.hedge_after}s 未返回，同时请求 {secondary.name}")
+        pending = {first, asyncio.ensure_future(self._send(secondary, payload, trace))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _send(self, endpoint: AiEndpoint, payload: Dict, trace: Optional[Dict] = None) -> Dict:
+        trace = trace if trace is not None else {}
+        trace["tries"] = trace.get("tries", 0) + 1
+        trace["endpoint"], trace["model"] = endpoint.name, endpoint.model
+        body = dict(payload, model=endpoint.model)
+        if endpoint.temperature is not None:
+            body["temperature"] = endpoint.temperature
+        endpoint.inflight += 1
+        try:
+            async with endpoint.semaphore:
+                start = time.perf_counter()
+                try:
+                    session = await SessionManager.get_async_session()
+                    async with session.post(endpoint.api_url, headers=endpoint.headers,
+                                            json=body, timeout=self.timeout) as response:
+                        response.raise_for_status()
+                        data = await response.json()
+                        if not data.get("choices"):
+                            raise KeyError("choices")
+                except asyncio.CancelledError:
+                    # 对冲请求被取消，不计入统计
+                    raise
+                except Exception as e:
+                    endpoint.record(None, e)
+                    raise
+                endpoint.record(time.perf_counter() - start)
+                # 对冲时以先返回的端点为准
+                trace["endpoint"], trace["model"] = endpoint.name, endpoint.model
+                return data
+        finally:
+            endpoint.inflight -= 1
+            self._maybe_export_stats()
+
+    def stats(self) -> Dict:
+        return {"hedged": self.hedged, "endpoints": [endpoint.stats() for endpoint in self.endpoints]}
+
+    def export_stats(self, path: Optional[str] = None):
+        path = path or self.stats_file
+        if not path:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, ensure_ascii=False, indent=2)
+
+    def _maybe_export_stats(self):
+        now = time.monotonic()
+        if self.stats_file and now - self._last_export >= self.stats_interval:
+            self._last_export = now
+            try:
+                self.export_stats()
+            except OSError as e:
+                logger.warning(f"写入AI端点统计失败: {e}")
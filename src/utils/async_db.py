@@ -0,0 +1,71 @@
+# async_db.py
+"""
+异步数据库访问
+DatabaseManager 基于同步的 SQLAlchemy，直接在协程中调用会阻塞事件循环中的 HTTP / AI 请求。
+AsyncDatabaseManager 将读操作放到专用线程池中执行，写操作交给 DatabaseWriter 写入线程，协程只等待结果。
+同时排队的操作数有上限，数据库变慢时调用方会在 await 处等待，而不是无限堆积任务。
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    def __init__(self, db_manager, max_workers: int = 2, max_pending: int = 32):
+        """
+        :param db_manager: DatabaseManager 实例
+        :param max_workers: 执行读操作的线程数（WAL 模式下读操作可以并发）
+        :param max_pending: 同时排队/执行的数据库操作上限
+        """
+        self.db = db_manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db_reader")
+        self._max_pending = max_pending
+        self._semaphore = None
+        self._loop = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 信号量与事件循环绑定，在首次使用时按当前循环创建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self._max_pending)
+        return self._semaphore
+
+    async def run(self, func, *args, **kwargs):
+        """在数据库线程池中执行同步函数"""
+        async with self._get_semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, partial(func, *args, **kwargs))
+
+    async def filter_visited(self, jobs: List[Dict], user_id=None) -> List[Dict]:
+        return await self.run(self.db.filter_visited, jobs, user_id)
+
+    async def get_fresh_cards(self, jobs: List[Dict], ttl: timedelta) -> Dict[str, Dict]:
+        return await self.run(self.db.get_fresh_cards, jobs, ttl)
+
+    async def find_near_duplicate(self, job_id: str, signature, threshold: float,
+                                  company: Optional[str] = None) -> Optional[Dict]:
+        return await self.run(self.db.find_near_duplicate, job_id, signature, threshold, company)
+
+    async def search_jobs(self, query: str, limit: int = 20, raw: bool = False) -> List[Dict]:
+        return await self.run(self.db.search_jobs, query, limit, raw)
+
+    async def save_jobs_details(self, jobs: List[Dict], jobs_details: List[Dict],
+                                account_id: Optional[str] = None, wait: bool = True):
+        """
+        保存岗位数据
+        :param wait: 是否等待写入线程提交；为 False 时提交到写入队列后立即返回
+        """
+        # 构建记录（JSON 序列化、压缩归档）也放到线程池中
+        future = await self.run(self.db.save_jobs_details, jobs, jobs_details, account_id)
+        if wait:
+            return await asyncio.wrap_future(future)
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=True)
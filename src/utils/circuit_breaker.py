@@ -0,0 +1,88 @@
+# circuit_breaker.py
+"""
+熔断器
+模型服务连续失败 failure_threshold 次后熔断（open），之后的请求直接抛出 CircuitOpenError，不再等待超时和重试；
+熔断 reset_timeout 秒后进入半开状态（half_open），只放行一个探测请求：成功则恢复（closed），失败则重新熔断；
+探测期间的其他请求通过 guard() 等待探测结果，而不是直接被拒绝。
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断期间拒绝的请求"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str = "ai", failure_threshold: int = 5, reset_timeout: float = 60):
+        """
+        :param failure_threshold: 连续失败多少次后熔断，0 表示不启用
+        :param reset_timeout: 熔断多少秒后放行探测请求
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """当前请求是否可以发送"""
+        if not self.failure_threshold or self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self._probing = False
+            logger.info(f"{self.name} 熔断 {self.reset_timeout}s 后放行探测请求")
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def check(self):
+        """不允许发送时抛出 CircuitOpenError"""
+        if not self.allow():
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"{self.name} 已熔断，约 {remaining:.0f}s 后重试")
+
+    async def guard(self):
+        """协程中使用：等待进行中的探测请求结束后再 check()"""
+        while self.state == HALF_OPEN and self._probing:
+            await asyncio.sleep(0.1)
+        self.check()
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info(f"{self.name} 探测请求成功，恢复正常")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failure_threshold
+                                       and self.failures >= self.failure_threshold):
+            if self.state == CLOSED:
+                logger.warning(f"{self.name} 连续失败 {self.failures} 次，熔断 {self.reset_timeout}s")
+            else:
+                logger.warning(f"{self.name} 探测请求失败，继续熔断 {self.reset_timeout}s")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """请求被取消，不计入成功或失败，半开状态下允许重新探测"""
+        self._probing = False
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
@@ -1,6 +1,6 @@
 # config_manager.py
-from pydantic import BaseModel, ValidationError
-from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import Dict, Any, List, Literal, Optional
 import yaml
 import os
 
@@ -10,15 +10,68 @@ class playwrightConfig(BaseModel):
     headless: bool
     use_default_data_dir: bool
 
-class AiConfig(BaseModel):
+class AiEndpointConfig(BaseModel):
+    name: str = ""
+    provider: str
     api_url: str
     api_key: str
     model: str
+    max_concurrency: int = 4
+    temperature: Optional[float] = None  # 为空时使用 ai.temperature
+
+class FallbackRulesConfig(BaseModel):
+    include_keywords: List[str] = []
+    exclude_keywords: List[str] = []
+
+class AiConfig(BaseModel):
+    # 单端点配置，配置了 endpoints 时可以省略
+    api_url: str = ""
+    api_key: str = ""
+    model: str = ""
+    provider: str = "openai"
     temperature: float
-    provider: str
     resume_for_ai_file: str
     prompt: str
     job_requirements_prompt: str
+    max_concurrency: int = 4
+    # 多端点路由
+    endpoints: List[AiEndpointConfig] = []
+    hedge_after: float = 0  # 请求超过该秒数未返回时向次优端点再发送一份，0 表示不启用
+    stats_file: str = ""  # 定期写入各端点统计的 JSON 文件
+    # 请求录制/回放（off / record / replay / auto）
+    cache_mode: Literal["off", "record", "replay", "auto"] = "off"
+    cache_file: str = "data/llm_cache.db"
+    cache_replay_latency: Literal["zero", "original"] = "zero"
+    # 精简简历（off / local / llm），按简历内容哈希缓存在 resume_profile_dir 中
+    resume_profile: Literal["off", "local", "llm"] = "off"
+    resume_profile_dir: str = "data/resume_profile"
+    combined_greeting: bool = False  # 启用 AI 打招呼语时，一次请求同时完成匹配判断和打招呼语生成
+    # 熔断：连续失败 breaker_failures 次后熔断 breaker_reset 秒，0 表示不启用
+    breaker_failures: int = 5
+    breaker_reset: float = 60
+    fallback: Literal["park", "rules"] = "park"  # 熔断期间：park 暂缓分析，下次运行重新处理；rules 使用 fallback_rules 判断
+    fallback_rules: FallbackRulesConfig = FallbackRulesConfig()
+    # 模型价格 {模型名: [每百万输入 token 价格, 每百万输出 token 价格]}，用于运行结束时的费用汇总
+    token_prices: Dict[str, List[float]] = {}
+
+class ThrottleConfig(BaseModel):
+    enabled: bool = True  # 检测到限流、风控、验证码时暂停所有请求并降低 crawler 限速
+    pause: float = 60  # 暂停秒数，连续触发时加倍
+    max_pause: float = 900
+    captcha_pause: float = 600  # 验证码的暂停秒数，需要在浏览器中完成验证
+    decrease: float = 0.5  # 触发时速率乘以该值
+    min_rate: float = 0.1
+    increase: float = 0.1  # 每 ramp_interval 秒没有触发时增加的速率
+    ramp_interval: float = 30
+    ceiling_ratio: float = 0.9  # 触发后 ceiling_ttl 秒内只恢复到触发时速率的该比例
+    ceiling_ttl: float = 600
+
+    @field_validator("min_rate")
+    @classmethod
+    def _check_min_rate(cls, value):
+        if value <= 0:
+            raise ValueError("min_rate 必须大于 0")
+        return value
 
 class CrawlerConfig(BaseModel):
     playwright: playwrightConfig
@@ -26,6 +79,18 @@ class CrawlerConfig(BaseModel):
     next_page_delay: int
     request_timeout: int
     page_load_timeout: int
+    detail_cache_ttl_hours: float = 24
+    throttle: ThrottleConfig = ThrottleConfig()
+
+    @field_validator("rate_limit")
+    @classmethod
+    def _check_rate_limit(cls, value):
+        # TokenBucket 按 1 / rate 计算等待时间
+        if value.get("rate", 0) <= 0:
+            raise ValueError("rate_limit.rate 必须大于 0")
+        if value.get("capacity", 0) < 1:
+            raise ValueError("rate_limit.capacity 不能小于 1")
+        return value
 
 class GreetingConfig(BaseModel):
     enable_ai: bool
@@ -36,6 +101,7 @@ class ApplicationConfig(BaseModel):
     resume_image_file: str
     greeting: GreetingConfig
     resume_name: str
+    max_applications: int = 0  # 每次运行最多投递的岗位数，0 表示不限制
 
 class LoggingConfig(BaseModel):
     level: str
@@ -46,6 +112,13 @@ class DatabaseConfig(BaseModel):
     filename: str
     export_excel: bool
     excel_path: str
+    export_incremental: bool = False
+    export_parquet: bool = False
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    cache_size_mb: int = 64
+    commit_interval: float = 0.5
+    archive_payloads: bool = True
 
 class FilterBaseConfig(BaseModel):
     values: List[str]
@@ -72,6 +145,17 @@ class JobSearchConfig(BaseModel):
 class AccountConfig(BaseModel):
     username: str
 
+class PriorityConfig(BaseModel):
+    enabled: bool = False  # 按评分从高到低处理岗位，false 时按列表顺序并发处理
+    workers: int = 8  # 同时处理的岗位数
+    boss_online: float = 2.0  # BOSS 在线
+    salary: float = 2.0  # 薪资中位数在期望范围中的位置（0~1）乘以该权重
+    keywords: List[str] = []  # 出现在职位名称或技能标签中的关键词
+    keyword_weight: float = 1.0  # 每个命中的关键词
+    scale_weights: Dict[str, float] = {}  # 公司规模（brandScaleName）的加分
+    industry_weights: Dict[str, float] = {}  # 行业（brandIndustry）的加分
+    defer_below: Optional[float] = None  # 低于该分数的岗位推迟到当前搜索条件的所有页面之后处理
+
 class JobCheckConfig(BaseModel):
     test_mode: bool
     salary_range: List[float]
@@ -80,6 +164,11 @@ class JobCheckConfig(BaseModel):
     min_insured: int
     exclude_outsource: bool
     check_visited: bool
+    # 相似岗位复用分析结果：off 不启用；reject_only 只复用"不匹配"；reuse 复用所有结果
+    near_dup: Literal["off", "reject_only", "reuse"] = "off"
+    near_dup_threshold: float = 0.85  # 职位描述相似度（Jaccard）下限
+    near_dup_same_company: bool = True  # 只在同一公司的岗位中查找
+    priority: PriorityConfig = PriorityConfig()
 
 class EmailConfig(BaseModel):
     enabled: bool
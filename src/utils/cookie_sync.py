@@ -0,0 +1,150 @@
+# cookie_sync.py
+"""
+浏览器 cookies 同步
+原来每批岗位处理前都要调用 context.cookies() 和 navigator.userAgent（两次浏览器往返），
+两批之间浏览器更新的 cookies 也会漏掉。CookieSync 在浏览器上下文中：
+    attach 时读取一次 User-Agent（每个上下文一次）和全部 cookies
+    监听 zhipin.com 页面和接口响应的 Set-Cookie（包括 HttpOnly 的 cookies）
+    通过初始化脚本拦截页面脚本对 document.cookie 的写入（例如 __zp_stoken__）
+只有 cookie 的值发生变化时才调用 SessionManager.update_session，并且只推送变化的部分。
+重新加载登录数据（切换账号）后调用 refresh() 读取全部 cookies，浏览器中已删除的 cookies 同步删除。
+"""
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+
+from .session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+BINDING_NAME = "__cookieSync"
+# 拦截 document.cookie 的写入，原样写入后把写入的内容发给 CookieSync
+HOOK_SCRIPT = """
+(() => {
+    const desc = Object.getOwnPropertyDescriptor(Document.prototype, 'cookie');
+    if (!desc || window.__cookieSyncHooked) return;
+    window.__cookieSyncHooked = true;
+    Object.defineProperty(document, 'cookie', {
+        configurable: true,
+        get() { return desc.get.call(document); },
+        set(value) {
+            desc.set.call(document, value);
+            try { window.%s(String(value)); } catch (e) {}
+        },
+    });
+})();
+""" % BINDING_NAME
+# 只有这些类型的响应可能带有需要同步的 Set-Cookie
+RESOURCE_TYPES = ("document", "xhr", "fetch")
+
+
+def parse_cookie(header: str, host: str) -> Optional[Tuple[str, Optional[str], str]]:
+    """
+    解析 Set-Cookie 响应头或 document.cookie 写入的内容
+    :return: (名称, 值, 域名)，已过期（删除）的 cookie 值为 None，格式错误时返回 None
+    """
+    name_value, *attributes = header.split(";")
+    if "=" not in name_value:
+        return None
+    name, value = (part.strip() for part in name_value.split("=", 1))
+    if not name:
+        return None
+    domain = host
+    for attribute in attributes:
+        key, _, attr_value = attribute.strip().partition("=")
+        key = key.lower()
+        if key == "domain" and attr_value:
+            domain = attr_value.strip().lstrip(".")
+        elif key == "max-age":
+            try:
+                if int(attr_value) <= 0:
+                    value = None
+            except ValueError:
+                pass
+        elif key == "expires" and value is not None:
+            try:
+                if parsedate_to_datetime(attr_value.strip()).timestamp() <= time.time():
+                    value = None
+            except (TypeError, ValueError):
+                pass
+    return name, value, domain
+
+
+class CookieSync:
+    def __init__(self, domain: str = "zhipin.com"):
+        self.domain = domain
+        self.cookies: Dict[str, str] = {}  # 已推送到 SessionManager 的 cookies
+        self.user_agents = {}  # 浏览器上下文 -> User-Agent
+        self.updates = 0  # 推送次数
+
+    def _matches(self, domain: str) -> bool:
+        domain = (domain or "").lstrip(".")
+        return domain == self.domain or domain.endswith("." + self.domain)
+
+    def apply(self, changes: Dict[str, Optional[str]], headers: Optional[Dict] = None) -> bool:
+        """
+        推送变化的 cookies
+        :param changes: {名称: 值}，值为 None 表示删除
+        :return: 是否有变化
+        """
+        updated = {name: value for name, value in changes.items()
+                   if value is not None and self.cookies.get(name) != value}
+        removed = [name for name, value in changes.items() if value is None and name in self.cookies]
+        if not updated and not removed and not headers:
+            return False
+        self.cookies.update(updated)
+        for name in removed:
+            del self.cookies[name]
+        SessionManager.update_session(updated, headers or {}, removed)
+        self.updates += 1
+        logger.debug(f"同步 cookies：更新 {list(updated)}，删除 {removed}")
+        return True
+
+    def apply_set_cookie(self, headers: Iterable[str], url: str) -> bool:
+        """处理一个响应的 Set-Cookie 头，或一次 document.cookie 写入"""
+        host = urlparse(url).hostname or ""
+        changes = {}
+        for header in headers:
+            cookie = parse_cookie(header, host)
+            if cookie and self._matches(cookie[2]):
+                changes[cookie[0]] = cookie[1]
+        return self.apply(changes) if changes else False
+
+    async def attach(self, page):
+        """在页面所属的浏览器上下文中开始同步，并读取一次全部 cookies"""
+        context = page.context
+        if context not in self.user_agents:
+            await context.expose_binding(BINDING_NAME, self._on_document_cookie)
+            await context.add_init_script(HOOK_SCRIPT)
+            context.on("response", self._on_response)
+            try:
+                # 已打开的页面不会执行初始化脚本
+                await page.evaluate(HOOK_SCRIPT)
+            except Exception as e:
+                logger.debug(f"当前页面拦截 document.cookie 失败: {e}")
+            self.user_agents[context] = await page.evaluate("() => navigator.userAgent")
+        await self.refresh(context)
+
+    async def refresh(self, context):
+        """读取浏览器中的全部 cookies，删除的 cookies 同步删除"""
+        cookies = {cookie['name']: cookie['value'] for cookie in await context.cookies()
+                   if self._matches(cookie.get('domain'))}
+        changes = {**{name: None for name in self.cookies if name not in cookies}, **cookies}
+        self.apply(changes, {'User-Agent': self.user_agents[context]})
+
+    async def _on_response(self, response):
+        try:
+            if response.request.resource_type not in RESOURCE_TYPES or \
+                    not self._matches(urlparse(response.url).hostname):
+                return
+            values = await response.header_values("set-cookie")
+            if values:
+                self.apply_set_cookie(values, response.url)
+        except Exception as e:
+            # 页面跳转、关闭时响应可能已失效
+            logger.debug(f"读取 Set-Cookie 失败 {response.url}: {e}")
+
+    def _on_document_cookie(self, source, value: str):
+        self.apply_set_cookie([value], source["frame"].url)
@@ -0,0 +1,136 @@
+# db_maintenance.py
+"""
+数据库保留策略与压缩
+将 updateTime 早于保留期的岗位（job_details 及其 job_payloads 归档数据）移动到独立的归档库，
+主库的 archived_jobs 只保留去重所需的 encryptJobId / visited，applications 表保持不变，
+job_minhash 中已归档岗位的签名删除（归档的岗位不再作为相似岗位）；
+之后执行 WAL checkpoint、VACUUM 和 ANALYZE 回收空间。
+VACUUM 需要独占数据库，建议在主程序未运行时执行。
+"""
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# 随岗位一起移动到归档库的表
+ARCHIVE_TABLES = ["job_details", "job_payloads"]
+
+# 压缩前后对比耗时的查询
+BENCHMARK_QUERIES = {
+    "全表导出": 'SELECT * FROM job_details ORDER BY first_added_time DESC',
+    "已访问岗位": 'SELECT "encryptJobId" FROM job_details WHERE visited',
+    "最近7天更新": 'SELECT COUNT(*) FROM job_details WHERE "updateTime" >= datetime(\'now\', \'localtime\', \'-7 days\')',
+}
+
+
+def database_size(db_path: str) -> int:
+    """数据库文件大小（包括 -wal / -shm）"""
+    return sum(os.path.getsize(db_path + suffix) for suffix in ("", "-wal", "-shm")
+               if os.path.exists(db_path + suffix))
+
+
+def measure_queries(conn) -> Dict[str, float]:
+    """执行对比查询，返回耗时（毫秒）"""
+    timings = {}
+    for name, sql in BENCHMARK_QUERIES.items():
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def _columns(conn, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA {schema}.table_info("{table}")')]
+
+
+def _prepare_archive_table(conn, table: str) -> List[str]:
+    """在归档库中创建与主库相同结构的表，主库新增的列同步添加"""
+    info = conn.execute(f'PRAGMA main.table_info("{table}")').fetchall()
+    columns = [row[1] for row in info]
+    if not _columns(conn, "archive", table):
+        definitions = ", ".join(f'"{row[1]}" {row[2]}' for row in info)
+        primary_key = ", ".join(f'"{row[1]}"' for row in sorted(info, key=lambda row: row[5]) if row[5])
+        conn.execute(f'CREATE TABLE archive."{table}" ({definitions}, PRIMARY KEY ({primary_key}))')
+    else:
+        archived = set(_columns(conn, "archive", table))
+        for column in columns:
+            if column not in archived:
+                conn.execute(f'ALTER TABLE archive."{table}" ADD COLUMN "{column}"')
+    return columns
+
+
+def compact_database(db_path: str, retention_days: int, archive_path: str,
+                     vacuum: bool = True, dry_run: bool = False) -> Dict:
+    """
+    归档过期岗位并压缩数据库
+    :param retention_days: 保留最近多少天内更新过的岗位
+    :param archive_path: 归档库路径（SQLite），多次执行会追加到同一个归档库
+    :param dry_run: 只统计将要归档的岗位数量
+    :return: 执行报告
+    """
+    cutoff = str(datetime.now() - timedelta(days=retention_days))
+    report = {"cutoff": cutoff, "archive_path": archive_path, "size_before": database_size(db_path)}
+    # 手动管理事务
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        old_jobs = 'SELECT "encryptJobId" FROM main.job_details WHERE "updateTime" < :cutoff OR "updateTime" IS NULL'
+        report["archived_jobs"] = conn.execute(f"SELECT COUNT(*) FROM ({old_jobs})", {"cutoff": cutoff}).fetchone()[0]
+        report["remaining_jobs"] = conn.execute("SELECT COUNT(*) FROM job_details").fetchone()[0] - report["archived_jobs"]
+        if dry_run:
+            return report
+        report["timings_before"] = measure_queries(conn)
+
+        if report["archived_jobs"]:
+            conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute(f"CREATE TEMP TABLE expired AS {old_jobs}", {"cutoff": cutoff})
+                    conn.execute('CREATE UNIQUE INDEX temp.ix_expired ON expired ("encryptJobId")')
+                    for table in ARCHIVE_TABLES:
+                        columns = ", ".join(f'"{c}"' for c in _prepare_archive_table(conn, table))
+                        conn.execute(f'INSERT OR REPLACE INTO archive.{table} ({columns}) '
+                                     f'SELECT {columns} FROM main.{table} '
+                                     f'WHERE "encryptJobId" IN (SELECT "encryptJobId" FROM expired)')
+                    conn.execute("""
+                        INSERT OR REPLACE INTO main.archived_jobs ("encryptJobId", visited, archived_at)
+                        SELECT j."encryptJobId", j.visited, ? FROM main.job_details j
+                        WHERE j."encryptJobId" IN (SELECT "encryptJobId" FROM expired)
+                    """, (str(datetime.now()),))
+                    # 先删除归档数据，job_details 的删除触发器会同步更新全文索引
+                    for table in reversed(ARCHIVE_TABLES):
+                        conn.execute(f'DELETE FROM main.{table} '
+                                     f'WHERE "encryptJobId" IN (SELECT "encryptJobId" FROM expired)')
+                    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'job_minhash'").fetchone():
+                        # 同时清理之前归档时遗留的签名
+                        conn.execute('DELETE FROM main.job_minhash WHERE NOT EXISTS ('
+                                     'SELECT 1 FROM main.job_details j WHERE j."encryptJobId" = job_minhash."encryptJobId")')
+                    conn.execute("DROP TABLE temp.expired")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE archive")
+            logger.info(f"已归档 {report['archived_jobs']} 个岗位到 {archive_path}")
+
+        if vacuum:
+            start = time.perf_counter()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            # FTS5 索引段合并
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'job_details_fts'").fetchone():
+                conn.execute("INSERT INTO job_details_fts(job_details_fts) VALUES ('optimize')")
+            conn.execute("VACUUM")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            report["vacuum_seconds"] = time.perf_counter() - start
+        report["timings_after"] = measure_queries(conn)
+    finally:
+        conn.close()
+    report["size_after"] = database_size(db_path)
+    report["reclaimed"] = report["size_before"] - report["size_after"]
+    return report
@@ -0,0 +1,359 @@
+# db_migrations.py
+"""
+数据库版本迁移
+版本号保存在 SQLite 的 PRAGMA user_version 中，启动时在同一个事务内依次执行所有未应用的迁移。
+每个迁移都需要保证可重复执行（IF NOT EXISTS / 先检查列是否存在），
+新增表结构或索引时在文件末尾追加新的迁移，不要修改已发布的迁移。
+"""
+import logging
+logger = logging.getLogger(__name__)
+from typing import Callable, List, Tuple
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = []
+
+
+def migration(version: int, description: str):
+    """注册迁移"""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def get_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def column_exists(conn, table: str, column: str) -> bool:
+    rows = conn.exec_driver_sql(f'PRAGMA table_info("{table}")').fetchall()
+    return any(row[1] == column for row in rows)
+
+
+def add_column(conn, table: str, column: str, column_type: str) -> None:
+    """新增列（已存在时跳过）"""
+    if not column_exists(conn, table, column):
+        conn.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {column_type}')
+
+
+def migrate(engine) -> List[int]:
+    """
+    在一个事务内执行所有未应用的迁移
+    :return: 本次应用的版本号列表
+    """
+    pending = []
+    with engine.begin() as conn:
+        # pysqlite 不会为 DDL 自动开启事务，这里显式开启，同时阻止其他进程并发迁移
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        current = get_version(conn)
+        pending = [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] > current]
+        for version, description, func in pending:
+            logger.info(f"应用数据库迁移 v{version}: {description}")
+            func(conn)
+        if pending:
+            # PRAGMA 不支持参数绑定
+            conn.exec_driver_sql(f"PRAGMA user_version = {int(pending[-1][0])}")
+    return [m[0] for m in pending]
+
+
+_JOB_DETAILS_V1_COLUMNS = [
+    ("encryptJobId", "VARCHAR(64) NOT NULL"),
+    ("jobName", "VARCHAR(128)"),
+    ("salaryDesc", "VARCHAR(128)"),
+    ("companyName", "VARCHAR(128)"),
+    ("postDescription", "TEXT"),
+    ("cityName", "VARCHAR(64)"),
+    ("address", "VARCHAR(256)"),
+    ("experienceName", "VARCHAR(64)"),
+    ("degreeName", "VARCHAR(64)"),
+    ("companyTags", "TEXT"),
+    ("jobLabels", "TEXT"),
+    ("lid", "VARCHAR(64)"),
+    ("securityId", "VARCHAR(64)"),
+    ("encryptUserId", "VARCHAR(64)"),
+    ("bossName", "VARCHAR(64)"),
+    ("bossTitle", "VARCHAR(64)"),
+    ("bossAvatar", "VARCHAR(256)"),
+    ("activeTimeDesc", "VARCHAR(64)"),
+    ("visited", "BOOLEAN"),
+    ("analysisResult", "BOOLEAN"),
+    ("applied_account", "TEXT"),
+    ("updateTime", "DATETIME"),
+    ("first_added_time", "DATETIME"),
+    ("analysis_think", "TEXT"),
+]
+
+
+@migration(1, "创建 job_details 表")
+def _create_job_details(conn):
+    columns = ",\n".join(f'"{name}" {column_type}' for name, column_type in _JOB_DETAILS_V1_COLUMNS)
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS job_details (
+            {columns},
+            PRIMARY KEY ("encryptJobId")
+        )
+    """)
+    # 表已存在时（旧版本通过 create_all 建表）补齐缺少的列
+    for name, column_type in _JOB_DETAILS_V1_COLUMNS[1:]:
+        add_column(conn, "job_details", name, column_type)
+
+
+@migration(2, "job_details 查询索引")
+def _job_details_indexes(conn):
+    # export_to_xlsx: ORDER BY first_added_time DESC
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_job_details_first_added_time ON job_details (first_added_time)')
+    # 按更新时间的范围查询
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_job_details_update_time ON job_details ("updateTime")')
+    # 按公司查询/统计
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_job_details_company_name ON job_details ("companyName")')
+    # 按分析结果筛选，并按更新时间排序/过滤
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_job_details_analysis_update '
+        'ON job_details ("analysisResult", "updateTime")')
+    conn.exec_driver_sql("ANALYZE job_details")
+
+
+@migration(3, "按账号记录投递情况的 applications 表")
+def _create_applications(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS applications (
+            job_id VARCHAR(64) NOT NULL,
+            account_id VARCHAR(64) NOT NULL,
+            status VARCHAR(16) NOT NULL,
+            applied_at DATETIME NOT NULL,
+            PRIMARY KEY (job_id, account_id)
+        )
+    """)
+    # 按账号批量检查是否访问过，以及按账号查看投递历史
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_applications_account ON applications (account_id, applied_at)')
+    # 迁移 job_details.applied_account 中已有的记录（该字段只保存最后一个账号）
+    conn.exec_driver_sql("""
+        INSERT OR IGNORE INTO applications (job_id, account_id, status, applied_at)
+        SELECT "encryptJobId", applied_account, 'visited', COALESCE("updateTime", CURRENT_TIMESTAMP)
+        FROM job_details
+        WHERE visited AND applied_account IS NOT NULL AND applied_account != ''
+    """)
+
+
+@migration(4, "岗位原始数据归档 job_payloads 表")
+def _create_job_payloads(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS job_payloads (
+            "encryptJobId" VARCHAR(64) NOT NULL,
+            kind VARCHAR(8) NOT NULL,
+            content_hash CHAR(40) NOT NULL,
+            codec VARCHAR(8) NOT NULL,
+            payload BLOB NOT NULL,
+            fetched_at DATETIME NOT NULL,
+            PRIMARY KEY ("encryptJobId", kind, content_hash)
+        )
+    """)
+    # 按类型取每个岗位最新的归档
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_job_payloads_kind ON job_payloads (kind, "encryptJobId", fetched_at)')
+
+
+_FTS_COLUMN_NAMES = ['"jobName"', '"companyName"', '"postDescription"', 'analysis_think']
+_FTS_COLUMNS = ', '.join(_FTS_COLUMN_NAMES)
+
+
+@migration(5, "job_details 全文索引 job_details_fts")
+def _create_job_details_fts(conn):
+    # trigram 分词不依赖中文分词器，支持任意位置的子串匹配（检索词至少 3 个字符）
+    try:
+        conn.exec_driver_sql(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS job_details_fts USING fts5(
+                {_FTS_COLUMNS},
+                content='job_details', content_rowid='rowid', tokenize='trigram'
+            )
+        """)
+    except Exception as e:
+        # SQLite 未编译 FTS5 / 版本低于 3.34 时跳过，search_jobs 会退化为 LIKE 查询
+        logger.warning(f"当前 SQLite 不支持 FTS5 trigram，跳过全文索引: {e}")
+        return
+    new_values = ', '.join(f'new.{column}' for column in _FTS_COLUMN_NAMES)
+    old_values = ', '.join(f'old.{column}' for column in _FTS_COLUMN_NAMES)
+    # 外部内容表，通过触发器与 job_details 保持同步
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS job_details_fts_ai AFTER INSERT ON job_details BEGIN
+            INSERT INTO job_details_fts(rowid, {_FTS_COLUMNS}) VALUES (new.rowid, {new_values});
+        END
+    """)
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS job_details_fts_ad AFTER DELETE ON job_details BEGIN
+            INSERT INTO job_details_fts(job_details_fts, rowid, {_FTS_COLUMNS})
+            VALUES ('delete', old.rowid, {old_values});
+        END
+    """)
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS job_details_fts_au AFTER UPDATE OF {_FTS_COLUMNS} ON job_details BEGIN
+            INSERT INTO job_details_fts(job_details_fts, rowid, {_FTS_COLUMNS})
+            VALUES ('delete', old.rowid, {old_values});
+            INSERT INTO job_details_fts(rowid, {_FTS_COLUMNS}) VALUES (new.rowid, {new_values});
+        END
+    """)
+    conn.exec_driver_sql("INSERT INTO job_details_fts(job_details_fts) VALUES ('rebuild')")
+
+
+@migration(6, "增量导出水位 export_state 表")
+def _create_export_state(conn):
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS export_state (
+            name VARCHAR(32) NOT NULL PRIMARY KEY,
+            watermark_time DATETIME,
+            watermark_key VARCHAR(64),
+            exported_rows INTEGER NOT NULL DEFAULT 0,
+            exported_at DATETIME
+        )
+    """)
+
+
+@migration(7, "已归档岗位的去重表 archived_jobs")
+def _create_archived_jobs(conn):
+    # 归档后只保留去重所需的最小信息
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS archived_jobs (
+            "encryptJobId" VARCHAR(64) NOT NULL PRIMARY KEY,
+            visited BOOLEAN,
+            archived_at DATETIME NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+@migration(8, "AI 请求记录 ai_calls 表")
+def _create_ai_calls(conn):
+    # 每次模型请求一行，见 ai_ledger.py
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS ai_calls (
+            id INTEGER NOT NULL PRIMARY KEY,
+            run_id VARCHAR(32) NOT NULL,
+            created_at DATETIME NOT NULL,
+            call_type VARCHAR(16) NOT NULL,
+            job_id VARCHAR(64),
+            endpoint VARCHAR(64),
+            model VARCHAR(64),
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            usage_estimated BOOLEAN NOT NULL DEFAULT 0,
+            latency_ms REAL,
+            attempt INTEGER NOT NULL DEFAULT 1,
+            tries INTEGER NOT NULL DEFAULT 1,
+            outcome VARCHAR(16) NOT NULL,
+            error TEXT
+        )
+    """)
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_ai_calls_run ON ai_calls (run_id)")
+
+
+@migration(9, "相似岗位索引 job_minhash 表")
+def _create_job_minhash(conn):
+    from .near_dup import BANDS, minhash_row
+
+    band_columns = ", ".join(f"band{i} INTEGER NOT NULL" for i in range(BANDS))
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS job_minhash (
+            "encryptJobId" VARCHAR(64) NOT NULL PRIMARY KEY,
+            signature BLOB NOT NULL,
+            {band_columns}
+        )
+    """)
+    for i in range(BANDS):
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_job_minhash_band{i} ON job_minhash (band{i})")
+    # 为已有岗位计算签名
+    rows = conn.exec_driver_sql(
+        'SELECT "encryptJobId", "postDescription" FROM job_details WHERE "postDescription" IS NOT NULL').fetchall()
+    values = [row for row in (minhash_row(eid, description) for eid, description in rows) if row]
+    if values:
+        columns = list(values[0])
+        conn.exec_driver_sql(
+            'INSERT OR REPLACE INTO job_minhash (' + ", ".join(f'"{c}"' for c in columns) + ') '
+            'VALUES (' + ", ".join("?" * len(columns)) + ')',
+            [tuple(row[c] for c in columns) for row in values])
+        logger.info(f"已为 {len(values)} 个岗位计算相似度签名")
+
+
+@migration(10, "job_details 分析结果来源 analysis_source")
+def _add_analysis_source(conn):
+    add_column(conn, "job_details", "analysis_source", "VARCHAR(8)")
+    # 已有的分析结果按 analysis_think 的前缀区分规则判断和相似岗位复用，其余为 AI 分析
+    conn.exec_driver_sql("""
+        UPDATE job_details SET analysis_source = CASE
+            WHEN analysis_think LIKE '[规则判断]%' THEN 'rules'
+            WHEN analysis_think LIKE '[相似岗位%' THEN 'near_dup'
+            ELSE 'ai' END
+        WHERE "analysisResult" IS NOT NULL AND analysis_source IS NULL
+    """)
+
+
+@migration(11, "job_details 提交顺序 change_seq，增量导出水位改用 change_seq")
+def _add_change_seq(conn):
+    # updateTime 在写入排队时生成，提交顺序可能与之不同；change_seq 在写事务内由触发器分配，
+    # SQLite 同一时间只有一个写事务，因此 change_seq 的顺序就是提交顺序
+    add_column(conn, "job_details", "change_seq", "INTEGER")
+    rows = conn.exec_driver_sql(
+        'SELECT rowid FROM job_details WHERE change_seq IS NULL ORDER BY "updateTime", "encryptJobId"').fetchall()
+    start = conn.exec_driver_sql("SELECT COALESCE(MAX(change_seq), 0) FROM job_details").scalar()
+    if rows:
+        conn.exec_driver_sql("UPDATE job_details SET change_seq = ? WHERE rowid = ?",
+                             [(start + i, row[0]) for i, row in enumerate(rows, 1)])
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_job_details_change_seq ON job_details (change_seq)")
+    next_seq = "(SELECT COALESCE(MAX(change_seq), 0) + 1 FROM job_details)"
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS job_details_seq_ai AFTER INSERT ON job_details BEGIN
+            UPDATE job_details SET change_seq = {next_seq} WHERE rowid = new.rowid;
+        END
+    """)
+    # 只修改 change_seq 的更新不会再次触发（WHEN 条件不成立）
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS job_details_seq_au AFTER UPDATE ON job_details
+        WHEN new.change_seq IS old.change_seq BEGIN
+            UPDATE job_details SET change_seq = {next_seq} WHERE rowid = new.rowid;
+        END
+    """)
+
+    # 已有的 (updateTime, encryptJobId) 水位换算为已导出记录中最大的 change_seq
+    add_column(conn, "export_state", "watermark_seq", "INTEGER")
+    conn.exec_driver_sql("""
+        UPDATE export_state SET watermark_seq = (
+            SELECT COALESCE(MAX(j.change_seq), 0) FROM job_details j
+            WHERE j."updateTime" IS NULL OR j."updateTime" < export_state.watermark_time
+               OR (j."updateTime" = export_state.watermark_time
+                   AND j."encryptJobId" <= COALESCE(export_state.watermark_key, ''))
+        )
+        WHERE watermark_time IS NOT NULL AND watermark_seq IS NULL
+    """)
+
+
+@migration(12, "change_seq 改由计数表 change_counter 分配")
+def _add_change_counter(conn):
+    # v11 的触发器取 job_details 中现有的 MAX(change_seq) + 1，compact_database 归档了序号最大的岗位后
+    # 新的序号会回退到导出水位以下，增量导出漏掉这些岗位；计数表只增不减，与岗位是否归档无关
+    conn.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS change_counter (
+            id INTEGER NOT NULL PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    """)
+    conn.exec_driver_sql("""
+        INSERT OR IGNORE INTO change_counter (id, value) SELECT 1, MAX(
+            (SELECT COALESCE(MAX(change_seq), 0) FROM job_details),
+            (SELECT COALESCE(MAX(watermark_seq), 0) FROM export_state))
+    """)
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS job_details_seq_ai")
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS job_details_seq_au")
+    assign = """
+            UPDATE change_counter SET value = value + 1 WHERE id = 1;
+            UPDATE job_details SET change_seq = (SELECT value FROM change_counter WHERE id = 1)
+            WHERE rowid = new.rowid;
+    """
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER job_details_seq_ai AFTER INSERT ON job_details BEGIN {assign} END
+    """)
+    # 只修改 change_seq 的更新不会再次触发（WHEN 条件不成立）
+    conn.exec_driver_sql(f"""
+        CREATE TRIGGER job_details_seq_au AFTER UPDATE ON job_details
+        WHEN new.change_seq IS old.change_seq BEGIN {assign} END
+    """)
@@ -1,13 +1,22 @@
 # database_utils.py
 import logging
 logger = logging.getLogger(__name__)
-from sqlalchemy import create_engine, Column, String, Text, Boolean, DateTime, inspect, DDL
+from sqlalchemy import create_engine, Column, String, Text, Boolean, DateTime, DDL, event, case, LargeBinary, bindparam, \
+    Integer, Float, exists, select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from datetime import datetime
+from concurrent.futures import Future
+from datetime import datetime, timedelta
 import json
+import queue
+import threading
+import time
 from typing import List, Optional, Dict, Any
 import re
+from .db_migrations import migrate
+from .payload_archive import compress_payload, decompress_payload, KIND_LIST, KIND_CARD
+from .near_dup import BANDS, minhash_row, band_keys, similarity, signature_from_blob
 
 Base = declarative_base()
 
@@ -48,84 +57,341 @@ class JobDetail(Base):
     # 系统状态字段
     visited = Column(Boolean, default=False)
     analysisResult = Column(Boolean)
-    applied_account = Column(Text)
+    applied_account = Column(Text)  # 已废弃，按账号的访问记录见 Application
     updateTime = Column(DateTime, default=datetime.now)
     # 首次获取职位时的日期
     first_added_time = Column(DateTime)
     analysis_think = Column(Text)
+    # 分析结果来源：ai / rules（熔断期间的规则判断）/ near_dup（复用相似岗位的结果）
+    analysis_source = Column(String(8))
+    # 提交顺序，由触发器在写事务内从 change_counter 分配（v11/v12），增量导出的水位
+    change_seq = Column(Integer)
+
+
+class Application(Base):
+    """账号对岗位的访问/投递记录"""
+    __tablename__ = 'applications'
+    job_id = Column(String(64), primary_key=True)
+    account_id = Column(String(64), primary_key=True)
+    # applied / apply_failed / matched / not_matched / skipped，v3 从 applied_account 迁移来的旧记录为 visited
+    status = Column(String(16), nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class JobPayload(Base):
+    """岗位原始数据归档（压缩后的 JSON），见 payload_archive.py"""
+    __tablename__ = 'job_payloads'
+    encryptJobId = Column(String(64), primary_key=True)
+    kind = Column(String(8), primary_key=True)  # list / card
+    content_hash = Column(String(40), primary_key=True)
+    codec = Column(String(8), nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.now)
+
+
+class ArchivedJob(Base):
+    """已移到归档库的岗位，只保留去重所需的字段，见 db_maintenance.py"""
+    __tablename__ = 'archived_jobs'
+    encryptJobId = Column(String(64), primary_key=True)
+    visited = Column(Boolean)
+    archived_at = Column(DateTime, nullable=False)
+
+
+class AiCall(Base):
+    """模型请求记录，见 ai_ledger.py"""
+    __tablename__ = 'ai_calls'
+    id = Column(Integer, primary_key=True)
+    run_id = Column(String(32), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # hr_check / greeting / combined / resume_profile
+    call_type = Column(String(16), nullable=False)
+    job_id = Column(String(64))
+    endpoint = Column(String(64))
+    model = Column(String(64))
+    prompt_tokens = Column(Integer)
+    completion_tokens = Column(Integer)
+    usage_estimated = Column(Boolean, nullable=False, default=False)  # 响应没有 usage 时按字符数估算
+    latency_ms = Column(Float)
+    attempt = Column(Integer, nullable=False, default=1)  # 第几次重试
+    tries = Column(Integer, nullable=False, default=1)  # 尝试的端点数（切换/对冲）
+    # ok / cached / error / rejected（熔断期间拒绝）
+    outcome = Column(String(16), nullable=False)
+    error = Column(Text)
+
+
+class JobMinhash(Base):
+    """职位描述的 MinHash 签名，用于查找相似岗位，见 near_dup.py"""
+    __tablename__ = 'job_minhash'
+    encryptJobId = Column(String(64), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+    band0 = Column(Integer, nullable=False)
+    band1 = Column(Integer, nullable=False)
+    band2 = Column(Integer, nullable=False)
+    band3 = Column(Integer, nullable=False)
+    band4 = Column(Integer, nullable=False)
+    band5 = Column(Integer, nullable=False)
+    band6 = Column(Integer, nullable=False)
+    band7 = Column(Integer, nullable=False)
+
+
+class DatabaseWriter(threading.Thread):
+    """
+    单线程写入器
+    所有写操作进入队列，由该线程按组执行并一次提交，多个批次的写入共享同一次 commit
+    """
+    _STOP = object()
+
+    def __init__(self, session_factory, commit_interval: float = 0.5, max_group: int = 64):
+        super().__init__(daemon=True, name="db_writer")
+        self.Session = session_factory
+        self.commit_interval = commit_interval
+        self.max_group = max_group
+        self.queue = queue.Queue()
+        self.stats = {"commits": 0, "operations": 0}
+
+    def submit(self, func, *args) -> Future:
+        """提交写操作 func(session, *args)，返回 Future"""
+        future = Future()
+        self.queue.put((func, args, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None):
+        """等待此前提交的写操作全部落盘"""
+        self.submit(None).result(timeout)
+
+    def stop(self):
+        self.queue.put(self._STOP)
+        self.join()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is self._STOP:
+                break
+            group = [item]
+            stopping = False
+            deadline = time.monotonic() + self.commit_interval
+            # flush 标记到达时立即提交，否则在 commit_interval 内尽量合并更多写操作
+            while item[0] is not None and len(group) < self.max_group:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                group.append(item)
+            try:
+                self._commit_group(group)
+            except Exception as e:
+                # 提交或回滚本身失败（磁盘已满、数据库被锁定等）：本组未完成的写操作失败，写入线程继续处理后续写操作
+                logger.error(f"数据保存失败: {str(e)}")
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(RuntimeError(f"数据保存失败: {str(e)}"))
+            if stopping:
+                break
+
+    def _commit_group(self, group):
+        with self.Session() as session:
+            try:
+                results = [func(session, *args) if func else None for func, args, _ in group]
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                if len(group) > 1:
+                    # 逐个重试，避免一个失败的写操作拖累同组的其他批次
+                    for item in group:
+                        self._commit_group([item])
+                    return
+                logger.error(f"数据保存失败: {str(e)}")
+                group[0][2].set_exception(RuntimeError(f"数据保存失败: {str(e)}"))
+                return
+        self.stats["commits"] += 1
+        self.stats["operations"] += sum(1 for func, _, _ in group if func)
+        for (_, _, future), result in zip(group, results):
+            future.set_result(result)
 
 
 class DatabaseManager:
     """数据库管理类，提供优化的CRUD操作"""
     
-    def __init__(self, db_path: str):
-        self.engine = create_engine(f'sqlite:///{db_path}', pool_pre_ping=True)
+    def __init__(self, db_path: str, journal_mode: str = "WAL", synchronous: str = "NORMAL",
+                 cache_size_mb: int = 64, group_commit: bool = True, commit_interval: float = 0.5,
+                 archive_payloads: bool = True):
+        self.journal_mode = journal_mode
+        self.archive_payloads = archive_payloads
+        self.synchronous = synchronous
+        self.cache_size_mb = cache_size_mb
+        self.engine = create_engine(
+            f'sqlite:///{db_path}',
+            pool_pre_ping=True,
+            connect_args={"check_same_thread": False, "timeout": 30}
+        )
+        event.listen(self.engine, "connect", self._apply_pragmas)
         self._create_tables()
         self.Session = sessionmaker(bind=self.engine)
         self.userId = None
+        # 写操作交给独立线程合并提交；关闭时写操作在调用线程内直接提交
+        self.writer = None
+        if group_commit:
+            self.writer = DatabaseWriter(self.Session, commit_interval=commit_interval)
+            self.writer.start()
+
+    def _apply_pragmas(self, dbapi_connection, connection_record):
+        """每个新连接设置 SQLite 参数，WAL 模式下读操作不会阻塞写操作"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={self.synchronous}")
+        # 负数表示以 KiB 为单位
+        cursor.execute(f"PRAGMA cache_size=-{self.cache_size_mb * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    def _write(self, func, *args) -> Future:
+        """执行写操作：有写入线程时排队，否则同步提交"""
+        if self.writer:
+            return self.writer.submit(func, *args)
+        future = Future()
+        with self.Session() as session:
+            try:
+                result = func(session, *args)
+                session.commit()
+                future.set_result(result)
+            except Exception as e:
+                session.rollback()
+                raise RuntimeError(f"数据保存失败: {str(e)}")
+        return future
+
+    def flush(self):
+        """等待排队中的写操作全部提交"""
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        """提交剩余写操作并停止写入线程"""
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+        self.engine.dispose()
 
     def _create_tables(self):
-        """确保表结构存在并自动添加新增列"""
-        with self.engine.begin() as conn:
-            inspector = inspect(conn)
-            table_name = JobDetail.__tablename__
-            
-            # 创建表（如果不存在）
-            if not inspector.has_table(table_name):
-                Base.metadata.create_all(conn)
-            # 表结构变更 #TODO
+        """创建表结构并应用未执行的数据库迁移（见 db_migrations.py）"""
+        applied = migrate(self.engine)
+        if applied:
+            logger.info(f"数据库已迁移到 v{applied[-1]}")
+        with self.engine.connect() as conn:
+            self.fts_enabled = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = 'job_details_fts'").first() is not None
 
 
-    def save_jobs_details(self, jobs: List[Dict], jobs_details: List[Dict]) -> None:
+    def save_jobs_details(self, jobs: List[Dict], jobs_details: List[Dict], account_id: Optional[str] = None) -> Future:
         """
         保存工作详情及基础数据，进行插入或更新操作
+        :param account_id: 当前账号，有详细数据的岗位会记录到 applications 表
         """
+        account_id = account_id or self.userId
         if not jobs:
             raise ValueError("jobs不能为空")
         if not jobs_details:
             jobs_details = []
-        with self.Session() as session:
+        payloads = []
+        # 构建基础数据字典
+        job_dict = {
+            self.parseParams(job["job_link"])[0]: self._build_base_job(job)
+            for job in jobs
+        }
+        if self.archive_payloads:
+            # 列表接口的原始条目（main.py 中放在 raw 字段）
+            for job in jobs:
+                if job.get('raw'):
+                    eid = self.parseParams(job["job_link"])[0]
+                    payloads.append(self._build_payload(eid, KIND_LIST, job['raw']))
+
+        # 合并详细数据
+        records = []
+        applications = []
+        signatures = []
+        processed_ids=set()
+        for detail in jobs_details:
+            if not isinstance(detail, dict):  # 类型安全检查
+                detail = json.loads(detail)
+            
             try:
-                # 构建基础数据字典
-                job_dict = {
-                    self.parseParams(job["job_link"])[0]: self._build_base_job(job)
-                    for job in jobs
-                }
-
-                # 合并详细数据
-                records = []
-                processed_ids=set()
-                for detail in jobs_details:
-                    if not isinstance(detail, dict):  # 类型安全检查
-                        detail = json.loads(detail)
-                    
-                    try:
-                        card = detail.get('job_data', {}).get('zpData', {}).get('jobCard')
-                        eid = card.get('encryptJobId')
-                    except:
-                        logger.error(f'{detail["job_id"]},不含详细信息')
-                        continue
-                    
-                    # 记录已处理ID
-                    processed_ids.add(eid)
-                    
-                    # 合并基础数据和详细数据
-                    record = job_dict.get(eid, {})
-                    record.update(self._build_detail_data(card, detail))
-                    records.append(record)
-
-                # 新增：补充未处理的纯基础数据（仅当有基础数据且无详细数据时）
-                for eid, base_data in job_dict.items():
-                    if eid not in processed_ids:
-                        # 确保基础数据有效性
-                        if base_data.get('encryptJobId') and base_data.get('jobName'):
-                            records.append(base_data)
-                self._upsert_records(session, [r for r in records if r.get('encryptJobId')])
-                session.commit()
-                
-            except Exception as e:
-                session.rollback()
-                raise RuntimeError(f"数据保存失败: {str(e)}")
+                card = detail.get('job_data', {}).get('zpData', {}).get('jobCard')
+                eid = card.get('encryptJobId')
+            except:
+                logger.error(f'{detail["job_id"]},不含详细信息')
+                continue
+            
+            # 记录已处理ID
+            processed_ids.add(eid)
+            
+            # 合并基础数据和详细数据
+            record = job_dict.get(eid, {})
+            record.update(self._build_detail_data(card, detail))
+            records.append(record)
+            # 复用归档的详情不重新归档，否则 fetched_at 会被刷新
+            if self.archive_payloads and eid and not detail.get('from_cache'):
+                payloads.append(self._build_payload(eid, KIND_CARD, card))
+            signature = minhash_row(eid, card.get('postDescription')) if eid else None
+            if signature:
+                signatures.append(signature)
+            # 暂缓分析的岗位（AI服务熔断）不记录访问
+            if account_id and eid and not detail.get('parked'):
+                applications.append({
+                    'job_id': eid,
+                    'account_id': str(account_id),
+                    'status': self._application_status(detail),
+                    'applied_at': datetime.now(),
+                })
+
+        # 新增：补充未处理的纯基础数据（仅当有基础数据且无详细数据时）
+        for eid, base_data in job_dict.items():
+            if eid not in processed_ids:
+                # 确保基础数据有效性
+                if base_data.get('encryptJobId') and base_data.get('jobName'):
+                    records.append(base_data)
+        return self._write(self._save_batch, [r for r in records if r.get('encryptJobId')], applications, payloads,
+                           signatures)
+
+    def _save_batch(self, session, records: List[Dict], applications: List[Dict], payloads: List[Dict],
+                    signatures: List[Dict]) -> None:
+        self._upsert_records(session, records)
+        self._upsert_applications(session, applications)
+        self._insert_payloads(session, payloads)
+        if signatures:
+            stmt = sqlite_insert(JobMinhash.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["encryptJobId"],
+                set_={column: stmt.excluded[column] for column in signatures[0] if column != "encryptJobId"})
+            session.execute(stmt, signatures)
+
+    @staticmethod
+    def _build_payload(eid: str, kind: str, payload: Dict) -> Dict:
+        content_hash, codec, data = compress_payload(payload)
+        return {
+            'encryptJobId': eid,
+            'kind': kind,
+            'content_hash': content_hash,
+            'codec': codec,
+            'payload': data,
+            'fetched_at': datetime.now(),
+        }
+
+    @staticmethod
+    def _application_status(detail: Dict) -> str:
+        """根据处理结果确定投递状态"""
+        applied_result = detail.get('applied_result')
+        if applied_result is not None:
+            return 'applied' if applied_result.get('code') == 0 else 'apply_failed'
+        if detail.get('analysis_result') is None:
+            return 'skipped'
+        # 匹配但没有投递请求的结果（如生成打招呼语时出错），与投递失败区分
+        return 'matched' if detail.get('analysis_result') else 'not_matched'
 
     def _build_base_job(self, job: Dict) -> Dict:
         """构建基础数据记录"""
@@ -156,32 +422,132 @@ class DatabaseManager:
             'bossTitle': card.get('bossTitle'),
             'bossAvatar': card.get('bossAvatar', ''),
             'analysisResult':detail.get("analysis_result"),
-            'applied_account': self.userId,#用户id
-            'visited': True,
+            'analysis_source': detail.get("analysis_source"),
+            'visited': not detail.get('parked'),
             "activeTimeDesc":card.get("activeTimeDesc"),
             'analysis_think': detail.get("analysis_think","")
         }
 
     def _upsert_records(self, session, records: List[Dict]) -> None:
-        """插入或更新记录"""
+        """插入或更新记录（INSERT ... ON CONFLICT DO UPDATE，按字段集合分组批量执行）"""
+        groups = {}
         for record in records:
             if not record.get('encryptJobId'):
                 continue
+            groups.setdefault(tuple(sorted(record)), []).append(record)
 
-            # 判断该记录是否已存在
-            existing = session.query(JobDetail).filter_by(encryptJobId=record['encryptJobId']).first()
+        table = JobDetail.__table__
+        for keys, rows in groups.items():
+            stmt = sqlite_insert(table)
+            # 更新时忽略first_added_time
+            update_columns = {
+                key: stmt.excluded[key]
+                for key in keys
+                if key not in ("encryptJobId", "first_added_time")
+            }
+            stmt = stmt.on_conflict_do_update(index_elements=["encryptJobId"], set_=update_columns)
+            session.execute(stmt, rows)
+
+    def _upsert_applications(self, session, applications: List[Dict]) -> None:
+        """记录账号访问情况，已投递成功的状态与时间不会被后续访问覆盖"""
+        if not applications:
+            return
+        table = Application.__table__
+        stmt = sqlite_insert(table)
+        keep_applied = table.c.status == 'applied'
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["job_id", "account_id"],
+            set_={
+                'status': case((keep_applied, table.c.status), else_=stmt.excluded.status),
+                'applied_at': case((keep_applied, table.c.applied_at), else_=stmt.excluded.applied_at),
+            }
+        )
+        session.execute(stmt, applications)
+
+    def _insert_payloads(self, session, payloads: List[Dict]) -> None:
+        """归档原始数据，内容相同（哈希相同）时只更新获取时间"""
+        if not payloads:
+            return
+        stmt = sqlite_insert(JobPayload.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["encryptJobId", "kind", "content_hash"],
+            set_={'fetched_at': stmt.excluded.fetched_at}
+        )
+        session.execute(stmt, payloads)
+
+    def iter_payloads(self, kind: str = KIND_CARD, job_ids: Optional[List[str]] = None):
+        """
+        读取每个岗位最新的归档数据
+        :return: 迭代 (encryptJobId, fetched_at, 原始数据字典)
+        """
+        sql = ('SELECT "encryptJobId", codec, payload, MAX(fetched_at) FROM job_payloads '
+               'WHERE kind = ?')
+        params = [kind]
+        if job_ids is not None:
+            if not job_ids:
+                return
+            sql += f' AND "encryptJobId" IN ({",".join("?" * len(job_ids))})'
+            params.extend(job_ids)
+        # SQLite 中与 MAX() 同时查询的列取自最大值所在的行
+        sql += ' GROUP BY "encryptJobId"'
+        with self.engine.connect() as conn:
+            for eid, codec, data, fetched_at in conn.exec_driver_sql(sql, tuple(params)):
+                yield eid, fetched_at, decompress_payload(codec, data)
+
+    def get_fresh_cards(self, jobs: List[Dict], ttl: timedelta) -> Dict[str, Dict]:
+        """
+        查找可以直接复用的岗位详情：归档的 jobCard 在 ttl 内获取过，且列表中的岗位名称/薪资与 jobCard 中的一致
+        （job_details 会被之后列表的基础数据覆盖，不能用来判断详情是否过期）
+        :param jobs: 列表接口的岗位（job_link / job_name / job_salary）
+        :return: {encryptJobId: jobCard}
+        """
+        listed = {self.parseParams(job["job_link"])[0]: job for job in jobs}
+        if not listed or ttl <= timedelta(0):
+            return {}
+        # 通过 DateTime 列类型读取，fetched_at 为 datetime，与 cutoff 按时间比较
+        latest = func.max(JobPayload.fetched_at)
+        stmt = (
+            select(JobPayload.encryptJobId, JobPayload.codec, JobPayload.payload, latest)
+            .where(JobPayload.kind == KIND_CARD, JobPayload.encryptJobId.in_(list(listed)))
+            .group_by(JobPayload.encryptJobId)
+        )
+        cutoff = datetime.now() - ttl
+        fresh = {}
+        with self.engine.connect() as conn:
+            for eid, codec, data, fetched_at in conn.execute(stmt):
+                if fetched_at is None or fetched_at < cutoff:
+                    continue
+                card = decompress_payload(codec, data)
+                job = listed[eid]
+                if job.get('job_name') != card.get('jobName') or job.get('job_salary') != card.get('salaryDesc'):
+                    continue
+                fresh[eid] = card
+        return fresh
+
+    def update_analysis(self, results: List[tuple]) -> Future:
+        """
+        写回重新分析的结果
+        :param results: [(encryptJobId, 分析结果, 思考过程), ...]
+        """
+        rows = [{'eid': eid, 'result': result, 'think': think} for eid, result, think in results]
+        return self._write(self._update_analysis, rows)
+
+    @staticmethod
+    def _update_analysis(session, rows: List[Dict]) -> None:
+        table = JobDetail.__table__
+        stmt = table.update().where(table.c.encryptJobId == bindparam('eid')).values(
+            analysisResult=bindparam('result'), analysis_think=bindparam('think'), analysis_source='ai',
+            updateTime=datetime.now())
+        session.execute(stmt, rows)
+
+    def record_ai_calls(self, rows: List[Dict]) -> Future:
+        """写入模型请求记录"""
+        return self._write(self._insert_ai_calls, rows)
+
+    @staticmethod
+    def _insert_ai_calls(session, rows: List[Dict]) -> None:
+        session.execute(AiCall.__table__.insert(), rows)
 
-            if existing:
-                # 更新现有记录
-                for key, value in record.items():
-                    # 忽略first_added_time
-                    if key == "first_added_time":
-                        continue
-                    setattr(existing, key, value)
-            else:
-                # 插入新记录
-                new_record = JobDetail(**record)
-                session.add(new_record)
     @staticmethod
     def parseParams(link):
         """
@@ -191,25 +557,113 @@ class DatabaseManager:
         match = re.search(pattern, link)
         return match.groups() if match else None
 
+    def visited_ids(self, job_ids: List[str], user_id=None) -> set:
+        """
+        批量查询已访问过的岗位
+        有user_id时查询该账号的访问记录（applications 主键索引），没有时只验证visited，两者都包括已归档的岗位
+        升级前访问过的岗位没有 applications 记录（applied_account 为空），对所有账号都视为已访问
+        """
+        if not job_ids:
+            return set()
+        with self.Session() as session:
+            if user_id:
+                # applications 在归档时保持不变，已归档岗位的按账号记录仍然在该表中
+                query = session.query(Application.job_id).filter(
+                    Application.account_id == str(user_id),
+                    Application.job_id.in_(job_ids)
+                ).union(session.query(JobDetail.encryptJobId).filter(
+                    JobDetail.visited.is_(True),
+                    JobDetail.encryptJobId.in_(job_ids),
+                    ~exists().where(Application.job_id == JobDetail.encryptJobId)
+                ), session.query(ArchivedJob.encryptJobId).filter(
+                    ArchivedJob.visited.is_(True),
+                    ArchivedJob.encryptJobId.in_(job_ids),
+                    ~exists().where(Application.job_id == ArchivedJob.encryptJobId)
+                ))
+            else:
+                query = session.query(JobDetail.encryptJobId).filter(
+                    JobDetail.visited.is_(True),
+                    JobDetail.encryptJobId.in_(job_ids)
+                ).union(session.query(ArchivedJob.encryptJobId).filter(
+                    ArchivedJob.visited.is_(True),
+                    ArchivedJob.encryptJobId.in_(job_ids)
+                ))
+            return {row[0] for row in query}
+
+    # 全文检索结果的 bm25 列权重: jobName, companyName, postDescription, analysis_think
+    SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 0.5)
+    SEARCH_COLUMNS = ('jobName', 'companyName', 'postDescription', 'analysis_think')
+
+    def search_jobs(self, query: str, limit: int = 20, raw: bool = False) -> List[Dict]:
+        """
+        全文检索岗位，按相关度排序
+        :param query: 空格分隔的检索词（AND）。trigram 索引要求检索词至少 3 个字符，更短的词用 LIKE 过滤
+        :param raw: 为 True 时 query 直接作为 FTS5 查询表达式
+        :return: [{'encryptJobId', 'jobName', 'companyName', 'salaryDesc', 'cityName', 'snippet', 'rank'}, ...]
+        """
+        terms = query.split()
+        fts_terms = [query] if raw else [t for t in terms if len(t) >= 3]
+        like_terms = [] if raw else [t for t in terms if len(t) < 3]
+        columns = 'j."encryptJobId", j."jobName", j."companyName", j."salaryDesc", j."cityName"'
+        params = []
+        if fts_terms and self.fts_enabled:
+            match = query if raw else ' '.join('"' + t.replace('"', '""') + '"' for t in fts_terms)
+            sql = (f"SELECT {columns}, snippet(job_details_fts, -1, '[', ']', '…', 24), "
+                   f"bm25(job_details_fts, {', '.join(map(str, self.SEARCH_WEIGHTS))}) AS rank "
+                   "FROM job_details_fts JOIN job_details j ON j.rowid = job_details_fts.rowid "
+                   "WHERE job_details_fts MATCH ?")
+            params.append(match)
+        else:
+            # 没有可用的全文索引词，退化为扫描 job_details
+            like_terms = terms
+            sql = f'SELECT {columns}, substr(j."postDescription", 1, 48), 0 AS rank FROM job_details j WHERE 1'
+        for term in like_terms:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            sql += ' AND (' + ' OR '.join(f'j."{c}" LIKE ? ESCAPE \'\\\'' for c in self.SEARCH_COLUMNS) + ')'
+            params.extend([pattern] * len(self.SEARCH_COLUMNS))
+        sql += ' ORDER BY rank, j."updateTime" DESC LIMIT ?'
+        params.append(limit)
+        keys = ('encryptJobId', 'jobName', 'companyName', 'salaryDesc', 'cityName', 'snippet', 'rank')
+        with self.engine.connect() as conn:
+            return [dict(zip(keys, row)) for row in conn.exec_driver_sql(sql, tuple(params))]
+
+    def find_near_duplicate(self, job_id: str, signature, threshold: float,
+                            company: Optional[str] = None) -> Optional[Dict]:
+        """
+        查找已分析过的相似岗位，只使用 AI 分析的结果（不包括规则判断和复用的结果）
+        :param signature: 职位描述的 MinHash 签名（near_dup.minhash）
+        :param threshold: 估算的 Jaccard 相似度下限
+        :param company: 不为空时只在同一公司的岗位中查找
+        :return: 相似度最高的岗位 {'encryptJobId', 'jobName', 'analysisResult', 'analysis_think', 'similarity'}
+        """
+        keys = band_keys(signature)
+        sql = ('SELECT m."encryptJobId", m.signature, j."jobName", j."analysisResult", j.analysis_think '
+               'FROM job_minhash m JOIN job_details j ON j."encryptJobId" = m."encryptJobId" '
+               'WHERE (' + ' OR '.join(f'm.band{i} = ?' for i in range(BANDS)) + ') '
+               'AND m."encryptJobId" != ? AND j."analysisResult" IS NOT NULL AND j.analysis_source = \'ai\'')
+        params = [*keys, job_id]
+        if company:
+            sql += ' AND j."companyName" = ?'
+            params.append(company)
+        best = None
+        with self.engine.connect() as conn:
+            for eid, blob, job_name, result, think in conn.exec_driver_sql(sql, tuple(params)):
+                score = similarity(signature, signature_from_blob(blob))
+                if score >= threshold and (best is None or score > best['similarity']):
+                    best = {'encryptJobId': eid, 'jobName': job_name, 'analysisResult': bool(result),
+                            'analysis_think': think, 'similarity': score}
+        return best
+
     def check_visited(self, job_id, user_id=None):
-        session = self.Session()
-        try:
-            job = session.query(JobDetail).get(job_id)
-            if not job:
-                return False
-            # 当有user_id时验证双重条件，没有时只验证visited
-            return job.visited and (str(user_id) in job.applied_account if user_id else True)
-        finally:
-            session.close()
+        return job_id in self.visited_ids([job_id], user_id)
 
     def filter_visited(self, jobs, user_id=None):
+        job_ids = [self.parseParams(job["job_link"])[0] for job in jobs]
+        visited = self.visited_ids(job_ids, user_id)
         filteredJobs = []
-        for job in jobs:
+        for job, job_id in zip(jobs, job_ids):
             job_name = job['job_name']
-            job_id = self.parseParams(job["job_link"])[0]
-            checkResult = self.check_visited(job_id, user_id)
-            
-            if checkResult:
+            if job_id in visited:
                 log_msg = f"该账号已经访问过 招聘岗位: {job_name}" if user_id else f"已经访问过 招聘岗位: {job_name}"
                 logger.info(log_msg)
             else:
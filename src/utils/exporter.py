@@ -0,0 +1,227 @@
+# exporter.py
+"""
+增量导出与 Parquet 导出
+以 change_seq 作为水位，每次只读取上次导出之后新增或更新过的记录（使用 ix_job_details_change_seq 索引），
+导出耗时只与变化的记录数有关。不同的导出目标（xlsx / parquet 等）分别在 export_state 表中保存各自的水位。
+change_seq 由触发器在写事务内从计数表 change_counter 分配（只增不减，归档岗位后也不会回退），顺序与提交顺序一致；updateTime 在写入排队时生成，与导出并发时
+之后提交的记录可能带有更早的 updateTime，不能作为水位。
+
+Parquet 导出需要安装 pyarrow，按批次流式写入，低基数列使用字典编码：
+    <导出目录>/parquet/<表名>/part-*.parquet
+全量导出会替换该表已有的分片，增量导出追加一个分片；读取时用 read_parquet_table 按主键保留最新记录。
+"""
+import datetime
+import glob
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+def get_watermark(conn, name: str) -> Optional[int]:
+    """读取导出水位（已导出的最大 change_seq），从未导出过时返回 None"""
+    row = conn.execute("SELECT watermark_seq FROM export_state WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(conn, name: str, watermark: int, rows: int) -> None:
+    """保存导出水位，需要调用方在导出文件写入成功后提交"""
+    conn.execute("""
+        INSERT INTO export_state (name, watermark_seq, exported_rows, exported_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            watermark_seq = excluded.watermark_seq,
+            exported_rows = export_state.exported_rows + excluded.exported_rows,
+            exported_at = excluded.exported_at
+    """, (name, int(watermark), rows, datetime.datetime.now().isoformat(sep=" ")))
+
+
+def reset_watermark(conn, name: str) -> None:
+    """清除水位，下次增量导出会导出全部记录"""
+    conn.execute("DELETE FROM export_state WHERE name = ?", (name,))
+
+
+def changed_rows_query(watermark: Optional[int], columns: str = "*", table: str = "job_details") -> Tuple[str, List]:
+    """
+    构建读取水位之后变化记录的查询，结果按 change_seq 排列，最后一条记录的 change_seq 即新的水位
+    :return: (sql, params)
+    """
+    sql = f'SELECT {columns} FROM {table}'
+    params = []
+    if watermark is not None:
+        sql += ' WHERE change_seq > ?'
+        params = [watermark]
+    sql += ' ORDER BY change_seq'
+    return sql, params
+
+
+# Parquet 导出的表：列类型（string / dict / bool / int / float / timestamp）、主键、是否按水位增量导出
+PARQUET_TABLES: Dict[str, Dict] = {
+    "job_details": {
+        "columns": {
+            "encryptJobId": "string", "jobName": "string", "salaryDesc": "dict", "companyName": "string",
+            "postDescription": "string", "cityName": "dict", "address": "string", "experienceName": "dict",
+            "degreeName": "dict", "companyTags": "string", "jobLabels": "string", "lid": "string",
+            "securityId": "string", "encryptUserId": "string", "bossName": "string", "bossTitle": "string",
+            "bossAvatar": "string", "activeTimeDesc": "dict", "visited": "bool", "analysisResult": "bool",
+            "updateTime": "timestamp", "first_added_time": "timestamp", "analysis_think": "string",
+            "change_seq": "int",
+        },
+        "key": ["encryptJobId"],
+        "incremental": True,
+    },
+    "applications": {
+        "columns": {"job_id": "string", "account_id": "dict", "status": "dict", "applied_at": "timestamp"},
+        "key": ["job_id", "account_id"],
+        "incremental": False,
+    },
+    "ai_calls": {
+        "columns": {
+            "id": "int", "run_id": "dict", "created_at": "timestamp", "call_type": "dict", "job_id": "string",
+            "endpoint": "dict", "model": "dict", "prompt_tokens": "int", "completion_tokens": "int",
+            "usage_estimated": "bool", "latency_ms": "float", "attempt": "int", "tries": "int",
+            "outcome": "dict", "error": "string",
+        },
+        "key": ["id"],
+        "incremental": False,
+    },
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet 导出需要安装 pyarrow: pip install pyarrow")
+
+
+def _arrow_type(kind: str):
+    return {
+        "string": pa.string(),
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+        "bool": pa.bool_(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "timestamp": pa.timestamp("us"),
+    }[kind]
+
+
+def _arrow_array(values: List, kind: str):
+    if kind == "dict":
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    if kind == "timestamp":
+        # SQLite 中以文本保存，格式不规范的值置空
+        array = pa.array([v if v else None for v in values], type=pa.string())
+        try:
+            return array.cast(pa.timestamp("us"))
+        except pa.ArrowInvalid:
+            import pandas as pd
+            return pa.array(pd.to_datetime(array.to_pandas(), errors="coerce"), type=pa.timestamp("us"))
+    if kind == "bool":
+        values = [None if v is None else bool(v) for v in values]
+    return pa.array(values, type=_arrow_type(kind))
+
+
+def _existing_columns(conn, table: str, columns: Dict[str, str]) -> Dict[str, str]:
+    """只导出数据库中存在的列"""
+    names = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+    return {name: kind for name, kind in columns.items() if name in names}
+
+
+def export_parquet(db_path: str, export_dir: str, incremental: bool = False,
+                   tables: Optional[List[str]] = None, batch_size: int = 10000) -> Dict[str, int]:
+    """
+    导出为 Parquet 数据集
+    :param incremental: job_details 只导出上次 Parquet 导出后变化的记录（追加分片），其他表总是全量
+    :param tables: 要导出的表，默认 PARQUET_TABLES 中数据库已有的表
+    :return: {表名: 导出行数}
+    """
+    _require_pyarrow()
+    exported = {}
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    conn = sqlite3.connect(db_path)
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in tables or PARQUET_TABLES:
+            if table not in existing:
+                continue
+            spec = PARQUET_TABLES[table]
+            columns = _existing_columns(conn, table, spec["columns"])
+            schema = pa.schema([(name, _arrow_type(kind)) for name, kind in columns.items()])
+            column_sql = ", ".join(f'"{name}"' for name in columns)
+            table_incremental = incremental and spec["incremental"]
+            watermark_name = f"parquet:{table}"
+            if spec["incremental"]:
+                watermark = get_watermark(conn, watermark_name) if table_incremental else None
+                sql, params = changed_rows_query(watermark, column_sql, table)
+            else:
+                sql, params = f"SELECT {column_sql} FROM {table}", []
+
+            table_dir = os.path.join(export_dir, "parquet", table)
+            os.makedirs(table_dir, exist_ok=True)
+            suffix = "delta" if table_incremental else "full"
+            path = os.path.join(table_dir, f"part-{timestamp}-{suffix}.parquet")
+            tmp_path = path + ".tmp"
+            rows, last = _write_parquet(conn.execute(sql, params), columns, schema, tmp_path, batch_size)
+            if rows == 0 and table_incremental:
+                os.remove(tmp_path)
+                exported[table] = 0
+                continue
+            os.replace(tmp_path, path)
+            if not table_incremental:
+                # 全量分片写入成功后删除旧分片
+                for old in glob.glob(os.path.join(table_dir, "part-*.parquet")):
+                    if old != path:
+                        os.remove(old)
+            if spec["incremental"] and rows:
+                if not table_incremental:
+                    reset_watermark(conn, watermark_name)
+                set_watermark(conn, watermark_name, last[list(columns).index("change_seq")], rows)
+                conn.commit()
+            exported[table] = rows
+            logger.info(f"{table}: 导出 {rows} 行到 {path}")
+    finally:
+        conn.close()
+    return exported
+
+
+def _write_parquet(cursor, columns: Dict[str, str], schema, path: str, batch_size: int):
+    """按批次读取游标并写入 Parquet，内存占用只与 batch_size 有关"""
+    names = list(columns)
+    kinds = list(columns.values())
+    dictionary_columns = [name for name, kind in columns.items() if kind == "dict"]
+    rows, last = 0, None
+    with pq.ParquetWriter(path, schema, compression="zstd", use_dictionary=dictionary_columns or False) as writer:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            values = list(zip(*batch))
+            arrays = [_arrow_array(list(values[i]), kinds[i]) for i in range(len(names))]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            rows += len(batch)
+            last = batch[-1]
+    return rows, last
+
+
+def read_parquet_table(export_dir: str, table: str = "job_details", latest_only: bool = True):
+    """
+    读取 Parquet 数据集为 pandas DataFrame
+    :param latest_only: 增量分片中同一主键可能出现多次，只保留最后提交（change_seq 最大）的一条，
+        没有 change_seq 的旧分片按 updateTime
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    spec = PARQUET_TABLES[table]
+    dataset = ds.dataset(os.path.join(export_dir, "parquet", table), format="parquet")
+    df = dataset.to_table().to_pandas()
+    if latest_only and spec["incremental"] and not df.empty:
+        order = "change_seq" if "change_seq" in df.columns else "updateTime"
+        df = df.sort_values(order, kind="stable", na_position="first").drop_duplicates(spec["key"], keep="last")
+    return df.reset_index(drop=True)
@@ -6,17 +6,13 @@ import os
 import re
 import threading
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import itertools
 from urllib.parse import urlencode
 
 # 第三方库导入
 import asyncio
-import aiohttp
 import pandas as pd
-import requests
-from requests_toolbelt.multipart.encoder import MultipartEncoder
-import mimetypes
 import yaml
 from playwright.async_api import async_playwright, Page
 import datetime
@@ -27,11 +23,10 @@ import sqlite3
 
 # 本地模块导入
 from utils.session_manager import SessionManager
+from utils.exporter import get_watermark, set_watermark, changed_rows_query
+from utils.zhipin_client import ZhipinClient, TokenBucket, run_sync
 logger = logging.getLogger(__name__)
 
-# 定义基础URL
-BASE_URL = 'https://www.zhipin.com'
-
 
 def save_jobs_to_csv(jobs: List[Dict], filename: str = 'jobs.csv') -> None:
     """
@@ -46,23 +41,46 @@ def save_jobs_to_csv(jobs: List[Dict], filename: str = 'jobs.csv') -> None:
     except Exception as e:
         logger.error(f"导出 CSV 文件时发生错误：{e}")
 
-def export_to_xlsx(db_path, export_dir):
+def export_to_xlsx(db_path, export_dir, incremental=False):
     """
     将 SQLite 数据库中的 job_details 表导出为 XLSX 文件，并应用筛选和格式化。
 
     Args:
         db_path (str): SQLite 数据库文件路径。
         export_dir (str): 要保存 XLSX 文件的目录路径。
-    """
-    timestamp = datetime.datetime.now().strftime("%H%M")
-    filename = f"jobs_{timestamp}.xlsx"
-    xlsx_path = os.path.join(export_dir, filename)
+        incremental (bool): 只导出上次导出之后新增或更新的岗位，写入 jobs_delta_*.xlsx。
 
+    Returns:
+        导出的文件路径，增量导出没有变化时返回 None。
+    """
     conn = sqlite3.connect(db_path)
-    df = pd.read_sql_query("SELECT * FROM job_details ORDER BY first_added_time DESC", conn)
-    df.to_excel(xlsx_path, index=False, engine='openpyxl')
-    conn.close()
-
+    try:
+        if incremental:
+            sql, params = changed_rows_query(get_watermark(conn, "xlsx"))
+            df = pd.read_sql_query(sql, conn, params=params)
+            if df.empty:
+                logger.info("没有新增或更新的岗位，跳过导出")
+                return None
+            filename = f"jobs_delta_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        else:
+            df = pd.read_sql_query("SELECT * FROM job_details ORDER BY first_added_time DESC", conn)
+            timestamp = datetime.datetime.now().strftime("%H%M")
+            filename = f"jobs_{timestamp}.xlsx"
+        xlsx_path = os.path.join(export_dir, filename)
+        df.to_excel(xlsx_path, index=False, engine='openpyxl')
+        _format_xlsx(xlsx_path)
+
+        if incremental:
+            # 文件写入成功后才推进水位
+            set_watermark(conn, "xlsx", df["change_seq"].iloc[-1], len(df))
+            conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"数据已成功导出并格式化到 {xlsx_path}（{len(df)} 条）")
+    return xlsx_path
+
+
+def _format_xlsx(xlsx_path):
     workbook = load_workbook(xlsx_path)
     worksheet = workbook.active
     cols_to_format = ['postDescription', 'analysis_think']
@@ -80,7 +98,6 @@ def export_to_xlsx(db_path, export_dir):
         for cell in row:        # 遍历行中的每个单元格
             cell.alignment = center_alignment
     workbook.save(xlsx_path)
-    logger.info(f"数据已成功导出并格式化到 {xlsx_path}")
 
 
 
@@ -397,6 +414,52 @@ async def next_page(page: Page):
         return False
 
 
+def parse_salary(job_salary: str) -> Optional[Tuple[float, float]]:
+    """
+    将薪资描述换算为月薪范围（单位：K）
+    :return: (最低月薪, 最高月薪)，未知格式返回 None；数值解析失败时抛出 ValueError / IndexError
+    """
+    # 预处理：去除类似"·13薪"的后缀
+    job_salary = re.sub(r'·\d+薪', '', job_salary)
+
+    # 统一转换为小写方便处理
+    salary_str = job_salary.lower()
+
+    if '元/天' in salary_str:
+        # 日薪处理（按22工作日/月）
+        daily = salary_str.replace('元/天', '')
+        daily_range = [float(x) for x in daily.split('-')]
+        min_d = daily_range[0]
+        max_d = daily_range[-1]  # 处理单值和范围
+        return min_d * 22 / 1000, max_d * 22 / 1000
+
+    elif 'k' in salary_str:
+        # K表示的月薪
+        k_str = salary_str.replace('k', '')
+        k_range = [float(x) for x in k_str.split('-')]
+        return k_range[0], k_range[-1]
+
+    elif '元/月' in salary_str:
+        # 直接月薪
+        monthly = salary_str.replace('元/月', '')
+        monthly_range = [float(x) for x in monthly.split('-')]
+        return monthly_range[0] / 1000, monthly_range[-1] / 1000
+
+    elif '元/周' in salary_str:
+        # 周薪处理（按4周/月）
+        weekly = salary_str.replace('元/周', '')
+        weekly_range = [float(x) for x in weekly.split('-')]
+        return weekly_range[0] * 4 / 1000, weekly_range[-1] * 4 / 1000
+
+    elif '元/时' in salary_str:
+        # 时薪处理（按8小时/天，22天/月）
+        hourly = salary_str.replace('元/时', '')
+        hourly_range = [float(x) for x in hourly.split('-')]
+        return hourly_range[0] * 8 * 22 / 1000, hourly_range[-1] * 8 * 22 / 1000
+
+    return None
+
+
 def filter_jobs_by_salary(jobs: List[Dict], min_expected_salary: float, max_expected_salary: float) -> List[Dict]:
     """
     根据期望薪资范围过滤岗位
@@ -409,55 +472,13 @@ def filter_jobs_by_salary(jobs: List[Dict], min_expected_salary: float, max_expe
 
     for job in jobs:
         job_name = job['job_name']
-        job_salary = job['job_salary']
-        original_salary = job_salary  # 保留原始值用于日志
+        original_salary = job['job_salary']  # 保留原始值用于日志
         try:
-            # 预处理：去除类似"·13薪"的后缀
-            job_salary = re.sub(r'·\d+薪', '', job_salary)
-
-            # 统一转换为小写方便处理
-            salary_str = job_salary.lower()
-
-            if '元/天' in salary_str:
-                # 日薪处理（按22工作日/月）
-                daily = salary_str.replace('元/天', '')
-                daily_range = [float(x) for x in daily.split('-')]
-                min_d = daily_range[0]
-                max_d = daily_range[-1]  # 处理单值和范围
-                min_monthly = min_d * 22 / 1000
-                max_monthly = max_d * 22 / 1000
-
-            elif 'k' in salary_str:
-                # K表示的月薪
-                k_str = salary_str.replace('k', '')
-                k_range = [float(x) for x in k_str.split('-')]
-                min_monthly = k_range[0]
-                max_monthly = k_range[-1]
-
-            elif '元/月' in salary_str:
-                # 直接月薪
-                monthly = salary_str.replace('元/月', '')
-                monthly_range = [float(x) for x in monthly.split('-')]
-                min_monthly = monthly_range[0] / 1000
-                max_monthly = monthly_range[-1] / 1000
-
-            elif '元/周' in salary_str:
-                # 周薪处理（按4周/月）
-                weekly = salary_str.replace('元/周', '')
-                weekly_range = [float(x) for x in weekly.split('-')]
-                min_monthly = weekly_range[0] * 4 / 1000
-                max_monthly = weekly_range[-1] * 4 / 1000
-
-            elif '元/时' in salary_str:
-                # 时薪处理（按8小时/天，22天/月）
-                hourly = salary_str.replace('元/时', '')
-                hourly_range = [float(x) for x in hourly.split('-')]
-                min_monthly = hourly_range[0] * 8 * 22 / 1000
-                max_monthly = hourly_range[-1] * 8 * 22 / 1000
-
-            else:
+            salary = parse_salary(original_salary)
+            if salary is None:
                 logger.warning(f"未知薪资格式 | 岗位: {job_name} | 薪资: {original_salary}")
                 continue
+            min_monthly, max_monthly = salary
         except (ValueError, IndexError) as e:
             logger.warning(f"薪资解析失败 | 岗位: {job_name} | 原始值: {original_salary} | 错误: {str(e)}")
             continue
@@ -474,7 +495,6 @@ def filter_jobs_by_salary(jobs: List[Dict], min_expected_salary: float, max_expe
 
     return jobs_matching_salary
 
-
 def parse_params(link):
     """
     从招聘链接中提取关键参数
@@ -485,10 +505,9 @@ def parse_params(link):
 
 
 def get_user_info():
-    url = "https://www.zhipin.com/wapi/zpuser/wap/getUserInfo.json"
-    session = SessionManager.get_sync_session()
+    """同步获取用户信息，供 ws_client 使用"""
     try:
-        user_info = session.get(url).json()
+        user_info = run_sync(ZhipinClient.get_instance().get_user_info())
         user_id = user_info['zpData']['userId']
         user_name = user_info['zpData']['name']
         true_man = user_info['zpData']['trueMan']
@@ -504,15 +523,7 @@ def get_user_info():
 def get_wt2():
     """获取wt2验证参数"""
     try:
-        url = "https://www.zhipin.com/wapi/zppassport/get/wt"
-        session = SessionManager.get_sync_session()
-        response = session.get(url, timeout=10)
-        response.raise_for_status()
-        wt2_data = response.json()
-
-        if wt2_data['code'] == 0:
-            return wt2_data['zpData'].get('wt2')
-        raise Exception(f"获取wt2失败: {wt2_data.get('message')}")
+        return run_sync(ZhipinClient.get_instance().get_wt2())
     except Exception as e:
         logger.error(f"获取wt2异常: {str(e)}")
         return None
@@ -527,230 +538,10 @@ def calculate_md5(file_path):
     return hash_md5.hexdigest()
 
 
-def full_upload_image(file_path,securityId):
-    """
-    上传图片
-    """
+def upload_image(file_path, securityId, resume_image_md5=None):
+    """同步上传图片，失败时返回 None"""
     try:
-        url = "https://www.zhipin.com/wapi/zpupload/image/uploadSingle"
-        session = SessionManager.get_sync_session()
-        mime_type, _ = mimetypes.guess_type(file_path)
-        with open(file_path, "rb") as f:
-            mp_encoder = MultipartEncoder(
-                fields=[
-                    ('securityId', securityId),
-                    ('source', 'chat_file'),
-                    ('file', (os.path.basename(file_path), f, mime_type ))
-                ]
-            )
-            headers = {'Content-Type': mp_encoder.content_type,
-            'user-agent':"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36"
-            }
-            response = session.post(url, data=mp_encoder,headers=headers)
-        zp_data = response.json()["zpData"]
-        origin_width = zp_data["metadata"]["width"]
-        origin_height = zp_data["metadata"]['height']
-        tiny_width = 200
-        tiny_height = int(tiny_width * origin_height / origin_width)
-        result = {
-            "tinyImage": {
-                "url": zp_data['tinyUrl'],
-                "width": tiny_width,
-                "height": tiny_height
-            },
-            "originImage": {
-                "url": zp_data['url'],
-                "width": origin_width,
-                "height": origin_height
-            }
-        }
-        return result
+        return run_sync(ZhipinClient.get_instance().upload_image(file_path, securityId, resume_image_md5))
     except Exception:
         logger.exception(f"上传简历图片出现错误")
         return None
-
-def quickly_upload_image(file_md5, securityId):
-    # 快速上传接口（若服务端已有相同文件则直接返回结果）
-    url = "https://www.zhipin.com/wapi/zpupload/quicklyUpload"
-    data = {
-        "fileMd5": file_md5,  # use file_md5 instead of calculate_md5(file_path)
-        "fileSize": 0,  # remove os.path.getsize(file_path),
-        "source": "chat_file",
-        "securityId": securityId
-    }
-    session = SessionManager.get_sync_session()
-    response = session.post(url, data=data)
-    zp_data = response.json()["zpData"]
-    if zp_data.get("url"):
-        origin_width = zp_data["metadata"]["width"]
-        origin_height = zp_data["metadata"]['height']
-        tiny_width = 200
-        tiny_height = int(tiny_width * origin_height / origin_width)
-        result = {
-            "tinyImage": {
-                "url": zp_data['tinyUrl'],
-                "width": tiny_width,
-                "height": tiny_height
-            },
-            "originImage": {
-                "url": zp_data['url'],
-                "width": origin_width,
-                "height": origin_height
-            }
-        }
-    else:
-        result = False
-    return result
-
-
-def upload_image(file_path, securityId, resume_image_md5=None): 
-    quickly_upload_result = quickly_upload_image(resume_image_md5, securityId)
-    if quickly_upload_result:
-        return quickly_upload_result
-    else:
-        full_upload_result =  full_upload_image(file_path, securityId) 
-        return full_upload_result
-    
-
-
-
-class TokenBucket:
-    def __init__(self, rate: int, capacity: int):
-        self.rate = rate  # 每秒生成的令牌数
-        self.capacity = capacity  # 桶的容量
-        self.tokens = capacity  # 初始化令牌数为桶容量
-        self.last_check = time.time()
-
-    async def get_token(self):
-        while True:
-            now = time.time()
-            elapsed = now - self.last_check
-            if elapsed > 1:
-                # 每秒重新生成令牌
-                self.tokens = min(self.capacity, self.tokens + int(elapsed * self.rate))
-                self.last_check = now
-            if self.tokens > 0:
-                self.tokens -= 1
-                break
-            else:
-                # 等待直到有令牌
-                await asyncio.sleep(1 / self.rate)
-
-async def get_job_info(securityId, lid, max_retries=3):
-    path = "/wapi/zpgeek/job/card.json"
-    url = f"{BASE_URL}{path}"
-    params = {
-        "securityId": securityId,
-        "lid": lid
-    }
-
-    async def _request(attempt):
-        try:
-            session = await SessionManager.get_async_session()
-            async with session.get(
-                url,
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=30 + attempt*5)  # 动态超时
-            ) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 403:
-                    logger.warning(f"[403 Forbidden] 可能触发反爬虫 securityId={securityId}")
-                    return None
-                else:
-                    logger.error(f"请求失败 HTTP {response.status} - {await response.text()}")
-                    return None
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            logger.warning(f"请求异常 [{type(e).__name__}] 第{attempt}次重试: {str(e)}")
-            return None
-
-    # 重试逻辑
-    for attempt in range(1, max_retries + 1):
-        result = await _request(attempt)
-        if result is not None:
-            return result
-        await asyncio.sleep(min(2 ** attempt, 10))  # 指数退避
-
-    logger.error(f"请求失败（已达最大重试次数 {max_retries}）")
-    return None
-
-async def start_chat(securityId, jobId, lid):
-    path = "/wapi/zpgeek/friend/add.json"
-    url = f"{BASE_URL}{path}"
-    params = {
-        "securityId": securityId,
-        "jobId": jobId,
-        "lid": lid
-    }
-
-    session = await SessionManager.get_async_session()
-    async with session.get(url, params=params, timeout=30) as response:
-        if response.status == 200:
-            return await response.json()
-        else:
-            response.raise_for_status()
-
-
-# 以下接口待验证
-async def get_boss_list(page: int, cookies=None, headers=None):
-    path = "/wapi/zprelation/friend/getGeekFriendList.json"
-    url = f"https://www.zhipin.com{path}"
-    params = {"page": page}
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params, cookies=cookies, headers=headers) as response:
-            return await response.json()
-
-
-async def get_boss_data(encryptBossId: str, securityId: str, source_type="0", cookies=None, headers=None):
-    path = "/wapi/zpgeek/chat/bossdata.json"
-    url = f"https://www.zhipin.com{path}"
-    params = {
-        "bossId": encryptBossId,
-        "bossSource": source_type,
-        "securityId": securityId
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params, cookies=cookies, headers=headers) as response:
-            return await response.json()
-
-
-async def get_history_msg(encryptBossId: str, securityId: str, cookies=None, headers=None):
-    path = "/wapi/zpchat/geek/historyMsg"
-    url = f"https://www.zhipin.com{path}"
-    params = {
-        "bossId": encryptBossId,
-        "groupId": encryptBossId,
-        "securityId": securityId,
-        "maxMsgId": "0",
-        "c": "20",
-        "page": "1"
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params, cookies=cookies, headers=headers) as response:
-            return await response.json()
-
-
-async def request_send_resume(bossId: str, resumeId: str, cookies=None, headers=None):
-    path = "/geek/new/requestSendResume.json"
-    url = f"https://www.zhipin.com{path}"
-    params = {
-        "bossId": bossId,
-        "resumeId": resumeId,
-        "toSource": "0"
-    }
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params, cookies=cookies, headers=headers) as response:
-            return await response.json()
-
-
-async def get_resumes(cookies=None, headers=None):
-    path = "/wapi/zpgeek/resume/attachment/checkbox.json"
-    url = f"https://www.zhipin.com{path}"
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, cookies=cookies, headers=headers) as response:
-            return await response.json()
\ No newline at end of file
@@ -0,0 +1,96 @@
+# job_priority.py
+"""
+岗位优先级
+列表接口的岗位条目（main.py 中的 raw 字段）已经包含 BOSS 是否在线、公司规模、行业、技能标签和薪资，
+按 job_check.priority 中的权重打分，不需要额外请求。JobHandler 按分数从高到低获取详情、分析和投递，
+投递数量有限（application.max_applications）或运行时间有限时，先处理最有希望的岗位。
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Dict, List, Tuple
+
+from .general import parse_salary
+
+logger = logging.getLogger(__name__)
+
+
+class JobScorer:
+    def __init__(self, config, salary_range: List[float]):
+        """
+        :param config: PriorityConfig
+        :param salary_range: 期望月薪范围（单位：K）
+        """
+        self.config = config
+        self.min_salary, self.max_salary = salary_range
+        self.keywords = [keyword.lower() for keyword in config.keywords]
+
+    def _salary_score(self, job_salary: str) -> float:
+        try:
+            salary = parse_salary(job_salary or "")
+        except (ValueError, IndexError):
+            return 0.0
+        if salary is None or self.max_salary <= self.min_salary:
+            return 0.0
+        middle = (salary[0] + salary[1]) / 2
+        position = (middle - self.min_salary) / (self.max_salary - self.min_salary)
+        return min(max(position, 0.0), 1.0) * self.config.salary
+
+    def score(self, job: Dict) -> float:
+        """岗位的分数，没有列表接口原始条目时（页面解析的岗位）只按薪资、名称和标签计算"""
+        raw = job.get('raw') or {}
+        score = self._salary_score(job.get('job_salary'))
+        if raw.get('bossOnline'):
+            score += self.config.boss_online
+        score += self.config.scale_weights.get(raw.get('brandScaleName'), 0.0)
+        score += self.config.industry_weights.get(raw.get('brandIndustry'), 0.0)
+        if self.keywords:
+            tags = raw.get('skills') or job.get('company_tags') or []
+            text = " ".join([job.get('job_name') or "", *tags]).lower()
+            score += sum(self.config.keyword_weight for keyword in self.keywords if keyword in text)
+        return round(score, 3)
+
+    def rank(self, jobs: List[Dict]) -> List[Tuple[float, Dict]]:
+        """按分数从高到低排列，分数相同时保持列表顺序"""
+        scored = [(self.score(job), job) for job in jobs]
+        scored.sort(key=lambda item: -item[0])
+        return scored
+
+
+class PriorityGate:
+    """
+    限制同时处理的岗位数，名额空出时交给等待中分数最高的岗位
+    每个岗位仍是独立的任务，批次超时取消时与不限制并发时的行为一致
+    """
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters = []  # (-分数, 序号, Future)
+        self._seq = itertools.count()
+
+    async def acquire(self, score: float):
+        # 去掉已取消的等待者
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-score, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已经转交给本岗位
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # 名额直接转交，active 不变
+                future.set_result(None)
+                return
+        self.active -= 1
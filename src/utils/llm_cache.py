@@ -0,0 +1,107 @@
+# llm_cache.py
+"""
+LLM 请求录制/回放
+以规范化请求体（messages、temperature 等，不含模型名）的哈希为键，把响应保存在本地 SQLite 文件中。
+    record: 每次都请求模型，并录制（覆盖）响应
+    replay: 只使用录制的响应，未命中时抛出 LlmCacheMiss，不会访问网络
+    auto:   命中时回放，未命中时请求模型并录制
+回放时可以按录制时的耗时等待（original），或立即返回（zero）。
+调试 prompt / 过滤逻辑或跑基准测试时，同样的输入可以得到确定的结果，不产生费用。
+查询和写入在线程中执行，不阻塞事件循环中的其他请求。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay", "auto")
+
+
+class LlmCacheMiss(KeyError):
+    """回放模式下没有录制的响应"""
+
+
+class LlmCache:
+    def __init__(self, path: str, mode: str = "auto", replay_latency: str = "zero"):
+        if mode not in MODES:
+            raise ValueError(f"不支持的缓存模式: {mode}，可选 {MODES}")
+        if replay_latency not in ("zero", "original"):
+            raise ValueError(f"replay_latency 只能是 zero 或 original: {replay_latency}")
+        self.path = path
+        self.mode = mode
+        self.replay_latency = replay_latency
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key CHAR(64) PRIMARY KEY,
+                request TEXT NOT NULL,
+                response TEXT NOT NULL,
+                latency REAL,
+                created_at DATETIME NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def canonical(payload: Dict) -> str:
+        return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+    @classmethod
+    def make_key(cls, payload: Dict) -> str:
+        return hashlib.sha256(cls.canonical(payload).encode("utf-8")).hexdigest()
+
+    async def get(self, payload: Dict) -> Optional[Dict]:
+        """查询录制的响应，record 模式总是返回 None"""
+        if self.mode in ("off", "record"):
+            return None
+        key = self.make_key(payload)
+        row = await asyncio.to_thread(self._lookup, key)
+        if row is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise LlmCacheMiss(f"回放模式下没有录制的响应: {key[:12]}")
+            return None
+        self.hits += 1
+        if self.replay_latency == "original" and row[1]:
+            await asyncio.sleep(row[1])
+        return json.loads(row[0])
+
+    async def put(self, payload: Dict, response: Dict, latency: float) -> None:
+        if self.mode not in ("record", "auto"):
+            return
+        await asyncio.to_thread(
+            self._store, self.make_key(payload), self.canonical(payload),
+            json.dumps(response, ensure_ascii=False), latency)
+
+    def _lookup(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT response, latency FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._conn.execute("UPDATE llm_cache SET hits = hits + 1 WHERE key = ?", (key,))
+                self._conn.commit()
+        return row
+
+    def _store(self, key: str, request: str, response: str, latency: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, request, response, latency, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, request, response, latency, datetime.now().isoformat(sep=" ")),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,121 @@
+# near_dup.py
+"""
+相似岗位识别
+同一公司常发布多个只有城市或职位名称后缀不同的岗位。对职位描述的字符 3-gram 集合计算 MinHash 签名，
+估算的 Jaccard 相似度不低于阈值的岗位视为相似岗位，复用已有的 AI 分析结果。
+
+职位描述通常只有几百字，SimHash 在这个长度下改动一两个词就会翻转多位，因此使用 MinHash + LSH：
+签名的前 BANDS * ROWS 个值分成 BANDS 段，每段的哈希保存在 job_minhash 表的 band0..band7 列（各有索引），
+任一段相同的岗位作为候选，再用完整签名估算相似度。相似度 0.8 的岗位成为候选的概率约 98.5%。
+"""
+import asyncio
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+NUM_PERM = 64
+BANDS = 8
+ROWS = 4
+SHINGLE = 3
+
+_NON_WORD = re.compile(r"[\W_]+")
+_MASK64 = (1 << 64) - 1
+# 固定种子，签名需要在多次运行之间保持一致
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    """去掉空白、标点，统一小写"""
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype="<u4").astype(np.uint64)
+    with np.errstate(over="ignore"):
+        h = np.unique(codes[:-2] * np.uint64(0x100000001B3) + codes[1:-1] * np.uint64(0x9E3779B97F4A7C15) + codes[2:])
+        # splitmix64 混合
+        h = h ^ (h >> np.uint64(30))
+        h = h * np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(27)
+        h = h * np.uint64(0x94D049BB133111EB)
+        h ^= h >> np.uint64(31)
+    return h
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash 签名（NUM_PERM 个 uint32），文本过短时返回 None"""
+    text = normalize(text)
+    if len(text) < SHINGLE * 4:
+        return None
+    shingles = _shingle_hashes(text)
+    with np.errstate(over="ignore"):
+        # 乘法移位哈希作为随机排列，取高 32 位
+        values = (shingles[None, :] * _PERM_A[:, None] + _PERM_B[:, None]) >> np.uint64(32)
+    return values.min(axis=1).astype("<u4")
+
+
+def band_keys(signature: np.ndarray) -> List[int]:
+    """各段的哈希（有符号 64 位，可直接保存为 SQLite INTEGER）"""
+    return [
+        int.from_bytes(hashlib.blake2b(signature[i * ROWS:(i + 1) * ROWS].tobytes(), digest_size=8).digest(),
+                       "little", signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """估算的 Jaccard 相似度"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def signature_from_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<u4")
+
+
+def minhash_row(job_id: str, description: str) -> Optional[Dict]:
+    """job_minhash 表的一行，描述过短时返回 None"""
+    signature = minhash(description)
+    if signature is None:
+        return None
+    row = {"encryptJobId": job_id, "signature": signature.tobytes()}
+    row.update({f"band{i}": key for i, key in enumerate(band_keys(signature))})
+    return row
+
+
+class PendingVerdicts:
+    """
+    同一批次中正在分析的岗位
+    批次内的岗位并发处理，相似岗位都还没有写入数据库；后来的岗位等待先开始分析的相似岗位的结果
+    """
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._pending: Dict[str, List[Tuple[np.ndarray, str, asyncio.Future]]] = {}
+
+    def find(self, company: str, signature: np.ndarray) -> Optional[Tuple[str, float, asyncio.Future]]:
+        """:return: (岗位 id, 相似度, 结果 Future)"""
+        for other, job_id, future in self._pending.get(company, []):
+            score = similarity(signature, other)
+            if score >= self.threshold:
+                return job_id, score, future
+        return None
+
+    def add(self, company: str, signature: np.ndarray, job_id: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(company, []).append((signature, job_id, future))
+        return future
+
+    def done(self, company: str, future: asyncio.Future, verdict: Optional[Tuple[bool, Optional[str]]]):
+        """
+        发布分析结果并移除
+        :param verdict: (分析结果, 思考过程)，未得到结果时为 None
+        """
+        if not future.done():
+            future.set_result(verdict)
+        entries = self._pending.get(company, [])
+        entries[:] = [entry for entry in entries if entry[2] is not future]
+        if not entries:
+            self._pending.pop(company, None)
@@ -0,0 +1,92 @@
+# payload_archive.py
+"""
+岗位原始数据归档
+列表接口的岗位条目(list)和详情接口的 jobCard(card) 压缩后按 (encryptJobId, kind, 内容哈希) 保存在 job_payloads 表，
+内容未变化时不会重复写入。更换 prompt 后可以直接基于归档数据重新进行 AI 分析，不需要重新请求接口。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .ai_analyzer import AiAnalysisError
+from .circuit_breaker import CircuitOpenError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+KIND_LIST = "list"
+KIND_CARD = "card"
+
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+# 安装了 zstandard 时使用 zstd，否则使用标准库 zlib
+DEFAULT_CODEC = CODEC_ZSTD if zstandard else CODEC_ZLIB
+
+
+def compress_payload(payload: Dict, codec: str = DEFAULT_CODEC) -> Tuple[str, str, bytes]:
+    """
+    序列化并压缩原始数据
+    :return: (内容哈希, 压缩格式, 压缩后的数据)
+    """
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    content_hash = hashlib.sha1(raw).hexdigest()
+    if codec == CODEC_ZSTD:
+        return content_hash, codec, zstandard.ZstdCompressor(level=3).compress(raw)
+    return content_hash, CODEC_ZLIB, zlib.compress(raw, 6)
+
+
+def decompress_payload(codec: str, data: bytes) -> Dict:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("归档数据使用 zstd 压缩，需要安装 zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return json.loads(raw)
+
+
+def build_job_requirements(card: Dict) -> str:
+    """由 jobCard 构建提交给 AI 的岗位要求"""
+    return (
+        f"公司名称：{card['brandName']}\n"
+        f"职位名称：{card['jobName']}\n"
+        f"岗位职责：{card['postDescription']}\n"
+        f"经验要求：{card['experienceName']}\n"
+        f"学历要求：{card['degreeName']}"
+    )
+
+
+async def reanalyze_archived(db_manager, ai_analyzer, job_ids: Optional[List[str]] = None,
+                             concurrency: int = 4, save: bool = True) -> List[Tuple[str, bool, Optional[str]]]:
+    """
+    使用当前的 prompt/简历对归档的 jobCard 重新进行 AI 分析，不访问招聘网站
+    :param job_ids: 指定岗位，None 表示全部归档岗位
+    :param save: 是否将新的分析结果写回 job_details
+    :return: [(encryptJobId, 分析结果, 思考过程), ...]
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(job_id, card):
+        async with semaphore:
+            try:
+                ai_result, ai_think = await ai_analyzer.ai_hr_check(build_job_requirements(card), job_id)
+            except (CircuitOpenError, AiAnalysisError) as e:
+                logger.warning(f"跳过 {card.get('jobName')}({job_id}): {e}")
+                return None
+            logger.info(f"重新分析 {card.get('jobName')}({job_id}): {ai_result}")
+            return job_id, ai_result, ai_think
+
+    tasks = [analyze(job_id, card)
+             for job_id, _, card in db_manager.iter_payloads(KIND_CARD, job_ids)]
+    # AI服务熔断期间或分析失败而跳过的岗位不写回
+    results = [result for result in await asyncio.gather(*tasks) if result is not None]
+    if save and results:
+        db_manager.update_analysis(results).result()
+    return results
@@ -0,0 +1,109 @@
+# resume_profile.py
+"""
+精简简历
+每次 AI 请求都会附带简历全文，简历中的 Markdown 标记、链接、联系方式、重复内容都会占用输入 token。
+精简后的简历按 (原简历内容哈希, 精简方式) 保存在磁盘上，简历文件不变时直接复用：
+    local: 本地规则提取，去掉格式标记、图片链接、联系方式和重复行，保留标题和条目结构
+    llm:   调用一次模型生成结构化的求职者画像，失败时退回 local
+"""
+import hashlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "local", "llm")
+
+CONDENSE_PROMPT = (
+    "将用户提供的简历压缩为结构化的求职者画像，供后续判断岗位匹配度和生成打招呼语使用。\n"
+    "保留：求职方向、工作年限、技能关键词、每段工作/项目经历（公司、岗位、时长、一句话职责或成果）、学历、证书。\n"
+    "删除：联系方式、照片链接、自我评价中的套话和重复内容。\n"
+    "使用简短的条目，不要编造简历中没有的信息，只输出画像内容。"
+)
+
+_CJK = re.compile(r"[　-〿一-鿿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文字符按 1 个，其他字符按每 4 个 1 个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def condense_markdown(text: str) -> str:
+    """本地规则精简 Markdown 简历"""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.DOTALL)
+    text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)  # 图片
+    text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)  # 链接只保留文字
+    text = re.sub(r"<[^>]+>", "", text)  # HTML 标签
+    text = re.sub(r"[\w.+-]+@[\w-]+(\.[\w-]+)+", "", text)  # 邮箱
+    text = re.sub(r"(?<!\d)(\+?86[- ]?)?1[3-9]\d[- ]?\d{4}[- ]?\d{4}(?!\d)", "", text)  # 手机号
+    lines, seen = [], set()
+    for line in text.splitlines():
+        line = line.strip()
+        # 空行、分隔线、表格分隔行
+        if not line or re.fullmatch(r"[-*_=|:\s]+", line):
+            continue
+        heading = re.match(r"#+\s*(.*)", line)
+        if heading:
+            line = f"【{heading.group(1).strip()}】"
+        else:
+            line = re.sub(r"^([-*+]\s+|\d+[.)、]\s*)", "- ", line)
+            line = re.sub(r"\*\*|__|`", "", line)
+            line = re.sub(r"\s*\|\s*", " | ", line).strip(" |")
+            line = re.sub(r"\s+", " ", line)
+        # 去掉联系方式后只剩标签的行，例如"电话："
+        if not heading and re.fullmatch(r"[-\s]*[^\s:：]{1,6}[:：]", line):
+            continue
+        if line in seen:
+            continue
+        seen.add(line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def profile_path(cache_dir: str, resume: str, mode: str) -> str:
+    digest = hashlib.sha256(resume.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{digest}-{mode}.md")
+
+
+async def load_or_build(resume: str, mode: str, cache_dir: str, chat=None) -> str:
+    """
+    读取或生成精简简历
+    :param chat: llm 模式下发送请求的协程函数，参数为 messages，返回模型输出文本
+    :return: 精简后的简历，mode 为 off 或简历为空时返回原文
+    """
+    if mode not in MODES:
+        raise ValueError(f"不支持的简历精简方式: {mode}，可选 {MODES}")
+    if mode == "off" or not resume.strip():
+        return resume
+    path = profile_path(cache_dir, resume, mode)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    profile = None
+    if mode == "llm":
+        try:
+            content = await chat([
+                {"role": "system", "content": CONDENSE_PROMPT},
+                {"role": "user", "content": resume},
+            ])
+            profile = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL).strip()
+        except Exception as e:
+            logger.warning(f"AI精简简历失败，改用本地精简: {e}")
+        if profile:
+            # 模型输出反而更长时没有意义
+            profile = profile if estimate_tokens(profile) < estimate_tokens(resume) else None
+        if not profile:
+            mode = "local"
+            path = profile_path(cache_dir, resume, mode)
+    if not profile:
+        profile = condense_markdown(resume)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(profile)
+    logger.info(f"已生成精简简历: {path}")
+    return profile
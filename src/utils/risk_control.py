@@ -0,0 +1,166 @@
+# risk_control.py
+"""
+风控检测与全局自适应限速
+BOSS直聘限流时，原来只有触发的请求按自己的退避重试，其他协程继续按原速率请求，封禁越来越久。
+    classify：把响应分为限流（rate_limited）、风控（risk_control）、验证码（captcha），正常响应返回 None
+    AdaptiveThrottle：任何接口（包括页面中的 joblist.json）检测到以上情况时，暂停所有 BOSS直聘请求，
+        crawler 限速减半（乘法减少），之后每 ramp_interval 秒没有再次触发就增加 increase（加法增加）。
+        触发时的速率记为上限，ceiling_ttl 秒内只恢复到上限的 ceiling_ratio 倍，之后再继续试探更高的速率，
+        因此持续的速率收敛到不触发限制的最高速率。
+        暂停结束后仍然被限制（没有成功的请求）时只把暂停时间加倍，不再降速。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from .config_manager import ThrottleConfig
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED = "rate_limited"
+RISK_CONTROL = "risk_control"
+CAPTCHA = "captcha"
+# 按顺序匹配响应的 message、zpData 中的跳转地址、请求地址和非 JSON 的响应内容（小写）
+SIGNAL_MARKERS = (
+    (CAPTCHA, ("captcha", "security-check", "/verify", "验证码", "安全验证", "人机验证", "滑块")),
+    (RATE_LIMITED, ("频繁", "过快", "too many requests")),
+    (RISK_CONTROL, ("异常访问", "访问异常", "行为异常", "环境异常", "存在异常", "账号异常", "风险", "风控", "限制访问")),
+)
+SIGNAL_NAMES = {RATE_LIMITED: "限流", RISK_CONTROL: "风控", CAPTCHA: "验证码"}
+
+
+def classify(status: int = 200, body=None, url: str = "") -> Optional[str]:
+    """
+    判断响应是否触发了限流、风控或验证码
+    :param body: 解析后的 JSON，或不是 JSON 时的响应文本
+    :return: RATE_LIMITED / RISK_CONTROL / CAPTCHA，正常响应返回 None
+    """
+    texts = [str(url or "")]
+    if isinstance(body, dict):
+        if body.get("code") != 0:
+            texts.append(str(body.get("message") or ""))
+            zp_data = body.get("zpData")
+            if isinstance(zp_data, dict):
+                texts.extend(str(zp_data.get(key) or "") for key in ("toUrl", "url", "message"))
+    elif isinstance(body, str):
+        texts.append(body)
+    text = " ".join(texts).lower()
+    for signal, markers in SIGNAL_MARKERS:
+        if any(marker in text for marker in markers):
+            return signal
+    if status == 429:
+        return RATE_LIMITED
+    if status == 403:
+        return RISK_CONTROL
+    return None
+
+
+class AdaptiveThrottle:
+    def __init__(self, bucket, config: ThrottleConfig):
+        """
+        :param bucket: 被调整速率的 TokenBucket（crawler），创建时的速率为最高速率
+        """
+        self.bucket = bucket
+        self.config = config
+        self.max_rate = bucket.rate
+        self.paused_until = 0.0  # time.monotonic()
+        self.last_change = time.monotonic()  # 上次调整速率（或暂停结束）的时间
+        self.strikes = 0  # 连续触发次数，暂停时间按 2 的幂增加
+        self.recovered = True  # 上次触发后是否有成功的请求
+        self.ceiling: Optional[float] = None  # 上次触发时的速率
+        self.ceiling_at = 0.0
+        self.trips = Counter()
+        self.paused_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self.paused_until
+
+    async def wait(self):
+        """暂停期间等待，每次请求前调用"""
+        while True:
+            remaining = self.paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(remaining)
+
+    def observe(self, status: int, body, url: str, source: str) -> Optional[str]:
+        """检测响应，触发时暂停并降速，返回 classify 的结果"""
+        signal = classify(status, body, url)
+        if signal is not None:
+            self.trip(signal, source)
+        return signal
+
+    def trip(self, signal: str, source: str):
+        now = time.monotonic()
+        with self._lock:
+            self.trips[signal] += 1
+            if now < self.paused_until:
+                # 暂停前已经发出的请求，属于同一次触发，不重复降速；验证码需要更长的暂停
+                if signal == CAPTCHA:
+                    self._pause(now, self.config.captcha_pause)
+                return
+            self.strikes += 1
+            if signal == CAPTCHA:
+                pause = self.config.captcha_pause
+            else:
+                pause = min(self.config.pause * 2 ** (self.strikes - 1), self.config.max_pause)
+            self._pause(now, pause)
+            previous = self.rate
+            if self.recovered:
+                # 新的一次触发：记录上限并降速，清空令牌，暂停结束后不会突发
+                self.recovered = False
+                self.ceiling = previous
+                self.ceiling_at = now
+                self.bucket.set_rate(max(self.config.min_rate, previous * self.config.decrease), drain=True)
+            else:
+                self.bucket.set_rate(previous, drain=True)
+        message = (f"[{SIGNAL_NAMES[signal]}] {source} 触发反爬虫，暂停所有请求 {pause:.1f} 秒，"
+                   f"限速 {previous:.2f} -> {self.rate:.2f} 次/秒")
+        if signal == CAPTCHA:
+            logger.error(message + "，请在浏览器中完成验证")
+        else:
+            logger.warning(message)
+
+    def _pause(self, now: float, pause: float):
+        until = now + pause
+        if until > self.paused_until:
+            self.paused_seconds += until - max(self.paused_until, now)
+            self.paused_until = until
+            self.last_change = until
+
+    def record_success(self):
+        """请求正常返回，距离上次调整超过 ramp_interval 时增加速率"""
+        now = time.monotonic()
+        if self.recovered and now - self.last_change < self.config.ramp_interval:
+            return
+        with self._lock:
+            self.recovered = True
+            if now - self.last_change < self.config.ramp_interval:
+                return
+            self.last_change = now
+            self.strikes = 0
+            cap = self.max_rate
+            if self.ceiling is not None and now - self.ceiling_at < self.config.ceiling_ttl:
+                cap = min(cap, self.ceiling * self.config.ceiling_ratio)
+            if self.rate >= cap:
+                return
+            previous = self.rate
+            self.bucket.set_rate(min(cap, previous + self.config.increase))
+        logger.info(f"限速恢复 {previous:.2f} -> {self.rate:.2f} 次/秒")
+
+    def stats(self):
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "trips": dict(self.trips),
+            "paused_s": round(self.paused_seconds, 1),
+        }
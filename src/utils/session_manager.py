@@ -8,19 +8,20 @@ from yarl import URL
 class SessionManager:
     # 同步资源锁
     _sync_lock = threading.Lock()
-    # 异步资源锁
-    _async_lock = asyncio.Lock()
     
-    # 共享配置存储
+    # 共享配置存储。更新时整体替换为新的字典（不原地修改），读取方拿到的快照不会变化
     _config = {
         'headers': {'Accept': 'application/json'},
         'cookies': {}
     }
+    # 配置版本号，每次 update_session 加一
+    _version = 0
     
     # Session实例
     _sync_session = None
-    _async_session = None
-    _async_needs_rebuild = False  # 异步session需要重建标记
+    # aiohttp session 不能跨事件循环使用，JobHandler 线程和同步调用的后台线程各有一个
+    # 事件循环 -> (session, 已应用的配置版本)
+    _async_sessions = {}
 
     def __new__(cls):
         raise NotImplementedError("Cannot instantiate singleton class")
@@ -45,69 +46,82 @@ class SessionManager:
 
     @classmethod
     async def get_async_session(cls):
-        """获取异步session（协程安全）"""
-        async with cls._async_lock:
-            # 检查重建标记时需要同步锁
-            with cls._sync_lock:
-                needs_rebuild = cls._async_needs_rebuild
-                cookies = cls._config['cookies'].copy()
-                if needs_rebuild:
-                    cls._async_needs_rebuild = False
+        """
+        获取当前事件循环的异步session
+        配置没有变化时直接返回，不加锁也不复制 cookies；配置版本变化后第一次调用时把新配置应用到 session
+        """
+        loop = asyncio.get_running_loop()
+        entry = cls._async_sessions.get(loop)
+        if entry is not None and entry[1] == cls._version and not entry[0].closed:
+            return entry[0]
+        return cls._refresh_async_session(loop, entry)
 
-            # 更新cookies
-            if needs_rebuild and cls._async_session and not cls._async_session.closed:
-                cls._async_session.cookie_jar.update_cookies(cookies,URL("https://www.zhipin.com"))
+    @classmethod
+    def _refresh_async_session(cls, loop, entry):
+        # 同一事件循环中没有 await，不需要异步锁；同步锁只保证读到同一版本的配置
+        with cls._sync_lock:
+            config, version = cls._config, cls._version
+        session = entry[0] if entry is not None else None
 
-            if cls._async_session is None or cls._async_session.closed:
-                # 从当前配置创建新session
-                with cls._sync_lock:
-                    cookies = cls._config['cookies'].copy()
-                    headers = cls._config['headers'].copy()
+        if session is not None and not session.closed:
+            # 更新cookies和请求头
+            if config.get('removed'):
+                session.cookie_jar.clear(lambda morsel: morsel.key in config['removed'])
+            session.cookie_jar.update_cookies(config['cookies'], URL("https://www.zhipin.com"))
+            session.headers.update(config['headers'])
+        else:
+            # 从当前配置创建新session
+            connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20, 
+                ssl=False)
 
-                connector = aiohttp.TCPConnector(
-                    limit=100,
-                    limit_per_host=20, 
-                    ssl=False)
+            cookie_jar = aiohttp.CookieJar(unsafe=True)
+            cookie_jar.update_cookies(config['cookies'], URL("https://www.zhipin.com"))
 
-                cookie_jar = aiohttp.CookieJar(unsafe=True)
-                for name,value in cookies.items():
-                    cookie_jar.update_cookies({name:value},URL("https://www.zhipin.com"))
-
-                cls._async_session = aiohttp.ClientSession(
-                    connector=connector,
-                    headers=headers,
-                    cookie_jar=cookie_jar
-                )
-            return cls._async_session
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers=config['headers'],
+                cookie_jar=cookie_jar
+            )
+        cls._async_sessions[loop] = (session, version)
+        return session
 
     @classmethod
-    def update_session(cls, cookies: dict, headers: dict):
-        """更新session配置（线程安全）"""
+    def update_session(cls, cookies: dict, headers: dict, removed=()):
+        """
+        更新session配置（线程安全），异步session在下次获取时应用
+        :param removed: 浏览器中已删除的 cookie 名称
+        """
         with cls._sync_lock:
             # 原子更新配置
-            cls._config['cookies'].update(cookies)
-            cls._config['headers'].update(headers)
+            removed = set(removed)
+            cls._config = {
+                'cookies': {name: value for name, value in {**cls._config['cookies'], **cookies}.items()
+                            if name not in removed},
+                'headers': {**cls._config['headers'], **headers},
+                # 已删除的 cookie（之后重新设置的除外），应用到异步session时从 cookie_jar 中清除
+                'removed': (cls._config.get('removed', set()) - set(cookies)) | removed,
+            }
+            cls._version += 1
 
             # 更新现有的同步session
             if cls._sync_session:
                 cls._sync_session.cookies.update(cookies)
                 cls._sync_session.headers.update(headers)
-
-            # 标记异步session需要重建
-            cls._async_needs_rebuild = True
+                for name in removed:
+                    cls._sync_session.cookies.pop(name, None)
 
     @classmethod
     async def close(cls):
-        """关闭所有session（协程安全）"""
+        """关闭同步session和当前事件循环的异步session"""
         # 关闭同步session
         with cls._sync_lock:
             if cls._sync_session:
                 cls._sync_session.close()
                 cls._sync_session = None
-            cls._async_needs_rebuild = False  # 重置标记
 
-        # 关闭异步session
-        async with cls._async_lock:
-            if cls._async_session and not cls._async_session.closed:
-                await cls._async_session.close()
-                cls._async_session = None
+        # 关闭异步session，先移除，避免其他协程取到正在关闭的session
+        entry = cls._async_sessions.pop(asyncio.get_running_loop(), None)
+        if entry is not None and not entry[0].closed:
+            await entry[0].close()
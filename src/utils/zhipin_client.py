@@ -0,0 +1,405 @@
+# zhipin_client.py
+"""
+BOSS直聘接口客户端
+所有接口都通过 SessionManager 的连接池发送（每个事件循环一个 aiohttp session），并共用：
+    重试：网络错误、超时和非 200 响应按指数退避重试；投递等非幂等接口只在连接未建立时重试
+    错误：响应 code 不为 0 时抛出 ZhipinError（投递接口返回完整响应，由调用方根据 code 判断结果）
+    限速：同一 bucket 的接口共用一个 TokenBucket，获取详情和投递共用 crawler.rate_limit
+    统计：每个接口的耗时直方图，通过 stats() / format_stats() 查看
+    风控：响应触发限流、风控或验证码时，AdaptiveThrottle 暂停所有接口并调整 crawler 限速（见 risk_control.py）
+没有事件循环的线程（ws_client）通过 run_sync 在后台事件循环中调用。
+"""
+import asyncio
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional
+
+import aiohttp
+
+from .config_manager import ConfigManager
+from .risk_control import AdaptiveThrottle, classify
+from .session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = 'https://www.zhipin.com'
+MAX_RETRIES = 3
+# 耗时直方图各桶的上限（毫秒），最后一个桶不设上限
+LATENCY_BUCKETS_MS = (50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # 每秒生成的令牌数，可以小于 1
+        self.capacity = capacity  # 桶的容量
+        self.tokens = capacity  # 初始化令牌数为桶容量
+        self.last_check = time.monotonic()
+        # AdaptiveThrottle 可能在其他线程（主线程的页面监听）中调整速率
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        # 按经过的时间连续生成令牌，调用方需持有 _lock
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_check) * self.rate)
+        self.last_check = now
+
+    async def get_token(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                wait = (1 - self.tokens) / self.rate
+            # 等待直到有令牌
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float, drain: bool = False):
+        """
+        调整速率（线程安全）
+        :param drain: 清空桶中的令牌，之后的请求不能突发
+        """
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            if drain:
+                self.tokens = 0
+
+
+class ZhipinError(Exception):
+    """接口返回的 code 不为 0"""
+    def __init__(self, endpoint: str, code, message: str):
+        super().__init__(f"{endpoint} 返回 code={code}: {message}")
+        self.endpoint = endpoint
+        self.code = code
+        self.message = message
+
+
+class ZhipinRequestError(Exception):
+    """重试后仍然失败（网络错误、超时或 HTTP 状态码异常）"""
+
+
+class ZhipinBlockedError(ZhipinRequestError):
+    """响应触发了限流、风控或验证码"""
+    def __init__(self, signal: str, message: str):
+        super().__init__(f"[{signal}] {message}")
+        self.signal = signal
+
+
+class Endpoint:
+    def __init__(self, name: str, method: str, path: str, bucket: Optional[str] = None, idempotent: bool = True):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.bucket = bucket
+        self.idempotent = idempotent
+
+
+ENDPOINTS = {endpoint.name: endpoint for endpoint in [
+    Endpoint("job_card", "GET", "/wapi/zpgeek/job/card.json", bucket="crawler"),
+    Endpoint("friend_add", "GET", "/wapi/zpgeek/friend/add.json", bucket="crawler", idempotent=False),
+    Endpoint("user_info", "GET", "/wapi/zpuser/wap/getUserInfo.json"),
+    Endpoint("wt2", "GET", "/wapi/zppassport/get/wt"),
+    Endpoint("quick_upload", "POST", "/wapi/zpupload/quicklyUpload"),
+    Endpoint("upload_image", "POST", "/wapi/zpupload/image/uploadSingle", idempotent=False),
+    # 以下接口待验证
+    Endpoint("boss_list", "GET", "/wapi/zprelation/friend/getGeekFriendList.json"),
+    Endpoint("boss_data", "GET", "/wapi/zpgeek/chat/bossdata.json"),
+    Endpoint("history_msg", "GET", "/wapi/zpchat/geek/historyMsg"),
+    Endpoint("request_send_resume", "GET", "/geek/new/requestSendResume.json", idempotent=False),
+    Endpoint("resumes", "GET", "/wapi/zpgeek/resume/attachment/checkbox.json"),
+]}
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.requests = 0
+        self.errors = 0  # 网络错误、超时、HTTP 状态码异常
+        self.code_errors = 0  # code 不为 0
+        self.total_ms = 0.0
+
+    def record(self, elapsed_ms: float, error: bool = False):
+        self.requests += 1
+        if error:
+            self.errors += 1
+            return
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """q 分位数所在桶的上限（毫秒），落在最后一个桶时返回 inf"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= q * total:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else float("inf")
+
+    def stats(self) -> Dict:
+        succeeded = self.requests - self.errors
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "code_errors": self.code_errors,
+            "avg_ms": round(self.total_ms / succeeded, 1) if succeeded else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": dict(zip([f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"],
+                                self.counts)),
+        }
+
+
+def _image_result(zp_data: Dict) -> Dict:
+    """上传接口的结果转换为图片消息需要的格式"""
+    origin_width = zp_data["metadata"]["width"]
+    origin_height = zp_data["metadata"]['height']
+    tiny_width = 200
+    tiny_height = int(tiny_width * origin_height / origin_width)
+    return {
+        "tinyImage": {
+            "url": zp_data['tinyUrl'],
+            "width": tiny_width,
+            "height": tiny_height
+        },
+        "originImage": {
+            "url": zp_data['url'],
+            "width": origin_width,
+            "height": origin_height
+        }
+    }
+
+
+class ZhipinClient:
+    _instance = None
+
+    def __init__(self, base_url: str = BASE_URL, buckets: Optional[Dict[str, TokenBucket]] = None,
+                 max_retries: int = MAX_RETRIES, timeout: float = 30, throttle: Optional[AdaptiveThrottle] = None):
+        """
+        :param buckets: {bucket 名称: TokenBucket}，ENDPOINTS 中 bucket 为空或不在其中的接口不限速
+        :param timeout: 第一次请求的超时（秒），每次重试增加 5 秒
+        :param throttle: 为空时不检测风控
+        """
+        self.base_url = base_url
+        self.buckets = buckets or {}
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.throttle = throttle
+
+    @classmethod
+    def get_instance(cls) -> "ZhipinClient":
+        """共享的客户端，crawler bucket 使用配置中的 crawler.rate_limit，由 crawler.throttle 自适应调整"""
+        if cls._instance is None:
+            buckets = {}
+            throttle = None
+            if ConfigManager.config is not None:
+                crawler = ConfigManager.config.crawler
+                buckets["crawler"] = TokenBucket(rate=crawler.rate_limit["rate"], capacity=crawler.rate_limit["capacity"])
+                if crawler.throttle.enabled:
+                    throttle = AdaptiveThrottle(buckets["crawler"], crawler.throttle)
+            cls._instance = cls(buckets=buckets, throttle=throttle)
+        return cls._instance
+
+    async def request(self, name: str, params: Optional[Dict] = None, data=None, headers: Optional[Dict] = None,
+                      check_code: bool = True) -> Dict:
+        """
+        发送请求并返回完整的响应 JSON
+        :param data: 请求体，或每次尝试时生成请求体的函数（FormData 只能发送一次）
+        :param check_code: code 不为 0 时抛出 ZhipinError
+        """
+        endpoint = ENDPOINTS[name]
+        histogram = self.histograms.setdefault(name, LatencyHistogram())
+        bucket = self.buckets.get(endpoint.bucket)
+        url = f"{self.base_url}{endpoint.path}"
+        for attempt in range(1, self.max_retries + 1):
+            while True:
+                if self.throttle is not None:
+                    await self.throttle.wait()
+                if bucket is not None:
+                    await bucket.get_token()
+                # 等待令牌期间触发了暂停：丢弃令牌，暂停结束后重新获取
+                if self.throttle is None or not self.throttle.paused:
+                    break
+            start = time.perf_counter()
+            try:
+                session = await SessionManager.get_async_session()
+                async with session.request(
+                    endpoint.method, url, params=params, data=data() if callable(data) else data, headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout + (attempt - 1) * 5)  # 动态超时
+                ) as response:
+                    text = await response.text()
+                    try:
+                        result = json.loads(text)
+                    except ValueError:
+                        result = None
+                    # 验证页面等不是 JSON 的响应按文本检测
+                    signal = classify(response.status, result if isinstance(result, dict) else text,
+                                      str(response.url))
+                    if signal is not None:
+                        raise ZhipinBlockedError(signal, f"HTTP {response.status} - {text[:200]}")
+                    if response.status != 200:
+                        raise ZhipinRequestError(f"HTTP {response.status} - {text[:200]}")
+                    if not isinstance(result, dict):
+                        raise ZhipinRequestError(f"响应不是 JSON - {text[:200]}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ZhipinRequestError) as e:
+                histogram.record((time.perf_counter() - start) * 1000, error=True)
+                blocked = isinstance(e, ZhipinBlockedError) and self.throttle is not None
+                if blocked:
+                    self.throttle.trip(e.signal, name)
+                # 非幂等接口只在连接未建立（请求未发出）时重试
+                retryable = endpoint.idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or attempt == self.max_retries:
+                    raise ZhipinRequestError(f"{name} 请求失败（第{attempt}次）: {type(e).__name__} {e}") from e
+                logger.warning(f"{name} 请求异常 [{type(e).__name__}] 第{attempt}次重试: {e}")
+                if not blocked:
+                    await asyncio.sleep(min(2 ** attempt, 10))  # 指数退避；触发风控时由 throttle 暂停
+                continue
+            histogram.record((time.perf_counter() - start) * 1000)
+            if self.throttle is not None:
+                self.throttle.record_success()
+            if check_code and result.get("code") != 0:
+                histogram.code_errors += 1
+                raise ZhipinError(name, result.get("code"), result.get("message"))
+            return result
+
+    async def get_job_info(self, security_id: str, lid: str) -> Dict:
+        """岗位详情，返回完整响应，岗位信息在 zpData.jobCard"""
+        return await self.request("job_card", params={"securityId": security_id, "lid": lid})
+
+    async def start_chat(self, security_id: str, job_id: str, lid: str) -> Dict:
+        """投递（发起沟通），返回完整响应，由调用方根据 code 判断是否成功"""
+        return await self.request("friend_add", params={"securityId": security_id, "jobId": job_id, "lid": lid},
+                                  check_code=False)
+
+    async def get_user_info(self) -> Dict:
+        return await self.request("user_info")
+
+    async def get_wt2(self) -> Optional[str]:
+        """获取wt2验证参数"""
+        return (await self.request("wt2"))['zpData'].get('wt2')
+
+    async def quickly_upload_image(self, file_md5: str, security_id: str):
+        """快速上传（服务端已有相同文件时直接返回结果），没有该文件时返回 False"""
+        result = await self.request("quick_upload", data={
+            "fileMd5": file_md5,
+            "fileSize": 0,
+            "source": "chat_file",
+            "securityId": security_id
+        })
+        zp_data = result["zpData"]
+        return _image_result(zp_data) if zp_data.get("url") else False
+
+    async def full_upload_image(self, file_path: str, security_id: str) -> Dict:
+        with open(file_path, "rb") as f:
+            content = f.read()
+        mime_type, _ = mimetypes.guess_type(file_path)
+
+        def form():
+            data = aiohttp.FormData()
+            data.add_field('securityId', security_id)
+            data.add_field('source', 'chat_file')
+            data.add_field('file', content, filename=os.path.basename(file_path), content_type=mime_type)
+            return data
+
+        result = await self.request("upload_image", data=form)
+        return _image_result(result["zpData"])
+
+    async def upload_image(self, file_path: str, security_id: str, file_md5: Optional[str] = None) -> Dict:
+        """上传图片，优先使用快速上传"""
+        if file_md5:
+            try:
+                quickly_upload_result = await self.quickly_upload_image(file_md5, security_id)
+                if quickly_upload_result:
+                    return quickly_upload_result
+            except ZhipinError as e:
+                logger.debug(f"快速上传失败，改为完整上传: {e}")
+        return await self.full_upload_image(file_path, security_id)
+
+    async def get_boss_list(self, page: int) -> Dict:
+        return await self.request("boss_list", params={"page": page})
+
+    async def get_boss_data(self, encrypt_boss_id: str, security_id: str, source_type: str = "0") -> Dict:
+        return await self.request("boss_data", params={
+            "bossId": encrypt_boss_id,
+            "bossSource": source_type,
+            "securityId": security_id
+        })
+
+    async def get_history_msg(self, encrypt_boss_id: str, security_id: str) -> Dict:
+        return await self.request("history_msg", params={
+            "bossId": encrypt_boss_id,
+            "groupId": encrypt_boss_id,
+            "securityId": security_id,
+            "maxMsgId": "0",
+            "c": "20",
+            "page": "1"
+        })
+
+    async def request_send_resume(self, boss_id: str, resume_id: str) -> Dict:
+        return await self.request("request_send_resume", params={
+            "bossId": boss_id,
+            "resumeId": resume_id,
+            "toSource": "0"
+        })
+
+    async def get_resumes(self) -> Dict:
+        return await self.request("resumes")
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: histogram.stats() for name, histogram in self.histograms.items()}
+
+    def format_stats(self) -> str:
+        """各接口统计的文本形式，用于日志"""
+        lines = ["BOSS直聘接口统计"]
+        for name, stats in self.stats().items():
+            lines.append(f"  {name:<20} 请求 {stats['requests']}，失败 {stats['errors']}，"
+                         f"code 异常 {stats['code_errors']}，平均 {stats['avg_ms']} ms，"
+                         f"p50 <= {stats['p50_ms']} ms，p95 <= {stats['p95_ms']} ms")
+        if self.throttle is not None and self.throttle.trips:
+            stats = self.throttle.stats()
+            lines.append(f"  风控触发 {stats['trips']}，共暂停 {stats['paused_s']} 秒，"
+                         f"结束时限速 {stats['rate']}/{stats['max_rate']} 次/秒")
+        return "\n".join(lines)
+
+
+_sync_loop = None
+_sync_thread = None
+_sync_lock = threading.Lock()
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """在后台事件循环中执行协程并等待结果，供没有事件循环的线程（ws_client）使用"""
+    global _sync_loop, _sync_thread
+    with _sync_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            _sync_thread = threading.Thread(target=_sync_loop.run_forever, daemon=True, name="zhipin_sync")
+            _sync_thread.start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result(timeout)
+
+
+def close_sync(timeout: float = 10):
+    """关闭后台事件循环中的 aiohttp session 并停止循环，程序退出前调用"""
+    global _sync_loop, _sync_thread
+    with _sync_lock:
+        loop, thread = _sync_loop, _sync_thread
+        _sync_loop = _sync_thread = None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(SessionManager.close(), loop).result(timeout)
+    except Exception as e:
+        logger.warning(f"关闭后台事件循环的 session 失败: {e}")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
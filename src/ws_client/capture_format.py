@@ -0,0 +1,131 @@
+'''
+二进制抓包文件格式
+mqtt_websocket_mitmproxy.py 以 binary 模式运行时，每个 WebSocket 帧原样追加为一条记录：
+    文件头: MAGIC
+    记录:   <u32 长度><f64 时间戳><u8 标志> + 原始帧
+标志位: bit0 = 客户端发出(C→S)，bit1 = 文本帧
+本模块不依赖 protobuf，mitmproxy 脚本与离线工具共用
+'''
+import os
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"BZPCAP1\n"
+RECORD_HEADER = struct.Struct("<IdB")
+FLAG_FROM_CLIENT = 0x01
+FLAG_TEXT = 0x02
+
+CaptureRecord = namedtuple("CaptureRecord", ["offset", "timestamp", "from_client", "is_text", "size", "payload"])
+
+
+class CaptureWriter:
+    """追加写入抓包记录"""
+
+    def __init__(self, path, flush_every=100):
+        self.path = path
+        self.flush_every = flush_every
+        self._pending = 0
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if is_new:
+            self._file.write(MAGIC)
+
+    def write(self, from_client, is_text, content, timestamp=None):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        flags = (FLAG_FROM_CLIENT if from_client else 0) | (FLAG_TEXT if is_text else 0)
+        self._file.write(RECORD_HEADER.pack(len(content), timestamp or time.time(), flags))
+        self._file.write(content)
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._pending = 0
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def is_capture_file(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def iter_records(path, with_payload=True, peek=0, start=None):
+    """
+    顺序读取抓包记录
+    :param with_payload: 为 False 时跳过帧内容，只读取记录头（建立索引用）
+    :param peek: with_payload 为 False 时，仍读取帧开头的字节数
+    :param start: 从指定偏移继续读取（增量建立索引）
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是有效的抓包文件: {path}")
+        if start:
+            f.seek(start)
+        file_size = os.fstat(f.fileno()).st_size
+        while True:
+            offset = f.tell()
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            size, timestamp, flags = RECORD_HEADER.unpack(header)
+            if offset + RECORD_HEADER.size + size > file_size:
+                # 写入中断导致的截断记录
+                return
+            if with_payload:
+                payload = f.read(size)
+            else:
+                payload = f.read(min(peek, size)) if peek else b""
+                f.seek(offset + RECORD_HEADER.size + size)
+            yield CaptureRecord(offset, timestamp, bool(flags & FLAG_FROM_CLIENT),
+                                bool(flags & FLAG_TEXT), size, payload)
+
+
+def read_record_at(f, offset):
+    """根据索引中的偏移读取单条记录"""
+    f.seek(offset)
+    size, timestamp, flags = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+    return CaptureRecord(offset, timestamp, bool(flags & FLAG_FROM_CLIENT),
+                         bool(flags & FLAG_TEXT), size, f.read(size))
+
+
+def parse_publish(data):
+    """
+    解析 MQTT PUBLISH 报文头
+    :return: (topic, payload 起始下标)，非 PUBLISH 或数据不完整时返回 (None, None)
+    """
+    if len(data) < 2 or (data[0] & 0xF0) >> 4 != 3:
+        return None, None
+    index = 1
+    while index < len(data) and data[index] > 0x7f and index <= 4:
+        index += 1
+    index += 1
+    if index + 2 > len(data):
+        return None, None
+    topic_length = int.from_bytes(data[index:index + 2], 'big')
+    index += 2
+    topic = data[index:index + topic_length].decode(errors="replace")
+    index += topic_length
+    if data[0] & 0x06:  # QoS处理
+        index += 2
+    return topic, index
+
+
+def peek_protocol_type(payload):
+    """
+    不完整解析 protobuf，直接读取 TechwolfChatProtocol.type (字段1, varint)
+    """
+    if not payload or payload[0] != 0x08:
+        return None
+    value, shift = 0, 0
+    for byte in payload[1:6]:
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value
+        shift += 7
+    return None
@@ -0,0 +1,185 @@
+'''
+二进制抓包离线工具
+为 mqtt_websocket_mitmproxy.py 的 binary 模式抓包文件建立索引，并按 topic / 协议类型 / 时间范围按需解码
+
+用法（在 src 目录下）:
+    python -m ws_client.capture_tool index boss_websocket.bin
+    python -m ws_client.capture_tool stats boss_websocket.bin
+    python -m ws_client.capture_tool dump boss_websocket.bin --topic chat --type 1 --since "2025-03-05 12:00"
+'''
+import argparse
+import bisect
+import datetime
+import json
+import os
+from collections import Counter
+
+from google.protobuf import json_format
+from .capture_format import MAGIC, RECORD_HEADER, iter_records, read_record_at, parse_publish, peek_protocol_type
+from .techwolf_pb2 import TechwolfChatProtocol
+
+# 建立索引时读取的帧头部字节数，足够解析 MQTT 头和 protobuf 的 type 字段
+INDEX_PEEK_BYTES = 512
+
+
+class CaptureIndex:
+    """
+    抓包索引，保存在 <抓包文件>.idx
+    每条记录: [offset, timestamp, from_client, is_text, topic, protocol_type]
+    时间戳是抓包时的系统时间，NTP 校时等情况下可能回退，按时间范围查询时使用按时间排序的副本
+    """
+
+    def __init__(self, capture_path):
+        self.capture_path = capture_path
+        self.index_path = capture_path + ".idx"
+        self.entries = []
+        self.indexed_size = 0
+        self._by_time = None  # (按 (时间戳, 偏移) 排序的条目, 对应的时间戳)
+
+    def load(self):
+        """加载已有索引，并增量索引新追加的记录"""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data["entries"]
+            self.indexed_size = data["size"]
+            self._by_time = None
+        if os.path.getsize(self.capture_path) != self.indexed_size:
+            self.build(incremental=self.indexed_size > 0)
+        return self
+
+    def build(self, incremental=False):
+        if not incremental:
+            self.entries = []
+            self.indexed_size = 0
+        end = self.indexed_size or len(MAGIC)
+        for record in iter_records(self.capture_path, with_payload=False,
+                                   peek=INDEX_PEEK_BYTES, start=self.indexed_size or None):
+            topic, protocol_type = None, None
+            if not record.is_text:
+                topic, index = parse_publish(record.payload)
+                if topic is not None:
+                    protocol_type = peek_protocol_type(record.payload[index:])
+            self.entries.append([record.offset, record.timestamp, record.from_client,
+                                 record.is_text, topic, protocol_type])
+            end = record.offset + RECORD_HEADER.size + record.size
+        self.indexed_size = end
+        self._by_time = None
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump({"size": self.indexed_size, "entries": self.entries}, f)
+        return self
+
+    def _time_order(self):
+        if self._by_time is None:
+            entries = sorted(self.entries, key=lambda entry: (entry[1], entry[0]))
+            self._by_time = (entries, [entry[1] for entry in entries])
+        return self._by_time
+
+    def query(self, topic=None, protocol_type=None, since=None, until=None, direction=None):
+        """按条件筛选索引条目，时间范围通过二分查找定位，结果按文件中的顺序返回"""
+        entries = self.entries
+        if since or until:
+            by_time, timestamps = self._time_order()
+            lo = bisect.bisect_left(timestamps, since) if since else 0
+            hi = bisect.bisect_right(timestamps, until) if until else len(by_time)
+            entries = sorted(by_time[lo:hi], key=lambda entry: entry[0])
+        for entry in entries:
+            if topic is not None and entry[4] != topic:
+                continue
+            if protocol_type is not None and entry[5] != protocol_type:
+                continue
+            if direction == "C2S" and not entry[2]:
+                continue
+            if direction == "S2C" and entry[2]:
+                continue
+            yield entry
+
+
+def decode_record(record):
+    """解码单条记录为可读字典"""
+    meta = {
+        "time": datetime.datetime.fromtimestamp(record.timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "direction": "C→S" if record.from_client else "S→C",
+        "type": "TEXT" if record.is_text else "BIN",
+        "size": record.size,
+        "topic": None,
+    }
+    if record.is_text:
+        return {"meta": meta, "content": {"text": record.payload.decode("utf-8", errors="replace")}}
+    topic, index = parse_publish(record.payload)
+    if topic is None:
+        return {"meta": meta, "content": {"hex": record.payload.hex()}}
+    meta["topic"] = topic
+    protocol = TechwolfChatProtocol()
+    protocol.ParseFromString(record.payload[index:])
+    return {"meta": meta, "content": json_format.MessageToDict(protocol)}
+
+
+def load_publish_frames(capture_path, direction="S2C"):
+    """读取抓包文件中的 PUBLISH 帧，供 MockBroker 回放: [(topic, payload_bytes), ...]"""
+    index = CaptureIndex(capture_path).load()
+    frames = []
+    with open(capture_path, "rb") as f:
+        for entry in index.query(direction=direction):
+            if entry[4] is None:
+                continue
+            record = read_record_at(f, entry[0])
+            topic, start = parse_publish(record.payload)
+            frames.append((topic, record.payload[start:]))
+    return frames
+
+
+def _parse_time(value):
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="二进制抓包离线工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = subparsers.add_parser("index", help="重建索引")
+    index_parser.add_argument("file")
+
+    stats_parser = subparsers.add_parser("stats", help="按 topic / 类型统计")
+    stats_parser.add_argument("file")
+
+    dump_parser = subparsers.add_parser("dump", help="按条件解码输出")
+    dump_parser.add_argument("file")
+    dump_parser.add_argument("--topic")
+    dump_parser.add_argument("--type", type=int, help="TechwolfChatProtocol.type")
+    dump_parser.add_argument("--since", help="开始时间，如 2025-03-05 12:00")
+    dump_parser.add_argument("--until", help="结束时间")
+    dump_parser.add_argument("--direction", choices=["C2S", "S2C"])
+    dump_parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "index":
+        index = CaptureIndex(args.file).build()
+        print(f"已索引 {len(index.entries)} 条记录 -> {index.index_path}")
+        return
+
+    index = CaptureIndex(args.file).load()
+    if args.command == "stats":
+        counter = Counter((entry[4], entry[5], "C→S" if entry[2] else "S→C") for entry in index.entries)
+        if index.entries:
+            start = datetime.datetime.fromtimestamp(index.entries[0][1])
+            end = datetime.datetime.fromtimestamp(index.entries[-1][1])
+            print(f"共 {len(index.entries)} 条记录，时间范围 {start} ~ {end}")
+        for (topic, protocol_type, direction), count in counter.most_common():
+            print(f"{direction} topic={topic} type={protocol_type}: {count}")
+        return
+
+    count = 0
+    with open(args.file, "rb") as f:
+        for entry in index.query(args.topic, args.type, _parse_time(args.since),
+                                 _parse_time(args.until), args.direction):
+            print(json.dumps(decode_record(read_record_at(f, entry[0])), indent=2, ensure_ascii=False))
+            count += 1
+            if args.limit and count >= args.limit:
+                break
+
+
+if __name__ == '__main__':
+    main()
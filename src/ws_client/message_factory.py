@@ -0,0 +1,73 @@
+import time
+
+from .techwolf_pb2 import TechwolfChatProtocol
+
+
+class MessageFactory:
+    """
+    聊天消息构建器
+    预先构建文本/图片消息模板，发送时通过 CopyFrom 克隆模板并只填写 mid/time/to/body，
+    避免每条消息都走一遍 json_format.ParseDict 的反射解析
+    """
+
+    TEXT_TYPE = 1
+    IMAGE_TYPE = 3
+
+    def __init__(self):
+        self._text_template = self._build_template(self.TEXT_TYPE)
+        self._image_template = self._build_template(self.IMAGE_TYPE)
+
+    @staticmethod
+    def _build_template(body_type):
+        """构建消息模板，字段与原 dict 结构保持一致"""
+        protocol = TechwolfChatProtocol()
+        protocol.type = 1
+        message = protocol.messages.add()
+        # from 是 python 关键字，只能通过 getattr 访问
+        getattr(message, "from").uid = 0
+        message.to.uid = 0
+        message.type = 1
+        message.body.type = body_type
+        message.body.templateId = 1
+        return protocol
+
+    @staticmethod
+    def _clone(template, boss_id):
+        """克隆模板并填写公共字段"""
+        protocol = TechwolfChatProtocol()
+        protocol.CopyFrom(template)
+        message = protocol.messages[0]
+        timestamp = int(time.time() * 1000)
+        message.mid = timestamp
+        message.time = timestamp
+        message.cmid = timestamp
+        message.to.name = boss_id
+        return protocol, message
+
+    def build_text(self, boss_id, text):
+        """构建文本消息"""
+        protocol, message = self._clone(self._text_template, boss_id)
+        message.body.text = text
+        return protocol
+
+    def build_image(self, boss_id, image_dict):
+        """构建图片消息，image_dict 为 upload_image 的返回结果"""
+        protocol, message = self._clone(self._image_template, boss_id)
+        image = message.body.image
+        for key in ("tinyImage", "originImage"):
+            info = image_dict.get(key)
+            if not info:
+                continue
+            target = getattr(image, key)
+            target.url = info["url"]
+            target.width = int(info["width"])
+            target.height = int(info["height"])
+        return protocol
+
+    def encode_text(self, boss_id, text):
+        """构建并序列化文本消息"""
+        return self.build_text(boss_id, text).SerializeToString()
+
+    def encode_image(self, boss_id, image_dict):
+        """构建并序列化图片消息"""
+        return self.build_image(boss_id, image_dict).SerializeToString()
@@ -0,0 +1,377 @@
+'''
+本地 MQTT over WebSocket 模拟服务器
+用于离线测试 WsClient，行为尽量贴近 ws.zhipin.com：
+  * MQTT 3.1.1 (CONNECT/SUBSCRIBE/PUBLISH/PINGREQ/DISCONNECT)
+  * PUBACK 携带多余字节（与 patch.py 修复的非标准 PUBACK 一致）
+  * 回放 mqtt_websocket_mitmproxy.py 抓取到的 TechwolfChatProtocol 帧（文本日志或 binary 抓包文件）
+
+用法（在 src 目录下）:
+    python -m ws_client.mock_broker --port 8765 --replay boss_websocket.log
+'''
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import struct
+import threading
+
+from google.protobuf import json_format
+from .techwolf_pb2 import TechwolfChatProtocol
+from .capture_format import is_capture_file
+from .capture_tool import load_publish_frames
+
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# MQTT 报文类型
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+# 直聘服务器的 PUBACK 在 packet id 之后还带有额外字节
+DEFAULT_PUBACK_PADDING = b"\x00" * 8
+
+
+def encode_remaining_length(length):
+    """MQTT 剩余长度编码"""
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length > 0:
+            byte |= 0x80
+        encoded.append(byte)
+        if length == 0:
+            return bytes(encoded)
+
+
+def build_packet(packet_type, flags, body):
+    """构建 MQTT 报文"""
+    return bytes([(packet_type << 4) | flags]) + encode_remaining_length(len(body)) + body
+
+
+def build_publish(topic, payload, qos=0, packet_id=None):
+    """构建 PUBLISH 报文"""
+    topic_bytes = topic.encode("utf-8")
+    body = struct.pack("!H", len(topic_bytes)) + topic_bytes
+    if qos > 0:
+        body += struct.pack("!H", packet_id)
+    return build_packet(PUBLISH, qos << 1, body + payload)
+
+
+def load_capture_frames(path, direction="S→C"):
+    """
+    从 mqtt_websocket_mitmproxy.py 的文本日志或二进制抓包文件中加载指定方向的 PUBLISH 帧
+    :return: [(topic, payload_bytes), ...]
+    """
+    if is_capture_file(path):
+        return load_publish_frames(path, "S2C" if direction == "S→C" else "C2S")
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    frames = []
+    # 每条日志以 "时间.毫秒 [级别] " 开头，其后为缩进的 JSON
+    for chunk in re.split(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3} \[\w+\] ", content, flags=re.M):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        try:
+            entry = json.loads(chunk)
+        except json.JSONDecodeError:
+            continue
+        meta = entry.get("meta", {})
+        if meta.get("topic") is None or meta.get("direction") != direction:
+            continue
+        protocol = TechwolfChatProtocol()
+        json_format.ParseDict(entry["content"], protocol)
+        frames.append((meta["topic"], protocol.SerializeToString()))
+    return frames
+
+
+class _WsConnection:
+    """单个 WebSocket 连接，负责帧编解码"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    async def handshake(self, path):
+        request = await self.reader.readuntil(b"\r\n\r\n")
+        lines = request.decode("latin-1").split("\r\n")
+        request_path = lines[0].split(" ")[1] if len(lines[0].split(" ")) > 1 else ""
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key or (path and request_path != path):
+            self.writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            await self.writer.drain()
+            return None
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        response = [
+            "HTTP/1.1 101 Switching Protocols",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Accept: {accept}",
+        ]
+        # 直聘使用 wt2 作为子协议，原样返回
+        protocol = headers.get("sec-websocket-protocol")
+        if protocol:
+            response.append(f"Sec-WebSocket-Protocol: {protocol.split(',')[0].strip()}")
+        self.writer.write(("\r\n".join(response) + "\r\n\r\n").encode())
+        await self.writer.drain()
+        return headers
+
+    async def recv(self):
+        """读取一个完整的数据帧，返回 (opcode, payload)"""
+        head = await self.reader.readexactly(2)
+        opcode = head[0] & 0x0F
+        masked = head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await self.reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+        mask = await self.reader.readexactly(4) if masked else None
+        payload = await self.reader.readexactly(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    async def send(self, payload, opcode=0x2):
+        if self.closed:
+            return
+        length = len(payload)
+        if length < 126:
+            head = bytes([0x80 | opcode, length])
+        elif length < 65536:
+            head = bytes([0x80 | opcode, 126]) + struct.pack("!H", length)
+        else:
+            head = bytes([0x80 | opcode, 127]) + struct.pack("!Q", length)
+        self.writer.write(head + payload)
+        await self.writer.drain()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.writer.write(bytes([0x88, 0]))
+            await self.writer.drain()
+        except ConnectionError:
+            pass
+        self.writer.close()
+
+
+class MockBroker:
+    """模拟直聘聊天服务器"""
+
+    def __init__(self, host="127.0.0.1", port=8765, path="/chatws",
+                 puback_padding=DEFAULT_PUBACK_PADDING, replay_frames=None, replay_interval=0.5):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.puback_padding = puback_padding
+        self.replay_frames = replay_frames or []
+        self.replay_interval = replay_interval
+        self.stats = {
+            "connections": 0,
+            "publish_received": 0,
+            "puback_sent": 0,
+            "replayed": 0,
+        }
+        self.received = []  # [(topic, payload)]
+        self._connections = set()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        # 端口为0时取实际绑定端口
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"MockBroker 监听 ws://{self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        await self.kick_all()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def kick_all(self):
+        """主动断开所有客户端，用于测试重连"""
+        for conn in list(self._connections):
+            await conn.close()
+
+    async def _handle_client(self, reader, writer):
+        conn = _WsConnection(reader, writer)
+        replay_task = None
+        try:
+            if await conn.handshake(self.path) is None:
+                writer.close()
+                return
+            self._connections.add(conn)
+            self.stats["connections"] += 1
+            buffer = bytearray()
+            while not conn.closed:
+                opcode, payload = await conn.recv()
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    await conn.send(payload, opcode=0xA)
+                    continue
+                buffer.extend(payload)
+                for packet_type, flags, body in self._split_packets(buffer):
+                    result = await self._handle_packet(conn, packet_type, flags, body)
+                    if result == "subscribed" and self.replay_frames and replay_task is None:
+                        replay_task = asyncio.create_task(self._replay(conn))
+                    elif result == "disconnect":
+                        await conn.close()
+                        break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if replay_task:
+                replay_task.cancel()
+            self._connections.discard(conn)
+            await conn.close()
+
+    @staticmethod
+    def _split_packets(buffer):
+        """从缓冲区中切出完整的 MQTT 报文"""
+        packets = []
+        while len(buffer) >= 2:
+            multiplier, length, index = 1, 0, 1
+            while True:
+                if index >= len(buffer):
+                    return packets
+                byte = buffer[index]
+                length += (byte & 0x7F) * multiplier
+                multiplier *= 128
+                index += 1
+                if not byte & 0x80:
+                    break
+            if len(buffer) < index + length:
+                break
+            packets.append((buffer[0] >> 4, buffer[0] & 0x0F, bytes(buffer[index:index + length])))
+            del buffer[:index + length]
+        return packets
+
+    async def _handle_packet(self, conn, packet_type, flags, body):
+        if packet_type == CONNECT:
+            await conn.send(build_packet(CONNACK, 0, b"\x00\x00"))
+        elif packet_type == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            topic_length = struct.unpack("!H", body[:2])[0]
+            topic = body[2:2 + topic_length].decode("utf-8")
+            index = 2 + topic_length
+            packet_id = None
+            if qos > 0:
+                packet_id = struct.unpack("!H", body[index:index + 2])[0]
+                index += 2
+            self.received.append((topic, body[index:]))
+            self.stats["publish_received"] += 1
+            if qos == 1:
+                await conn.send(build_packet(PUBACK, 0, struct.pack("!H", packet_id) + self.puback_padding))
+                self.stats["puback_sent"] += 1
+            elif qos == 2:
+                await conn.send(build_packet(PUBREC, 0, struct.pack("!H", packet_id)))
+        elif packet_type == PUBREL:
+            await conn.send(build_packet(PUBCOMP, 0, body[:2]))
+        elif packet_type == SUBSCRIBE:
+            packet_id = body[:2]
+            granted = bytearray()
+            index = 2
+            while index < len(body):
+                topic_length = struct.unpack("!H", body[index:index + 2])[0]
+                index += 2 + topic_length
+                granted.append(min(body[index], 1))
+                index += 1
+            await conn.send(build_packet(SUBACK, 0, packet_id + bytes(granted)))
+            return "subscribed"
+        elif packet_type == PINGREQ:
+            await conn.send(build_packet(PINGRESP, 0, b""))
+        elif packet_type == DISCONNECT:
+            return "disconnect"
+        return None
+
+    async def _replay(self, conn):
+        """按顺序向客户端推送抓包帧"""
+        packet_id = 1
+        for topic, payload in self.replay_frames:
+            await asyncio.sleep(self.replay_interval)
+            await conn.send(build_publish(topic, payload, qos=1, packet_id=packet_id))
+            packet_id = packet_id % 65535 + 1
+            self.stats["replayed"] += 1
+
+    # ---------------- 供同步代码使用的线程封装 ----------------
+    def start_in_thread(self):
+        """在后台线程中运行 broker，返回时已开始监听"""
+        started = threading.Event()
+
+        def runner():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+
+        self._thread = threading.Thread(target=runner, daemon=True, name="mock_broker")
+        self._thread.start()
+        started.wait()
+        return self
+
+    def kick_all_threadsafe(self):
+        asyncio.run_coroutine_threadsafe(self.kick_all(), self._loop).result()
+
+    def stop_threadsafe(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+async def _main(args):
+    frames = load_capture_frames(args.replay) if args.replay else []
+    if frames:
+        logger.info(f"已加载 {len(frames)} 个回放帧")
+    padding = b"" if args.strict_puback else DEFAULT_PUBACK_PADDING
+    broker = MockBroker(args.host, args.port, args.path, padding, frames, args.replay_interval)
+    await broker.start()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logger.info(f"统计: {broker.stats}")
+    finally:
+        await broker.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地 MQTT over WebSocket 模拟服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/chatws")
+    parser.add_argument("--replay", help="mqtt_websocket_mitmproxy.py 生成的日志或抓包文件")
+    parser.add_argument("--replay-interval", type=float, default=0.5)
+    parser.add_argument("--strict-puback", action="store_true", help="发送标准长度的 PUBACK（未打补丁的 paho 使用）")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -7,7 +7,7 @@ from logging.handlers import RotatingFileHandler
 from typing import Optional
 from google.protobuf import json_format
 from techwolf_pb2 import TechwolfChatProtocol
-from google.protobuf import json_format
+from capture_format import CaptureWriter, parse_publish
 
 class BossZPInspector:
     """直聘协议解析器（假设数据可靠版本）"""
@@ -15,6 +15,33 @@ class BossZPInspector:
     def __init__(self):
         self.target_host = "ws6.zhipin.com"
         self.logger = self._init_logger()
+        # log: 解析后写入JSON文本日志；binary: 原始帧追加到二进制文件，离线用 capture_tool 解析
+        self.capture_mode = "log"
+        self.writer: Optional[CaptureWriter] = None
+
+    def load(self, loader):
+        loader.add_option(
+            name="bosszp_capture", typespec=str, default="log",
+            help="抓包记录方式: log(JSON文本日志) / binary(二进制帧文件)"
+        )
+        loader.add_option(
+            name="bosszp_capture_file", typespec=str, default="boss_websocket.bin",
+            help="binary 模式下的抓包文件路径"
+        )
+
+    def configure(self, updated):
+        if "bosszp_capture" not in updated and "bosszp_capture_file" not in updated:
+            return
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        self.capture_mode = ctx.options.bosszp_capture
+        if self.capture_mode == "binary":
+            self.writer = CaptureWriter(ctx.options.bosszp_capture_file)
+
+    def done(self):
+        if self.writer:
+            self.writer.close()
 
     def _init_logger(self):
         """初始化日志系统"""
@@ -34,6 +61,10 @@ class BossZPInspector:
             return
 
         message = flow.websocket.messages[-1]
+        if self.writer:
+            self.writer.write(message.from_client, message.is_text, message.content, message.timestamp)
+            return
+
         metadata = {
             "client": flow.client_conn.peername[0],
             "direction": "C→S" if message.from_client else "S→C",
@@ -54,25 +85,10 @@ class BossZPInspector:
 
     def _parse_binary(self, data: bytes) -> tuple:
         """二进制数据统一处理"""
-        packet_type = (data[0] & 0xF0) >> 4
-        
-        if packet_type != 3:  # 非PUBLISH类型
+        topic, index = parse_publish(data)
+        if topic is None:  # 非PUBLISH类型
             return {"hex": data.hex()}, None
         
-        # MQTT PUBLISH解析
-        index = 1
-        while data[index] > 0x7f and index <=4:
-            index +=1
-        index +=1
-        
-        topic_length = int.from_bytes(data[index:index+2], 'big')
-        index +=2
-        topic = data[index:index+topic_length].decode()
-        index += topic_length
-        
-        if data[0] & 0x06:  # QoS处理
-            index +=2
-        
         # Protobuf解析（数据可靠直接解析）
         pb_data = TechwolfChatProtocol()
         pb_data.ParseFromString(data[index:])
@@ -13,6 +13,7 @@ import aiohttp
 import paho.mqtt.client as mqtt
 import asyncio
 from .techwolf_pb2 import TechwolfChatProtocol
+from .message_factory import MessageFactory
 from google.protobuf import json_format
 import secrets
 from utils.general import get_user_info,get_wt2,upload_image,calculate_md5
@@ -54,6 +55,7 @@ class WsClient(threading.Thread):
         self.executor = ThreadPoolExecutor(max_workers=4)
         self.resume_image_data = None
         self.resume_image_md5 = None
+        self.message_factory = MessageFactory()
 
     def _update_cookies(self):
         # 从SessionManager获取最新配置
@@ -125,45 +127,10 @@ class WsClient(threading.Thread):
     def _sync_send_message(self, task):
         """同步消息发送核心逻辑"""
         # 原send_message的内容移到这里
-        msgtype, securityId, boss_id, msg = task
-        def _build_base_message(boss_id):
-            """构建基础消息结构"""
-            timestamp = int(time.time() * 1000)
-            mid = timestamp
-            return {
-                "type": 1,
-                "messages": [{
-                    "from": {"uid": "0"},
-                    "to": {"uid": "0", "name": boss_id},
-                    "type": 1,
-                    "mid": mid,
-                    "time": timestamp,
-                    "body": {"templateId": 1},
-                    "cmid": mid
-                }]
-            }
-
-        def _build_text_message(chat, text):
-            """构建文本消息体"""
-            body = chat["messages"][0]["body"]
-            body.update({
-                "text": text,
-                "type": 1
-            })
-
-        def _build_image_message(chat, image_dict):
-            """构建图片消息体"""
-            body = chat["messages"][0]["body"]
-            body.update({
-                "type": 3,
-                "image": image_dict
-            })
-
         try:
             msgtype, securityId, boss_id, msg = task
-            chat = _build_base_message(boss_id)
             if msgtype == "msg":
-                _build_text_message(chat, msg)
+                publish_content = self.message_factory.encode_text(boss_id, msg)
             elif msgtype == "image":
                 if not self.send_resume_image:
                     return
@@ -171,12 +138,9 @@ class WsClient(threading.Thread):
                 if image_dict is None:
                     logger.debug(f'图片简历上传失败：bossid：{boss_id},securityId：{securityId}')
                     return
-                _build_image_message(chat, image_dict)
+                publish_content = self.message_factory.encode_image(boss_id, image_dict)
             else:
                 return
-            protocol = TechwolfChatProtocol()
-            json_format.ParseDict(chat, protocol)
-            publish_content = protocol.SerializeToString()
             self.sent_count += 1
             self.publish_done.clear()
             self.client.publish(self.topic, publish_content, qos=1)
@@ -0,0 +1,63 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+from utils.db_utils import DatabaseManager
+from utils.async_db import AsyncDatabaseManager
+
+# 模拟 HTTP/AI 请求的协程每 5ms 运行一次，对比同步与异步调用数据库时事件循环的最大停顿
+ROWS = int(os.environ.get("ASYNC_DB_ROWS", 50000))
+BATCH = 200
+
+db = DatabaseManager(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+records = [{"encryptJobId": f"job{i}", "jobName": f"岗位{i}", "salaryDesc": "10-15K",
+            "postDescription": "负责运维平台建设，熟悉 Kubernetes。" * 20,
+            "visited": True, "updateTime": datetime.now()} for i in range(ROWS)]
+db._write(db._upsert_records, records).result()
+async_db = AsyncDatabaseManager(db)
+
+
+def make_jobs(offset):
+    return [{"job_link": f"/job_detail/job{offset + i}.html?lid=L&securityId=S",
+             "job_name": f"岗位{offset + i}", "job_salary": "10-15K", "company_name": "公司"} for i in range(BATCH)]
+
+
+async def heartbeat(stop, stalls):
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.005)
+        now = time.perf_counter()
+        stalls.append(now - last - 0.005)
+        last = now
+
+
+async def pipeline(use_async):
+    stop, stalls = asyncio.Event(), []
+    task = asyncio.create_task(heartbeat(stop, stalls))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    for offset in range(0, ROWS, BATCH * 10):
+        jobs = make_jobs(offset)
+        if use_async:
+            await async_db.filter_visited(jobs)
+            await async_db.save_jobs_details(jobs, [])
+        else:
+            db.filter_visited(jobs)
+            db.save_jobs_details(jobs, []).result()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await task
+    return elapsed, max(stalls) * 1000, sum(1 for s in stalls if s > 0.05)
+
+
+for name, use_async in (("同步调用", False), ("AsyncDatabaseManager", True)):
+    elapsed, max_stall, long_stalls = asyncio.run(pipeline(use_async))
+    print(f"{name:<22} 总耗时 {elapsed:.2f}s  事件循环最大停顿 {max_stall:.1f} ms  超过50ms的停顿 {long_stalls} 次")
+
+async_db.close()
+db.close()
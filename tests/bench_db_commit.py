@@ -0,0 +1,127 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import random
+import string
+import tempfile
+import threading
+import time
+from src.utils.db_utils import DatabaseManager, JobDetail
+
+'''
+对比 save_jobs_details 改造前后的提交速率：
+  * before: 回滚日志(DELETE) + synchronous=FULL，每个批次单独提交，逐行查询后 ORM 插入/更新（原实现）
+  * after:  WAL + synchronous=NORMAL，写入线程合并多个批次一次提交，批量 UPSERT
+同时运行一个读线程不断执行 filter_visited，统计读操作次数与锁冲突
+'''
+
+
+def legacy_save(db, jobs, jobs_details):
+    """原 save_jobs_details 的写入方式"""
+    job_dict = {db.parseParams(job["job_link"])[0]: db._build_base_job(job) for job in jobs}
+    records = []
+    for detail in jobs_details:
+        card = detail['job_data']['zpData']['jobCard']
+        record = job_dict.pop(card['encryptJobId'], {})
+        record.update(db._build_detail_data(card, detail))
+        records.append(record)
+    records.extend(job_dict.values())
+    with db.Session() as session:
+        for record in records:
+            existing = session.query(JobDetail).filter_by(encryptJobId=record['encryptJobId']).first()
+            if existing:
+                for key, value in record.items():
+                    if key != "first_added_time":
+                        setattr(existing, key, value)
+            else:
+                session.add(JobDetail(**record))
+        session.commit()
+
+
+def random_id(length=24):
+    return ''.join(random.choices(string.ascii_letters + string.digits, k=length))
+
+
+def make_batch(size):
+    jobs, details = [], []
+    for _ in range(size):
+        job_id, lid, security_id = random_id(), random_id(32), random_id(48)
+        job = {
+            'job_name': f"运维工程师-{random_id(4)}",
+            'job_salary': "8-12K",
+            'job_link': f"/job_detail/{job_id}.html?lid={lid}&securityId={security_id}",
+            'company_name': f"公司{random_id(6)}",
+            'company_tags': ["五险一金", "双休"],
+        }
+        jobs.append(job)
+        card = {
+            'encryptJobId': job_id,
+            'postDescription': "岗位职责：" + "负责服务器日常维护与监控。" * 30,
+            'cityName': "海口",
+            'experienceName': "1-3年",
+            'degreeName': "大专",
+            'jobLabels': ["Linux", "Shell"],
+            'address': "海口市龙华区",
+            'encryptUserId': random_id(),
+            'bossName': "张先生",
+            'bossTitle': "HR",
+            'activeTimeDesc': "刚刚活跃",
+        }
+        details.append({
+            'job_id': job_id,
+            'job_data': {'zpData': {'jobCard': card}},
+            'analysis_result': random.random() > 0.5,
+            'analysis_think': None,
+        })
+    return jobs, details
+
+
+def run(label, batches, save, **kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "bench_jobs.db")
+    db = DatabaseManager(path, **kwargs)
+    stop = threading.Event()
+    reader_stats = {"reads": 0, "errors": 0}
+
+    def reader():
+        sample = batches[0][0]
+        while not stop.is_set():
+            try:
+                db.filter_visited(sample)
+                reader_stats["reads"] += 1
+            except Exception:
+                reader_stats["errors"] += 1
+
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
+    start = time.perf_counter()
+    for jobs, details in batches:
+        save(db, jobs, details)
+    db.close()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    reader_thread.join()
+    rows = sum(len(jobs) for jobs, _ in batches)
+    print(f"{label:<8} {len(batches)} 批 / {rows} 行，用时 {elapsed:.2f}s，"
+          f"{len(batches) / elapsed:,.1f} 批/s，{rows / elapsed:,.0f} 行/s，"
+          f"读操作 {reader_stats['reads']} 次，读失败 {reader_stats['errors']} 次")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库提交速率对比")
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=30)
+    args = parser.parse_args()
+
+    random.seed(0)
+    batches = [make_batch(args.batch_size) for _ in range(args.batches)]
+    before = run("before", batches, legacy_save, journal_mode="DELETE", synchronous="FULL", group_commit=False)
+    after = run("after", batches, DatabaseManager.save_jobs_details)
+    print(f"加速比: {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
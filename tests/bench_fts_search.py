@@ -0,0 +1,67 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import random
+import tempfile
+import time
+from utils.db_utils import DatabaseManager
+
+# 生成大量岗位描述，对比全文检索与 LIKE 全表扫描的耗时
+ROWS = int(os.environ.get("FTS_ROWS", 200000))
+base_words = ["运维平台", "Kubernetes", "Python", "Golang", "监控告警", "自动化部署", "数据库", "高可用",
+              "团队协作", "微服务", "容器化", "日志分析", "持续集成", "网络安全", "云计算", "消息队列"]
+syllables = "业务系统架构设计开发测试部署优化性能安全网络存储计算调度分布式缓存接口服务平台数据分析"
+random.seed(1)
+# 词表约 1000 个词，每个词只出现在少量岗位中，接近真实职位描述的分布
+words = base_words + list({"".join(random.sample(syllables, 4)) for _ in range(1000)})
+companies = ["字节跳动", "腾讯", "阿里巴巴", "美团", "京东", "百度", "小米", "网易"]
+
+db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+db = DatabaseManager(db_path, group_commit=False)
+records = [{
+    "encryptJobId": f"job{i}",
+    "jobName": random.choice(["运维工程师", "开发工程师", "SRE", "DBA", "测试工程师"]),
+    "companyName": random.choice(companies),
+    "postDescription": "，".join(random.choices(words, k=30)) + f"，编号{i}",
+    "updateTime": None,
+} for i in range(ROWS)]
+start = time.perf_counter()
+db._write(db._upsert_records, records)
+print(f"写入 {ROWS} 条（含索引维护）: {time.perf_counter() - start:.1f}s, fts_enabled={db.fts_enabled}")
+
+
+def bench(name, func, rounds=20):
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    elapsed = (time.perf_counter() - start) * 1000 / rounds
+    print(f"{name:<28} {elapsed:>8.2f} ms  ({len(result)} 条)")
+    return elapsed
+
+
+def like_scan(term):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            'SELECT "encryptJobId" FROM job_details WHERE "postDescription" LIKE ? LIMIT 20', (f"%{term}%",)).fetchall()
+
+
+def like_scan_rare(term):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            'SELECT "encryptJobId" FROM job_details WHERE "postDescription" LIKE ? ORDER BY "updateTime" LIMIT 20',
+            (f"%{term}%",)).fetchall()
+
+
+rare = f"编号{ROWS - 7}"
+fts = bench("FTS 罕见词", lambda: db.search_jobs(rare))
+like = bench("LIKE 罕见词", lambda: like_scan_rare(rare))
+print(f"加速比: {like / fts:.0f}x")
+bench("FTS 常见词排序", lambda: db.search_jobs("运维平台"))
+bench("FTS 多词排序", lambda: db.search_jobs("运维平台 Kubernetes 监控告警"))
+bench("FTS 长词+短词(LIKE)", lambda: db.search_jobs("Kubernetes 腾讯"))
+bench("LIKE 常见词(提前结束)", lambda: like_scan("监控告警"))
+assert db.search_jobs(rare)[0]["encryptJobId"] == f"job{ROWS - 7}"
+db.close()
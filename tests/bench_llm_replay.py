@@ -0,0 +1,111 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import queue
+import tempfile
+import threading
+import time
+import yaml
+from aiohttp import web
+from utils.config_manager import ConfigManager
+
+# 通过 JobHandler 完整的处理路径（详情缓存 → AI 分析）对比录制与回放的耗时
+# 本地模拟的模型服务每次请求耗时 LLM_DELAY 秒；岗位详情使用缓存，不访问招聘网站
+PORT = 18766
+LLM_DELAY = float(os.environ.get("LLM_DELAY", 0.5))
+JOBS = 30
+llm_requests = 0
+
+
+async def handle(request):
+    global llm_requests
+    llm_requests += 1
+    body = await request.json()
+    await asyncio.sleep(LLM_DELAY)
+    # 都返回 false，避免调用投递接口；think 部分随请求变化，用于检查回放结果是否对应
+    verdict = "false"
+    return web.json_response({"choices": [{"message": {"content": f"<think>{len(str(body))}</think>{verdict}"}}]})
+
+
+def write_config(tmp_dir, mode, cache_file="llm_cache.db"):
+    root = os.path.join(os.path.dirname(__file__), '..')
+    with open(os.path.join(root, "config", "config_sample.yaml"), encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["database"]["filename"] = os.path.join(tmp_dir, "jobs.db")
+    config["ai"].update({
+        "provider": "openai", "api_key": "key", "model": "fake",
+        "api_url": f"http://127.0.0.1:{PORT}/v1/chat/completions",
+        "resume_for_ai_file": os.path.join(tmp_dir, "resume.md"),
+        "cache_mode": mode, "cache_file": os.path.join(tmp_dir, cache_file),
+    })
+    config["application"]["greeting"]["enable_ai"] = False
+    config["job_check"]["test_mode"] = False
+    path = os.path.join(tmp_dir, f"config_{mode}.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return path
+
+
+def run_batch(tmp_dir, mode, replay_latency="zero", cache_file="llm_cache.db"):
+    ConfigManager._instance = None
+    ConfigManager.load_config(write_config(tmp_dir, mode, cache_file))
+    from job_handler import JobHandler
+    handler = JobHandler(queue.Queue(), queue.Queue(), threading.Event(), threading.Event())
+    if handler.ai_analyzer.cache:
+        handler.ai_analyzer.cache.replay_latency = replay_latency
+    jobs = [{"job_link": f"/job_detail/job{i}.html?lid=L&securityId=S", "job_name": f"运维工程师{i}",
+             "job_salary": "15-25K"} for i in range(JOBS)]
+    cards = {f"job{i}": {"encryptJobId": f"job{i}", "brandName": f"公司{i}", "jobName": f"运维工程师{i}",
+                         "postDescription": f"负责运维平台建设 {i}", "experienceName": "3-5年",
+                         "degreeName": "本科", "activeTimeDesc": "刚刚活跃"} for i in range(JOBS)}
+    loop = asyncio.new_event_loop()
+    start = time.perf_counter()
+    results = loop.run_until_complete(handler._process_batch(jobs, cards))
+    elapsed = time.perf_counter() - start
+    loop.run_until_complete(_close())
+    loop.close()
+    handler.async_db.close()
+    handler.db_manager.close()
+    return elapsed, [(r["job_id"], r["analysis_result"], r["analysis_think"], r.get("parked")) for r in results]
+
+
+async def _close():
+    from utils.session_manager import SessionManager
+    await SessionManager.close()
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp()
+    with open(os.path.join(tmp_dir, "resume.md"), "w", encoding="utf-8") as f:
+        f.write("五年运维经验，熟悉 Kubernetes。")
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    recorded, expected = run_batch(tmp_dir, "record")
+    requests_after_record = llm_requests
+    replayed, actual = run_batch(tmp_dir, "replay")
+    original, _ = run_batch(tmp_dir, "replay", replay_latency="original")
+    print(f"录制  {JOBS} 个岗位: {recorded:.2f}s（模型请求 {requests_after_record} 次）")
+    print(f"回放  {JOBS} 个岗位: {replayed:.3f}s（模型请求 {llm_requests - requests_after_record} 次），"
+          f"加速 {recorded / replayed:.0f}x")
+    print(f"按原耗时回放: {original:.2f}s")
+    assert actual == expected, "回放结果与录制时不一致"
+    assert llm_requests == requests_after_record
+    # 回放未命中的岗位暂缓，不记为不匹配
+    _, missed = run_batch(tmp_dir, "replay", cache_file="empty_cache.db")
+    assert all(result is None and parked for _, result, _, parked in missed), missed
+    assert llm_requests == requests_after_record
+    print(f"回放未命中: {len(missed)} 个岗位暂缓")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+from google.protobuf import json_format
+from src.ws_client.techwolf_pb2 import TechwolfChatProtocol
+from src.ws_client.message_factory import MessageFactory
+
+# 对比 dict + ParseDict 与模板克隆两种方式的序列化吞吐
+ROUNDS = 20000
+boss_id = "3aa60c387c96fc671X172d66GFM~"
+text = "您好，我对该岗位很感兴趣，我的运维经验与岗位要求较为契合，希望能进一步沟通。"
+image_dict = {
+    "tinyImage": {
+        "url": "https://img.bosszhipin.com/beijin/upload/tmp/20250305/tiny.png",
+        "width": 200,
+        "height": 258
+    },
+    "originImage": {
+        "url": "https://img.bosszhipin.com/beijin/upload/tmp/20250305/origin.png",
+        "width": 1700,
+        "height": 2200
+    }
+}
+
+
+def encode_with_dict(boss_id, body, timestamp):
+    """原 _sync_send_message 中的实现"""
+    chat = {
+        "type": 1,
+        "messages": [{
+            "from": {"uid": "0"},
+            "to": {"uid": "0", "name": boss_id},
+            "type": 1,
+            "mid": timestamp,
+            "time": timestamp,
+            "body": {"templateId": 1},
+            "cmid": timestamp
+        }]
+    }
+    chat["messages"][0]["body"].update(body)
+    protocol = TechwolfChatProtocol()
+    json_format.ParseDict(chat, protocol)
+    return protocol.SerializeToString()
+
+
+def bench(name, func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {ROUNDS / elapsed:>12,.0f} msg/s  ({elapsed * 1e6 / ROUNDS:.2f} us/msg)")
+    return elapsed
+
+
+factory = MessageFactory()
+
+# 校验两种方式输出一致（固定时间戳）
+timestamp = int(time.time() * 1000)
+expected = encode_with_dict(boss_id, {"text": text, "type": 1}, timestamp)
+protocol = factory.build_text(boss_id, text)
+for field in ("mid", "time", "cmid"):
+    setattr(protocol.messages[0], field, timestamp)
+assert protocol.SerializeToString() == expected, "文本消息序列化结果不一致"
+
+expected = encode_with_dict(boss_id, {"type": 3, "image": image_dict}, timestamp)
+protocol = factory.build_image(boss_id, image_dict)
+for field in ("mid", "time", "cmid"):
+    setattr(protocol.messages[0], field, timestamp)
+assert protocol.SerializeToString() == expected, "图片消息序列化结果不一致"
+
+print("文本消息:")
+old = bench("dict+ParseDict", lambda: encode_with_dict(boss_id, {"text": text, "type": 1}, int(time.time() * 1000)))
+new = bench("MessageFactory", lambda: factory.encode_text(boss_id, text))
+print(f"加速比: {old / new:.1f}x\n")
+
+print("图片消息:")
+old = bench("dict+ParseDict", lambda: encode_with_dict(boss_id, {"type": 3, "image": image_dict}, int(time.time() * 1000)))
+new = bench("MessageFactory", lambda: factory.encode_image(boss_id, image_dict))
+print(f"加速比: {old / new:.1f}x")
@@ -0,0 +1,158 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import yaml
+from aiohttp import web
+from utils.config_manager import ConfigManager
+from utils.db_utils import DatabaseManager
+from utils.near_dup import minhash, minhash_row
+
+# 1. 10 万岗位的库中查找相似岗位的耗时
+# 2. 同一公司发布的多个相似岗位在同一批次中只请求一次AI
+JOBS = int(os.environ.get("JOBS", 100000))
+LOOKUPS = 2000
+PORT = 18770
+random.seed(7)
+WORDS = [w for w in (
+    "负责 参与 熟悉 掌握 精通 了解 具备 优先 良好 独立 完成 设计 开发 测试 运维 部署 优化 维护 监控 排查 "
+    "Linux Python Java Go Docker Kubernetes MySQL Redis Kafka Nginx Shell Ansible Prometheus Hadoop Spark "
+    "系统 平台 集群 服务 架构 数据库 网络 安全 自动化 性能 稳定性 高可用 容量 规划 文档 团队 沟通 协作 "
+    "本科 大专 学历 经验 年以上 计算机 相关专业 责任心 学习能力 抗压 值班 出差 客户 需求 方案 项目 交付"
+).split()]
+
+
+def description():
+    return "；".join("".join(random.choices(WORDS, k=random.randint(4, 9))) for _ in range(random.randint(8, 14)))
+
+
+def variant(text):
+    """同一公司的相似岗位：替换一个词，末尾追加工作地点"""
+    word = random.choice([w for w in WORDS if w in text])
+    text = text.replace(word, random.choice(WORDS), 1)
+    return text + "；工作地点：" + random.choice(["北京", "上海", "深圳", "杭州", "成都"])
+
+
+def build_db(db_path):
+    db = DatabaseManager(db_path, group_commit=False)
+    db.close()
+    conn = sqlite3.connect(db_path)
+    start = time.perf_counter()
+    details, signatures = [], []
+    for i in range(JOBS):
+        text = description()
+        details.append((f"job{i}", f"运维工程师{i}", f"公司{i // 20}", text, i % 3 == 0, "ai"))
+        signatures.append(minhash_row(f"job{i}", text))
+    build = time.perf_counter() - start
+    conn.executemany('INSERT INTO job_details ("encryptJobId", "jobName", "companyName", "postDescription", '
+                     '"analysisResult", analysis_source) VALUES (?, ?, ?, ?, ?, ?)', details)
+    columns = list(signatures[0])
+    conn.executemany(f'INSERT INTO job_minhash ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                     [tuple(row[c] for c in columns) for row in signatures])
+    conn.commit()
+    conn.close()
+    print(f"生成 {JOBS} 个岗位的签名: {build:.1f}s（{build / JOBS * 1e6:.0f} us/个）")
+    return details
+
+
+def bench_lookup(db_path, details):
+    db = DatabaseManager(db_path, group_commit=False)
+    samples = random.sample(details, LOOKUPS)
+    queries = [(f"new{i}", minhash(variant(text)), company) for i, (_, _, company, text, _, _) in enumerate(samples)]
+    queries += [(f"other{i}", minhash(description()), f"公司{i}") for i in range(LOOKUPS)]
+    timings, found = [], 0
+    for job_id, signature, company in queries:
+        start = time.perf_counter()
+        similar = db.find_near_duplicate(job_id, signature, 0.85, company)
+        timings.append(time.perf_counter() - start)
+        found += similar is not None and job_id.startswith("new")
+    wrong = sum(1 for (job_id, signature, company) in queries[LOOKUPS:]
+                if db.find_near_duplicate(job_id, signature, 0.85, company))
+    db.close()
+    timings.sort()
+    print(f"查找 {len(queries)} 次: p50 {timings[len(timings) // 2] * 1e6:.0f} us，"
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us")
+    print(f"相似岗位命中 {found}/{LOOKUPS}，不相关岗位误判 {wrong}/{LOOKUPS}")
+
+
+llm_requests = 0
+
+
+async def handle(request):
+    global llm_requests
+    llm_requests += 1
+    await asyncio.sleep(0.2)
+    return web.json_response({"choices": [{"message": {"content": "false"}}]})
+
+
+def bench_batch(tmp_dir):
+    root = os.path.join(os.path.dirname(__file__), '..')
+    with open(os.path.join(root, "config", "config_sample.yaml"), encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["database"]["filename"] = os.path.join(tmp_dir, "batch.db")
+    config["ai"].update({"provider": "openai", "api_key": "key", "model": "fake",
+                         "api_url": f"http://127.0.0.1:{PORT}/v1/chat/completions",
+                         "resume_for_ai_file": os.path.join(tmp_dir, "resume.md")})
+    config["application"]["greeting"]["enable_ai"] = False
+    config["job_check"].update({"test_mode": False, "near_dup": "reject_only"})
+    path = os.path.join(tmp_dir, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    ConfigManager.load_config(path)
+    from job_handler import JobHandler
+    from utils.session_manager import SessionManager
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+
+    handler = JobHandler(queue.Queue(), queue.Queue(), threading.Event(), threading.Event())
+    # 两家公司各 10 个相似岗位
+    base = {company: description() for company in ("公司A", "公司B")}
+    jobs, cards = [], {}
+    for i in range(20):
+        company = "公司A" if i < 10 else "公司B"
+        jobs.append({"job_link": f"/job_detail/dup{i}.html?lid=L&securityId=S", "job_name": f"运维工程师（{i}）",
+                     "job_salary": "15-25K", "company_name": company})
+        cards[f"dup{i}"] = {"encryptJobId": f"dup{i}", "brandName": company, "jobName": f"运维工程师（{i}）",
+                            "postDescription": base[company] if i % 10 == 0 else variant(base[company]),
+                            "experienceName": "3-5年", "degreeName": "本科", "activeTimeDesc": "刚刚活跃"}
+    results = loop.run_until_complete(handler._process_batch(jobs, cards))
+    loop.run_until_complete(handler.async_db.save_jobs_details(jobs, results))
+    reused = sum(1 for r in results if (r["analysis_think"] or "").startswith("[相似岗位"))
+    print(f"同一批次 20 个岗位（2 家公司各 10 个相似岗位）: AI请求 {llm_requests} 次，复用结果 {reused} 个")
+
+    # 下一批次的相似岗位直接从数据库中找到
+    more = [{"job_link": "/job_detail/dup99.html?lid=L&securityId=S", "job_name": "运维工程师（99）",
+             "job_salary": "15-25K", "company_name": "公司A"}]
+    more_cards = {"dup99": dict(cards["dup1"], encryptJobId="dup99", postDescription=variant(base["公司A"]))}
+    before = llm_requests
+    results = loop.run_until_complete(handler._process_batch(more, more_cards))
+    print(f"下一批次的相似岗位: AI请求 {llm_requests - before} 次，{results[0]['analysis_think']}")
+    handler.async_db.close()
+    handler.db_manager.close()
+    loop.run_until_complete(SessionManager.close())
+    loop.run_until_complete(runner.cleanup())
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(tmp_dir, "jobs.db")
+    details = build_db(db_path)
+    bench_lookup(db_path, details)
+    bench_batch(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
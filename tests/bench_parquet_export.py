@@ -0,0 +1,76 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+from utils.db_utils import DatabaseManager
+from utils.exporter import export_parquet, read_parquet_table
+
+# 模拟一年的抓取记录，对比 Parquet 与 xlsx 的重新加载耗时
+ROWS = int(os.environ.get("PARQUET_ROWS", 100000))
+XLSX_ROWS = int(os.environ.get("XLSX_ROWS", 10000))
+cities = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "南京"]
+experiences = ["不限", "1-3年", "3-5年", "5-10年", "应届生"]
+degrees = ["大专", "本科", "硕士", "博士"]
+
+export_dir = tempfile.mkdtemp()
+db_path = os.path.join(export_dir, "jobs.db")
+db = DatabaseManager(db_path, group_commit=False)
+random.seed(1)
+start_time = datetime.now() - timedelta(days=365)
+records = [{
+    "encryptJobId": f"job{i}",
+    "jobName": f"运维工程师{i % 50}",
+    "salaryDesc": random.choice(["10-15K", "15-25K", "20-30K·14薪"]),
+    "companyName": f"公司{i % 3000}",
+    "postDescription": "负责运维平台建设，熟悉 Kubernetes、监控告警与自动化部署。" * 4,
+    "cityName": random.choice(cities),
+    "experienceName": random.choice(experiences),
+    "degreeName": random.choice(degrees),
+    "visited": True,
+    "analysisResult": random.random() < 0.3,
+    "updateTime": start_time + timedelta(minutes=5 * i),
+    "first_added_time": start_time + timedelta(minutes=5 * i),
+} for i in range(ROWS)]
+db._write(db._upsert_records, records)
+db.close()
+
+start = time.perf_counter()
+exported = export_parquet(db_path, export_dir)
+print(f"Parquet 全量导出 {exported}: {time.perf_counter() - start:.2f}s")
+
+start = time.perf_counter()
+df = read_parquet_table(export_dir)
+parquet_load = time.perf_counter() - start
+print(f"Parquet 加载 {len(df)} 行: {parquet_load:.2f}s  dtypes: cityName={df['cityName'].dtype}, "
+      f"updateTime={df['updateTime'].dtype}, analysisResult={df['analysisResult'].dtype}")
+assert len(df) == ROWS
+
+# 增量导出：更新 100 行后只追加一个小分片，读取时按主键保留最新
+conn = sqlite3.connect(db_path)
+with conn:
+    conn.execute('UPDATE job_details SET "analysisResult" = 1, "updateTime" = ? '
+                 'WHERE rowid IN (SELECT rowid FROM job_details LIMIT 100)', (str(datetime.now()),))
+conn.close()
+start = time.perf_counter()
+exported = export_parquet(db_path, export_dir, incremental=True)
+print(f"Parquet 增量导出 {exported}: {time.perf_counter() - start:.2f}s")
+df = read_parquet_table(export_dir)
+assert len(df) == ROWS and df[df["encryptJobId"] == "job0"]["analysisResult"].iloc[0]
+
+# xlsx 对比（行数较少，按比例估算）
+xlsx_path = os.path.join(export_dir, "jobs.xlsx")
+conn = sqlite3.connect(db_path)
+pd.read_sql_query(f"SELECT * FROM job_details LIMIT {XLSX_ROWS}", conn).to_excel(xlsx_path, index=False)
+conn.close()
+start = time.perf_counter()
+pd.read_excel(xlsx_path)
+xlsx_load = (time.perf_counter() - start) * ROWS / XLSX_ROWS
+print(f"xlsx 加载 {ROWS} 行（按 {XLSX_ROWS} 行估算）: {xlsx_load:.2f}s，Parquet 加速比 {xlsx_load / parquet_load:.0f}x")
@@ -0,0 +1,53 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import threading
+import time
+from yarl import URL
+from utils.session_manager import SessionManager
+
+# 大量协程并发调用 get_async_session 的耗时，以及另一个线程更新 cookies 后新值能否生效
+COROUTINES = int(os.environ.get("COROUTINES", 500))
+CALLS = int(os.environ.get("CALLS", 200))
+COOKIES = 60  # 登录后的 cookies 数量级
+
+
+async def worker(get_session=True):
+    for _ in range(CALLS):
+        if get_session:
+            await SessionManager.get_async_session()
+        await asyncio.sleep(0)
+
+
+async def main():
+    SessionManager.update_session({f"c{i}": "x" * 40 for i in range(COOKIES)}, {"User-Agent": "bench"})
+    await SessionManager.get_async_session()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(COROUTINES)))
+    elapsed = time.perf_counter() - start
+    # 只有 sleep(0) 的相同循环，作为基准扣除
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(False) for _ in range(COROUTINES)))
+    baseline = time.perf_counter() - start
+    calls = COROUTINES * CALLS
+    print(f"{COROUTINES} 个协程各调用 {CALLS} 次：{elapsed:.2f}s（基准 {baseline:.2f}s），"
+          f"get_async_session {(elapsed - baseline) / calls * 1e6:.2f} us/次")
+
+    # 其他线程更新 cookies，之后获取的 session 应带上新值
+    thread = threading.Thread(target=SessionManager.update_session, args=({"c0": "new"}, {"User-Agent": "bench2"}))
+    thread.start()
+    thread.join()
+    session = await SessionManager.get_async_session()
+    cookies = session.cookie_jar.filter_cookies(URL("https://www.zhipin.com"))
+    assert cookies["c0"].value == "new", cookies["c0"].value
+    assert session.headers.get("User-Agent") == "bench2"
+    print(f"更新后 cookie c0={cookies['c0'].value}，User-Agent={session.headers.get('User-Agent')}")
+    await SessionManager.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import time
+from aiohttp import web
+from utils.ai_router import AiEndpoint, AiRouter
+from utils.session_manager import SessionManager
+
+# 本地启动一个 chat/completions 服务，/fast /slow /fail 三个端点分别模拟快速、慢速和故障的服务商
+PORT = 18765
+DELAYS = {"fast": 0.05, "slow": 0.6}
+
+
+async def handle(request):
+    name = request.match_info["name"]
+    body = await request.json()
+    if name == "fail":
+        return web.json_response({"error": "overloaded"}, status=503)
+    await asyncio.sleep(DELAYS[name])
+    return web.json_response({"choices": [{"message": {"content": f"{name}:{body['model']}"}}]})
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/{name}/chat/completions", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    def endpoint(name, concurrency=4):
+        return AiEndpoint(name, "openai", f"http://127.0.0.1:{PORT}/{name}/chat/completions", "key",
+                          f"model-{name}", max_concurrency=concurrency)
+
+    payload = {"messages": [{"role": "user", "content": "hi"}], "temperature": 0.2}
+
+    # 故障转移 + 按延迟选择：故障端点和慢端点的请求逐渐转移到快端点
+    router = AiRouter([endpoint("fail"), endpoint("slow"), endpoint("fast")])
+    results = [await router.chat(payload) for _ in range(20)]
+    assert all(r["choices"][0]["message"]["content"].split(":")[0] in ("fast", "slow") for r in results)
+    stats = {s["name"]: s for s in router.stats()["endpoints"]}
+    print("故障转移:", {name: (s["requests"], s["errors"], s["latency_ms"]) for name, s in stats.items()})
+    assert stats["fail"]["requests"] <= 2 and stats["fast"]["requests"] >= 17
+
+    # 对冲：慢端点排第一时，0.1s 后向快端点再发一份
+    router = AiRouter([endpoint("slow"), endpoint("fast")], hedge_after=0.1)
+    router.endpoints[1].latency = 10  # 让快端点初始排在后面
+    start = time.perf_counter()
+    result = await router.chat(payload)
+    elapsed = time.perf_counter() - start
+    print(f"对冲: {result['choices'][0]['message']['content']} 耗时 {elapsed:.2f}s, hedged={router.hedged}")
+    assert result["choices"][0]["message"]["content"].startswith("fast") and elapsed < 0.5
+
+    # 并发上限：快端点只允许 2 个并发，排队预计耗时超过慢端点后，请求分流到慢端点
+    router = AiRouter([endpoint("fast", concurrency=2), endpoint("slow")])
+    for item in router.endpoints:
+        await router._send(item, payload)
+    await asyncio.gather(*(router.chat(payload) for _ in range(40)))
+    requests = {s["name"]: s["requests"] for s in router.stats()["endpoints"]}
+    print("并发分流:", requests)
+    assert requests["slow"] > 1
+
+    await SessionManager.close()
+    await runner.cleanup()
+
+
+asyncio.run(main())
@@ -0,0 +1,152 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import yaml
+from aiohttp import web
+from utils.config_manager import ConfigManager
+from utils.circuit_breaker import CircuitBreaker, OPEN, HALF_OPEN, CLOSED
+
+# AI服务故障时，一批岗位应在熔断后快速暂缓分析（不记为不匹配、不标记已访问），服务恢复后探测请求关闭熔断
+PORT = 18769
+JOBS = 20
+server = {"healthy": False, "requests": 0, "malformed": False}
+
+
+async def handle(request):
+    server["requests"] += 1
+    if server["malformed"]:
+        return web.json_response({"error": "unexpected"})
+    if not server["healthy"]:
+        return web.Response(status=503)
+    return web.json_response({"choices": [{"message": {"content": "false"}}]})
+
+
+def test_states():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.2)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.25)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # 半开状态只放行一个探测请求
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.25)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def make_handler(tmp_dir, **ai):
+    root = os.path.join(os.path.dirname(__file__), '..')
+    with open(os.path.join(root, "config", "config_sample.yaml"), encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["database"]["filename"] = os.path.join(tmp_dir, "jobs.db")
+    config["ai"].update({
+        "provider": "openai", "api_key": "key", "model": "fake",
+        "api_url": f"http://127.0.0.1:{PORT}/v1/chat/completions",
+        "resume_for_ai_file": os.path.join(tmp_dir, "resume.md"),
+        "breaker_failures": 5, "breaker_reset": 2,
+    }, **ai)
+    config["application"]["greeting"]["enable_ai"] = False
+    config["job_check"]["test_mode"] = False
+    path = os.path.join(tmp_dir, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    ConfigManager._instance = None
+    ConfigManager.load_config(path)
+    from job_handler import JobHandler
+    return JobHandler(queue.Queue(), queue.Queue(), threading.Event(), threading.Event())
+
+
+def make_batch():
+    jobs = [{"job_link": f"/job_detail/job{i}.html?lid=L&securityId=S", "job_name": f"运维工程师{i}",
+             "job_salary": "15-25K"} for i in range(JOBS)]
+    cards = {f"job{i}": {"encryptJobId": f"job{i}", "brandName": f"公司{i}", "jobName": f"运维工程师{i}",
+                         "postDescription": "外包驻场运维" if i % 2 else "负责运维平台建设",
+                         "experienceName": "3-5年", "degreeName": "本科", "activeTimeDesc": "刚刚活跃"}
+             for i in range(JOBS)}
+    return jobs, cards
+
+
+def run(loop, handler, timeout=60):
+    jobs, cards = make_batch()
+    start = time.perf_counter()
+    results = loop.run_until_complete(asyncio.wait_for(handler._process_batch(jobs, cards), timeout))
+    return results, time.perf_counter() - start
+
+
+def main():
+    test_states()
+    tmp_dir = tempfile.mkdtemp()
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+
+    # 服务故障：熔断后其余岗位直接暂缓
+    handler = make_handler(tmp_dir)
+    results, elapsed = run(loop, handler)
+    parked = [r for r in results if r.get("parked")]
+    print(f"服务故障: {JOBS} 个岗位耗时 {elapsed:.1f}s，暂缓 {len(parked)} 个，模型请求 {server['requests']} 次，"
+          f"熔断状态 {handler.ai_analyzer.breaker.stats()}")
+    assert len(parked) == JOBS and all(r["analysis_result"] is None for r in parked)
+    assert elapsed < 10, "熔断后不应继续等待重试"
+
+    # 暂缓的岗位不标记为已访问，也不写入 applications
+    handler.db_manager.save_jobs_details(make_batch()[0], results, "account").result()
+    assert handler.db_manager.filter_visited(make_batch()[0], "account") == make_batch()[0]
+
+    # 服务恢复：等待熔断结束，探测请求成功后正常分析
+    server["healthy"] = True
+    time.sleep(2.1)
+    results, elapsed = run(loop, handler)
+    assert handler.ai_analyzer.breaker.state == CLOSED
+    assert all(r["analysis_result"] is False and not r.get("parked") for r in results)
+    print(f"服务恢复: {JOBS} 个岗位耗时 {elapsed:.2f}s，熔断状态 {handler.ai_analyzer.breaker.stats()}")
+    handler.async_db.close()
+    handler.db_manager.close()
+
+    # 未启用熔断时分析失败（响应格式错误）：同样暂缓，不记为不匹配
+    server["malformed"] = True
+    handler = make_handler(tempfile.mkdtemp(), breaker_failures=0)
+    results, elapsed = run(loop, handler)
+    server["malformed"] = False
+    print(f"未启用熔断: 分析失败的 {sum(1 for r in results if r.get('parked'))} 个岗位暂缓")
+    assert all(r.get("parked") and r["analysis_result"] is None for r in results)
+    handler.async_db.close()
+    handler.db_manager.close()
+
+    # 规则判断：熔断期间按关键词决定是否匹配（均不匹配，避免调用投递接口）
+    server["healthy"] = False
+    tmp_dir = tempfile.mkdtemp()
+    handler = make_handler(tmp_dir, fallback="rules",
+                           fallback_rules={"include_keywords": ["前端"], "exclude_keywords": ["外包"]})
+    results, elapsed = run(loop, handler)
+    by_rule = [r for r in results if r["analysis_think"] and r["analysis_think"].startswith("[规则判断]")]
+    print(f"规则判断: {len(by_rule)} 个岗位使用规则判断，耗时 {elapsed:.1f}s")
+    assert len(by_rule) == JOBS and not any(r["analysis_result"] for r in by_rule)
+    handler.async_db.close()
+    handler.db_manager.close()
+    conn = sqlite3.connect(os.path.join(tmp_dir, "jobs.db"))
+    print("请求记录:", conn.execute("SELECT outcome, COUNT(*) FROM ai_calls GROUP BY outcome").fetchall())
+
+    from utils.session_manager import SessionManager
+    loop.run_until_complete(SessionManager.close())
+    loop.run_until_complete(runner.cleanup())
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import tempfile
+import yaml
+from aiohttp import web
+from utils.config_manager import ConfigManager
+from utils.session_manager import SessionManager
+
+# 对比匹配岗位在分开请求和合并请求两种方式下的请求次数和输入字符数，并检查回答格式错误时的回退
+PORT = 18767
+RESUME = "五年运维经验，熟悉 Kubernetes、Prometheus，负责过千台规模集群。" * 20
+stats = {"requests": 0, "input_chars": 0}
+server = {"malformed": False}
+
+
+async def handle(request):
+    body = await request.json()
+    stats["requests"] += 1
+    stats["input_chars"] += sum(len(m["content"]) for m in body["messages"])
+    last = body["messages"][-1]["content"]
+    if '"match"' in last:
+        content = "not json" if server["malformed"] else \
+            '<think>方向一致</think>```json\n{"match": true, "greeting": "您好，我有五年运维经验"}\n```'
+    elif "打招呼语" in last:
+        content = "您好，我有五年运维经验"
+    else:
+        content = "true"
+    return web.json_response({"choices": [{"message": {"content": content}}]})
+
+
+def load_config(tmp_dir):
+    root = os.path.join(os.path.dirname(__file__), '..')
+    with open(os.path.join(root, "config", "config_sample.yaml"), encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    with open(os.path.join(tmp_dir, "resume.md"), "w", encoding="utf-8") as f:
+        f.write(RESUME)
+    config["ai"].update({
+        "provider": "openai", "api_key": "key", "model": "fake", "combined_greeting": True,
+        "api_url": f"http://127.0.0.1:{PORT}/v1/chat/completions",
+        "resume_for_ai_file": os.path.join(tmp_dir, "resume.md"),
+    })
+    config["application"]["greeting"]["enable_ai"] = True
+    path = os.path.join(tmp_dir, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    ConfigManager._instance = None
+    ConfigManager.load_config(path)
+
+
+def test_parse():
+    from utils.ai_analyzer import AiAnalyzer
+    parse = AiAnalyzer.parse_combined
+    assert parse('{"match": true, "greeting": " 您好 "}') == (True, "您好")
+    assert parse('```json\n{"match": false, "greeting": ""}\n```') == (False, None)
+    assert parse('{"match": "true", "greeting": "您好"}') is None  # match 必须是布尔值
+    assert parse('{"match": true, "greeting": ""}') is None  # 匹配时必须有打招呼语
+    assert parse('{"match": true') is None
+    assert parse('true') is None
+
+
+async def run(job):
+    from utils.ai_analyzer import AiAnalyzer
+    analyzer = AiAnalyzer()
+
+    def reset():
+        stats.update(requests=0, input_chars=0)
+
+    reset()
+    match, _ = await analyzer.ai_hr_check(job)
+    greeting = await analyzer.ai_greeting(job)
+    separate = dict(stats)
+    assert match and greeting
+
+    reset()
+    match, think, greeting = await analyzer.ai_check_and_greet(job)
+    combined = dict(stats)
+    assert match and greeting == "您好，我有五年运维经验" and think == "方向一致"
+
+    print(f"分开请求: {separate['requests']} 次，输入 {separate['input_chars']} 字符")
+    print(f"合并请求: {combined['requests']} 次，输入 {combined['input_chars']} 字符 "
+          f"({combined['input_chars'] / separate['input_chars']:.0%})")
+    assert combined["requests"] * 2 == separate["requests"]
+    assert combined["input_chars"] < separate["input_chars"] * 0.65
+
+    # 回答格式不正确时返回 None，由 JobHandler 改用分开请求
+    server["malformed"] = True
+    assert await analyzer.ai_check_and_greet(job) is None
+
+
+async def main():
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    try:
+        load_config(tempfile.mkdtemp())
+        test_parse()
+        await run("职位名称：运维工程师\n岗位描述：负责 Kubernetes 集群运维\n经验要求：3-5年\n学历要求：本科")
+    finally:
+        await SessionManager.close()
+        await runner.cleanup()
+    print("ok")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+from yarl import URL
+from utils.cookie_sync import CookieSync, parse_cookie
+from utils.session_manager import SessionManager
+
+# Set-Cookie / document.cookie 的解析，只推送变化的 cookies，删除的 cookies 同步删除
+# （浏览器事件的接入需要 playwright 浏览器，这里直接调用 CookieSync 的处理方法）
+URL_ZHIPIN = URL("https://www.zhipin.com")
+
+
+def test_parse():
+    assert parse_cookie("__zp_stoken__=abc%2B1; path=/; domain=.zhipin.com", "www.zhipin.com") == \
+        ("__zp_stoken__", "abc%2B1", "zhipin.com")
+    assert parse_cookie("wt2=x=y; Max-Age=0", "www.zhipin.com") == ("wt2", None, "www.zhipin.com")
+    assert parse_cookie("a=; expires=Thu, 01 Jan 1970 00:00:00 GMT", "h") == ("a", None, "h")
+    assert parse_cookie("a=1; expires=Thu, 01 Jan 2099 00:00:00 GMT; HttpOnly", "h") == ("a", "1", "h")
+    assert parse_cookie("invalid", "h") is None
+
+
+def jar(session):
+    return {name: morsel.value for name, morsel in session.cookie_jar.filter_cookies(URL_ZHIPIN).items()}
+
+
+async def main():
+    test_parse()
+    sync = CookieSync()
+    # 登录后读取的全部 cookies
+    assert sync.apply({"wt2": "W1", "__zp_stoken__": "S1", "bst": "B"}, {"User-Agent": "UA"})
+    session = await SessionManager.get_async_session()
+    assert jar(session) == {"wt2": "W1", "__zp_stoken__": "S1", "bst": "B"}
+    version = SessionManager._version
+
+    # 值没有变化、其他域名的 cookies 不推送，SessionManager 版本不变
+    assert not sync.apply_set_cookie(["wt2=W1; path=/"], "https://www.zhipin.com/wapi/zpgeek/search/joblist.json")
+    assert not sync.apply_set_cookie(["track=1; domain=.example.com"], "https://www.zhipin.com/web/geek/job")
+    assert SessionManager._version == version
+
+    # 接口响应更新 wt2，页面脚本更新 __zp_stoken__
+    assert sync.apply_set_cookie(["wt2=W2; path=/; HttpOnly"], "https://www.zhipin.com/wapi/zpgeek/search/joblist.json")
+    sync._on_document_cookie({"frame": type("Frame", (), {"url": "https://www.zhipin.com/web/geek/job"})()},
+                             "__zp_stoken__=S2; path=/; domain=.zhipin.com")
+    session = await SessionManager.get_async_session()
+    assert jar(session) == {"wt2": "W2", "__zp_stoken__": "S2", "bst": "B"}, jar(session)
+    assert session.headers["User-Agent"] == "UA"
+
+    # 删除
+    assert sync.apply_set_cookie(["bst=; Max-Age=0"], "https://www.zhipin.com/")
+    session = await SessionManager.get_async_session()
+    assert jar(session) == {"wt2": "W2", "__zp_stoken__": "S2"}, jar(session)
+    assert "bst" not in SessionManager._config["cookies"]
+    print(f"推送 {sync.updates} 次，当前 cookies: {jar(session)}")
+    await SessionManager.close()
+    print("ok")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+from utils.db_utils import DatabaseManager
+from utils.db_maintenance import compact_database
+from utils.general import export_to_xlsx
+
+# 增量导出的水位（change_seq）在归档岗位后不会回退：导出 -> 归档全部岗位 -> 新增岗位 -> 再次导出，
+# 新增的岗位都应被导出
+
+
+def save(db, job_ids, update_time):
+    db._write(db._upsert_records, [{"encryptJobId": job_id, "jobName": job_id, "updateTime": update_time}
+                                   for job_id in job_ids]).result()
+
+
+def main():
+    export_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(export_dir, "jobs.db")
+        db = DatabaseManager(db_path)
+        save(db, [f"old{i}" for i in range(5)], datetime.now() - timedelta(days=30))
+        db.close()
+        assert len(pd.read_excel(export_to_xlsx(db_path, export_dir, incremental=True))) == 5
+
+        report = compact_database(db_path, 7, os.path.join(export_dir, "archive.db"), vacuum=False)
+        assert report["archived_jobs"] == 5 and report["remaining_jobs"] == 0, report
+
+        db = DatabaseManager(db_path)
+        save(db, [f"new{i}" for i in range(3)], datetime.now())
+        db.close()
+        path = export_to_xlsx(db_path, export_dir, incremental=True)
+        assert path is not None, "归档后新增的岗位没有被增量导出"
+        df = pd.read_excel(path)
+        assert sorted(df["encryptJobId"]) == ["new0", "new1", "new2"], df
+        assert df["change_seq"].min() > 5, df["change_seq"]
+
+        # 更新已导出的岗位也会推进序号
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute('UPDATE job_details SET "jobName" = ? WHERE "encryptJobId" = ?', ("x", "new0"))
+        conn.close()
+        df = pd.read_excel(export_to_xlsx(db_path, export_dir, incremental=True))
+        assert list(df["encryptJobId"]) == ["new0"], df
+        assert export_to_xlsx(db_path, export_dir, incremental=True) is None
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
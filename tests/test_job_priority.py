@@ -0,0 +1,169 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import json
+import queue
+import tempfile
+import threading
+import yaml
+from aiohttp import web
+from utils.config_manager import ConfigManager, PriorityConfig
+from utils.job_priority import JobScorer, PriorityGate
+
+# 按列表接口信息打分，高分岗位先获取详情、先投递；达到投递上限后其余岗位不再获取详情；低分岗位推迟到 flush 时处理
+PORT = 18771
+server = {"fetched": [], "applied": [], "analysed": 0}
+
+
+async def card(request):
+    job_id = request.query["securityId"]
+    server["fetched"].append(job_id)
+    return web.json_response({"code": 0, "zpData": {"jobCard": {
+        "encryptJobId": job_id, "securityId": job_id, "encryptUserId": "U", "brandName": f"公司{job_id}",
+        "jobName": job_id, "postDescription": f"{job_id} 岗位职责", "experienceName": "3-5年",
+        "degreeName": "本科", "activeTimeDesc": "刚刚活跃"}}})
+
+
+async def add(request):
+    server["applied"].append(request.query["jobId"])
+    return web.json_response({"code": 0, "message": "ok"})
+
+
+async def chat(request):
+    server["analysed"] += 1
+    await asyncio.sleep(0.05)
+    return web.json_response({"choices": [{"message": {"content": "true"}}]})
+
+
+def make_job(job_id, salary="15-25K", online=False, scale="100-499人", skills=()):
+    return {"job_link": f"/job_detail/{job_id}.html?lid=L&securityId={job_id}", "job_name": job_id,
+            "job_salary": salary, "company_name": f"公司{job_id}",
+            "raw": {"encryptJobId": job_id, "jobName": job_id, "salaryDesc": salary, "bossOnline": online,
+                    "brandScaleName": scale, "brandIndustry": "计算机软件", "skills": list(skills)}}
+
+
+def test_scorer():
+    config = PriorityConfig(keywords=["python"], scale_weights={"10000人以上": 1.0})
+    scorer = JobScorer(config, [10, 30])
+    assert scorer.score(make_job("a", "10-10K")) == 0
+    assert scorer.score(make_job("b", "20-20K")) == 1.0
+    assert scorer.score(make_job("c", "20-20K", online=True, scale="10000人以上", skills=["Python"])) == 5.0
+    assert scorer.score({"job_link": "", "job_name": "x", "job_salary": "面议"}) == 0
+    with open(os.path.join(os.path.dirname(__file__), "joblist.json"), encoding="utf-8") as f:
+        items = json.load(f)["zpData"]["jobList"]
+    jobs = [{"job_name": i["jobName"], "job_salary": i["salaryDesc"], "raw": i} for i in items]
+    print("joblist.json:", [(job["job_name"], score) for score, job in scorer.rank(jobs)])
+
+
+async def check_gate():
+    gate = PriorityGate(1)
+    order = []
+
+    async def job(score):
+        await gate.acquire(score)
+        try:
+            await asyncio.sleep(0.01)
+            order.append(score)
+        finally:
+            gate.release()
+
+    await asyncio.gather(*(job(score) for score in [1, 5, 3, 4, 2]))
+    # 第一个岗位直接获得名额，其余按分数从高到低
+    assert order == [1, 5, 4, 3, 2], order
+    assert gate.active == 0
+
+
+def make_handler(tmp_dir, **priority):
+    root = os.path.join(os.path.dirname(__file__), '..')
+    with open(os.path.join(root, "config", "config_sample.yaml"), encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config["database"]["filename"] = os.path.join(tmp_dir, "jobs.db")
+    config["ai"].update({"provider": "openai", "api_key": "key", "model": "fake",
+                         "api_url": f"http://127.0.0.1:{PORT}/v1/chat/completions",
+                         "resume_for_ai_file": os.path.join(tmp_dir, "resume.md")})
+    config["crawler"]["rate_limit"] = {"rate": 100, "capacity": 100}
+    config["application"].update({"send_resume_image": False, "max_applications": 3})
+    config["application"]["greeting"]["enable_ai"] = False
+    config["job_check"].update({"test_mode": False, "salary_range": [10, 30], "near_dup": "off"})
+    config["job_check"]["priority"].update(enabled=True, workers=2, keywords=["python"], **priority)
+    path = os.path.join(tmp_dir, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    ConfigManager._instance = None
+    ConfigManager.load_config(path)
+    from job_handler import JobHandler
+    handler = JobHandler(queue.Queue(), queue.Queue(), threading.Event(), threading.Event())
+    handler.zhipin.base_url = f"http://127.0.0.1:{PORT}"
+    return handler
+
+
+def make_batch():
+    return [
+        make_job("low1", "10-12K"),
+        make_job("low2", "10-14K"),
+        make_job("mid", "15-25K"),
+        make_job("online", "15-25K", online=True),
+        make_job("top", "25-30K", online=True, skills=["Python"]),
+        make_job("python", "20-25K", skills=["Python"]),
+    ]
+
+
+def main():
+    test_scorer()
+    asyncio.run(check_gate())
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/wapi/zpgeek/job/card.json", card)
+    app.router.add_get("/wapi/zpgeek/friend/add.json", add)
+    app.router.add_post("/v1/chat/completions", chat)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+
+    # 投递上限 3：按分数顺序获取详情和投递，上限之后的岗位不再获取详情
+    handler = make_handler(tempfile.mkdtemp())
+    jobs = make_batch()
+    results = loop.run_until_complete(handler._process_batch(jobs))
+    print("获取详情:", server["fetched"], "投递:", server["applied"])
+    assert server["applied"] == ["top", "online", "python"], server["applied"]
+    assert server["fetched"][:3] == ["top", "online", "python"] and len(server["fetched"]) <= 5
+    skipped = sum(1 for r in results if r is None)
+    parked = sum(1 for r in results if r and r.get("parked"))
+    print(f"{len(jobs)} 个岗位：投递 {handler.applied_count}，AI请求 {server['analysed']}，暂缓 {parked}，"
+          f"未获取详情 {skipped}")
+    # 分析前预留投递名额，暂缓的岗位没有消耗 AI 请求，也不保存分析结果
+    assert server["analysed"] == 3 and handler.applying == 0, (server["analysed"], handler.applying)
+    assert all(r["analysis_result"] is None for r in results if r and r.get("parked"))
+    loop.run_until_complete(handler.async_db.save_jobs_details(jobs, [r for r in results if r], "account"))
+    # 未投递的岗位下次运行时重新处理
+    left = loop.run_until_complete(handler.async_db.filter_visited(jobs, "account"))
+    assert sorted(job["job_name"] for job in left) == ["low1", "low2", "mid"], left
+    handler.async_db.close()
+    handler.db_manager.close()
+
+    # 低于 defer_below 的岗位推迟到 flush
+    server["fetched"].clear()
+    handler = make_handler(tempfile.mkdtemp(), defer_below=1.0)
+    handler.max_applications = 0
+    handler.account_id = "account"
+    loop.run_until_complete(handler._handle_batch(make_batch()))
+    deferred = sorted(handler.deferred_jobs)
+    print("推迟:", deferred, "第一批获取详情:", server["fetched"])
+    assert deferred == ["low1", "low2"] and not set(deferred) & set(server["fetched"])
+    loop.run_until_complete(handler._flush_deferred())
+    assert server["fetched"][-2:] == ["low2", "low1"] and not handler.deferred_jobs, server["fetched"]
+    print("flush 后获取详情:", server["fetched"][-2:])
+    handler.async_db.close()
+    handler.db_manager.close()
+
+    from utils.session_manager import SessionManager
+    loop.run_until_complete(SessionManager.close())
+    loop.run_until_complete(runner.cleanup())
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
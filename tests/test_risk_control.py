@@ -0,0 +1,176 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import threading
+import time
+from collections import deque
+from aiohttp import web
+from utils.config_manager import ThrottleConfig
+from utils.risk_control import AdaptiveThrottle, classify, RATE_LIMITED, RISK_CONTROL, CAPTCHA
+from utils.zhipin_client import ZhipinClient, ZhipinRequestError, TokenBucket
+from utils.session_manager import SessionManager
+
+# 风控检测，以及触发后全局暂停、降速、逐渐恢复：模拟的接口每秒超过 LIMIT 次请求时封禁 BLOCK 秒，
+# 封禁期间的请求会延长封禁。对比不检测风控（按 rate_limit 原速率请求）和 AdaptiveThrottle 的成功请求数
+PORT = 18773
+LIMIT = 20
+BLOCK = 1.0
+DURATION = float(os.environ.get("DURATION", 10))
+WORKERS = 60
+server = {"arrivals": deque(), "blocked_until": 0.0, "blocked": 0}
+
+
+async def card(request):
+    now = time.monotonic()
+    arrivals = server["arrivals"]
+    arrivals.append(now)
+    while arrivals[0] < now - 1:
+        arrivals.popleft()
+    if now < server["blocked_until"] or len(arrivals) > LIMIT:
+        server["blocked_until"] = now + BLOCK
+        server["blocked"] += 1
+        return web.json_response({"code": 36, "message": "您的访问过于频繁，请稍后再试"})
+    return web.json_response({"code": 0, "zpData": {"jobCard": {"encryptJobId": request.query["securityId"]}}})
+
+
+async def verify(request):
+    return web.Response(text="<html><title>安全验证</title></html>", content_type="text/html")
+
+
+def test_classify():
+    assert classify(200, {"code": 0, "message": "Success"}) is None
+    assert classify(200, {"code": 17, "message": "职位已关闭"}) is None
+    assert classify(200, {"code": 36, "message": "您的访问过于频繁"}) == RATE_LIMITED
+    assert classify(200, {"code": 37, "message": "您的环境存在异常"}) == RISK_CONTROL
+    assert classify(200, {"code": 37, "message": "", "zpData": {"toUrl": "/web/common/security-check.html"}}) == CAPTCHA
+    assert classify(200, "<title>请输入验证码</title>") == CAPTCHA
+    assert classify(429, "") == RATE_LIMITED
+    assert classify(403, "Forbidden") == RISK_CONTROL
+    assert classify(200, None, "https://www.zhipin.com/web/passport/zp/verify.html?callbackUrl=x") == CAPTCHA
+    assert classify(200, None, "https://www.zhipin.com/web/geek/job?query=python&city=101010100") is None
+
+
+def test_throttle():
+    bucket = TokenBucket(rate=10, capacity=5)
+    throttle = AdaptiveThrottle(bucket, ThrottleConfig(pause=0.2, max_pause=1, decrease=0.5, increase=1,
+                                                       ramp_interval=0.1, ceiling_ratio=0.9, ceiling_ttl=60))
+    throttle.trip(RATE_LIMITED, "job_card")
+    assert throttle.paused and bucket.rate == 5 and bucket.tokens == 0
+    # 暂停前已经发出的请求不重复降速
+    throttle.trip(RATE_LIMITED, "job_card")
+    assert bucket.rate == 5 and throttle.trips[RATE_LIMITED] == 2
+    start = time.monotonic()
+    asyncio.run(throttle.wait())
+    assert time.monotonic() - start > 0.15
+    # 暂停结束后每 ramp_interval 增加 increase，最多恢复到触发时速率的 0.9 倍
+    for _ in range(8):
+        time.sleep(0.11)
+        throttle.record_success()
+    assert bucket.rate == 9, bucket.rate
+    # 连续触发时暂停时间加倍
+    throttle.trip(RISK_CONTROL, "friend_add")
+    throttle.paused_until = 0
+    throttle.trip(RISK_CONTROL, "friend_add")
+    assert throttle.strikes == 2 and throttle.paused_until - time.monotonic() > 0.3
+    print("throttle:", throttle.stats())
+
+
+def test_bucket_threads():
+    """其他线程调整速率时，事件循环中获取令牌不会出现负数令牌"""
+    bucket = TokenBucket(rate=10000, capacity=5)
+    stop = threading.Event()
+
+    def adjust():
+        while not stop.is_set():
+            bucket.set_rate(5000, drain=True)
+            time.sleep(0.005)
+            bucket.set_rate(10000)
+            time.sleep(0.005)
+
+    async def consume():
+        for _ in range(1000):
+            await bucket.get_token()
+            assert bucket.tokens >= 0, bucket.tokens
+
+    thread = threading.Thread(target=adjust)
+    thread.start()
+    try:
+        asyncio.run(consume())
+    finally:
+        stop.set()
+        thread.join()
+
+
+async def run_load(base_url, throttle_config):
+    bucket = TokenBucket(rate=50, capacity=5)
+    throttle = AdaptiveThrottle(bucket, throttle_config) if throttle_config else None
+    client = ZhipinClient(base_url=base_url, buckets={"crawler": bucket}, throttle=throttle)
+    server.update(arrivals=deque(), blocked_until=0.0, blocked=0)
+    ok = []
+    deadline = time.monotonic() + DURATION
+
+    async def worker(n):
+        i = 0
+        while time.monotonic() < deadline:
+            i += 1
+            try:
+                await client.get_job_info(f"{n}-{i}", "L")
+                ok.append(time.monotonic())
+            except ZhipinRequestError:
+                pass
+
+    await asyncio.gather(*(worker(n) for n in range(WORKERS)))
+    # 最后一半时间的成功速率
+    steady = sum(1 for t in ok if t > deadline - DURATION / 2) / (DURATION / 2)
+    name = "AdaptiveThrottle" if throttle else "不检测风控"
+    print(f"{name}: {DURATION:.0f} 秒成功 {len(ok)} 次，后半段 {steady:.1f} 次/秒，被封禁请求 {server['blocked']}"
+          + (f"，{throttle.stats()}" if throttle else ""))
+    return len(ok), steady
+
+
+async def check_client(base_url):
+    # 非 JSON 的验证页面
+    bucket = TokenBucket(rate=10, capacity=5)
+    throttle = AdaptiveThrottle(bucket, ThrottleConfig(captcha_pause=0.3))
+    client = ZhipinClient(base_url=base_url, throttle=throttle)
+    client.base_url = f"{base_url}/html"
+    try:
+        await client.get_wt2()
+        raise AssertionError("应抛出 ZhipinRequestError")
+    except ZhipinRequestError:
+        assert throttle.trips[CAPTCHA] >= 1
+    print("验证页面:", throttle.stats())
+
+    baseline, _ = await run_load(base_url, None)
+    config = ThrottleConfig(pause=0.5, max_pause=4, decrease=0.5, min_rate=1, increase=2, ramp_interval=0.5,
+                            ceiling_ratio=0.9, ceiling_ttl=3)
+    adaptive, steady = await run_load(base_url, config)
+    assert adaptive > baseline * 2, (adaptive, baseline)
+    assert steady > LIMIT * 0.5, steady
+    await SessionManager.close()
+
+
+def main():
+    test_classify()
+    test_throttle()
+    test_bucket_threads()
+    base_url = f"http://127.0.0.1:{PORT}"
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/wapi/zpgeek/job/card.json", card)
+    app.router.add_get("/html/wapi/zppassport/get/wt", verify)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run(check_client(base_url))
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
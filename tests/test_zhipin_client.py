@@ -0,0 +1,139 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import asyncio
+import tempfile
+import threading
+import time
+import aiohttp
+from aiohttp import web
+from utils.zhipin_client import ZhipinClient, ZhipinError, ZhipinRequestError, TokenBucket, close_sync
+from utils.session_manager import SessionManager
+import utils.general as general
+
+# 重试、错误模型、连接复用、同步调用（ws_client）和各接口耗时统计
+PORT = 18772
+server = {"card": 0, "add": 0, "peers": set(), "upload": None}
+
+
+async def track(request):
+    server["peers"].add(request.transport.get_extra_info("peername"))
+
+
+async def card(request):
+    await track(request)
+    server["card"] += 1
+    if request.query["securityId"] == "flaky" and server["card"] <= 2:
+        return web.Response(status=503)
+    if request.query["securityId"] == "gone":
+        return web.json_response({"code": 17, "message": "职位已关闭"})
+    return web.json_response({"code": 0, "zpData": {"jobCard": {"encryptJobId": request.query["securityId"]}}})
+
+
+async def add(request):
+    await track(request)
+    server["add"] += 1
+    return web.Response(status=503)
+
+
+async def wt(request):
+    await track(request)
+    return web.json_response({"code": 0, "zpData": {"wt2": "WT2"}})
+
+
+async def quick(request):
+    return web.json_response({"code": 0, "zpData": {}})
+
+
+async def upload(request):
+    form = await request.post()
+    server["upload"] = (form["securityId"], form["file"].filename, len(form["file"].file.read()))
+    return web.json_response({"code": 0, "zpData": {"url": "u", "tinyUrl": "t", "metadata": {"width": 400, "height": 300}}})
+
+
+async def bench_sessions(base_url, n=200):
+    """每次请求新建 ClientSession（原 get_boss_list 等接口的写法）与共用连接池的对比"""
+    start = time.perf_counter()
+    for _ in range(n):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{base_url}/wapi/zppassport/get/wt") as response:
+                await response.json()
+    per_call = time.perf_counter() - start
+    peers = len(server["peers"])
+    client = ZhipinClient(base_url=base_url)
+    start = time.perf_counter()
+    for _ in range(n):
+        await client.get_wt2()
+    pooled = time.perf_counter() - start
+    print(f"{n} 次请求：每次新建 session {per_call * 1000 / n:.2f} ms/次（{peers} 个连接），"
+          f"共用连接池 {pooled * 1000 / n:.2f} ms/次（{len(server['peers']) - peers} 个连接）")
+    assert len(server["peers"]) - peers <= 2
+
+
+async def check_client(base_url):
+    client = ZhipinClient(base_url=base_url, buckets={"crawler": TokenBucket(rate=100, capacity=100)})
+    # 幂等接口：503 重试后成功
+    result = await client.get_job_info("flaky", "L")
+    assert result["zpData"]["jobCard"]["encryptJobId"] == "flaky" and server["card"] == 3
+    # code 不为 0
+    try:
+        await client.get_job_info("gone", "L")
+        raise AssertionError("应抛出 ZhipinError")
+    except ZhipinError as e:
+        assert e.code == 17
+    # 非幂等接口：HTTP 错误不重试
+    try:
+        await client.start_chat("S", "J", "L")
+        raise AssertionError("应抛出 ZhipinRequestError")
+    except ZhipinRequestError:
+        assert server["add"] == 1
+    # 图片上传：快速上传没有结果时完整上传
+    path = os.path.join(tempfile.mkdtemp(), "resume.png")
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG" + b"0" * 1000)
+    image = await client.upload_image(path, "S", "md5")
+    assert image["tinyImage"]["height"] == 150 and server["upload"] == ("S", "resume.png", 1004)
+    print(client.format_stats())
+    await bench_sessions(base_url)
+    await SessionManager.close()
+
+
+def main():
+    base_url = f"http://127.0.0.1:{PORT}"
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get("/wapi/zpgeek/job/card.json", card)
+    app.router.add_get("/wapi/zpgeek/friend/add.json", add)
+    app.router.add_get("/wapi/zppassport/get/wt", wt)
+    app.router.add_post("/wapi/zpupload/quicklyUpload", quick)
+    app.router.add_post("/wapi/zpupload/image/uploadSingle", upload)
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", PORT).start())
+    server_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    server_thread.start()
+
+    asyncio.run(check_client(base_url))
+
+    # ws_client 线程中的同步调用：在后台事件循环中使用共享客户端
+    ZhipinClient.get_instance().base_url = base_url
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(general.get_wt2())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["WT2"] * 4, results
+    print("同步调用:", results)
+    # 关闭后台事件循环的 session，之后再次调用时重新创建
+    close_sync()
+    assert general.get_wt2() == "WT2"
+    close_sync()
+    loop.call_soon_threadsafe(loop.stop)
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
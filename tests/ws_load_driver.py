@@ -0,0 +1,172 @@
+import sys
+import os
+# 将父目录添加到模块搜索路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import secrets
+import statistics
+import threading
+import time
+import paho.mqtt.client as mqtt
+from src.ws_client.mock_broker import MockBroker, load_capture_frames, DEFAULT_PUBACK_PADDING
+from src.ws_client.message_factory import MessageFactory
+
+'''
+WsClient 压测脚本：基于本地 MockBroker 测量
+  * 持续发布速率（qos1，收到 PUBACK 才算成功）
+  * PUBACK 延迟分布
+  * 服务端断开后的重连恢复时间
+也可通过 --host/--port 指向单独启动的 python -m ws_client.mock_broker
+'''
+
+
+def paho_patched():
+    """检查是否已运行 patch.py"""
+    with open(mqtt.__file__, "r", encoding="utf-8") as f:
+        return "strict_patch_applied" in f.read()
+
+
+class LoadDriver:
+    def __init__(self, host, port, path, max_inflight):
+        self.connected = threading.Event()
+        self.disconnected_at = None
+        self.reconnect_times = []
+        self.ack_times = {}
+        self.latencies = []
+        self.acked = threading.Semaphore(0)
+        self.received = 0
+        self.client = mqtt.Client(
+            client_id=f"ws-{secrets.token_hex(8).upper()}",
+            protocol=4,
+            transport='websockets',
+            clean_session=True
+        )
+        self.client.ws_set_options(path=path, headers={"Sec-WebSocket-Protocol": "wt2-load-test"})
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.max_queued_messages_set(0)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=4)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_message = self._on_message
+        self.host = host
+        self.port = port
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            print(f"连接失败 rc={rc}")
+            return
+        client.subscribe("chat")
+        if self.disconnected_at is not None:
+            self.reconnect_times.append(time.perf_counter() - self.disconnected_at)
+            self.disconnected_at = None
+        self.connected.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+        self.disconnected_at = time.perf_counter()
+
+    def _on_publish(self, client, userdata, mid):
+        # 回调在 paho 内部锁中执行，这里只记录时间，不加锁
+        self.ack_times[mid] = time.perf_counter()
+        self.acked.release()
+
+    def _on_message(self, client, userdata, msg):
+        self.received += 1
+
+    def start(self):
+        self.client.connect(self.host, self.port, keepalive=5)
+        self.client.loop_start()
+        if not self.connected.wait(10):
+            raise RuntimeError("连接 MockBroker 超时")
+
+    def stop(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+    def publish_burst(self, count):
+        """mid 在 65535 后回绕，count 需小于该值"""
+        factory = MessageFactory()
+        send_times = {}
+        self.ack_times.clear()
+        start = time.perf_counter()
+        for i in range(count):
+            payload = factory.encode_text("load-test-boss", f"压测消息 {i}")
+            sent = time.perf_counter()
+            info = self.client.publish("chat", payload, qos=1)
+            send_times[info.mid] = sent
+        for _ in range(count):
+            if not self.acked.acquire(timeout=30):
+                print("等待 PUBACK 超时")
+                break
+        elapsed = time.perf_counter() - start
+        self.latencies = [self.ack_times[mid] - sent for mid, sent in send_times.items() if mid in self.ack_times]
+        return elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WsClient 本地压测")
+    parser.add_argument("--host", help="外部 broker 地址，不填则在进程内启动 MockBroker")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--path", default="/chatws")
+    parser.add_argument("--messages", type=int, default=5000, help="单轮发布条数（<65535）")
+    parser.add_argument("--max-inflight", type=int, default=100)
+    parser.add_argument("--reconnects", type=int, default=3)
+    parser.add_argument("--replay", help="回放的抓包日志")
+    args = parser.parse_args()
+
+    broker = None
+    host, port = args.host, args.port
+    if host is None:
+        padding = DEFAULT_PUBACK_PADDING
+        if not paho_patched():
+            print("未检测到 patch.py 补丁，MockBroker 改用标准长度的 PUBACK")
+            padding = b""
+        frames = load_capture_frames(args.replay) if args.replay else []
+        broker = MockBroker(port=args.port, path=args.path, puback_padding=padding,
+                            replay_frames=frames, replay_interval=0.01).start_in_thread()
+        host, port = broker.host, broker.port
+
+    driver = LoadDriver(host, port, args.path, args.max_inflight)
+    driver.start()
+
+    elapsed = driver.publish_burst(args.messages)
+    print(f"发布 {args.messages} 条消息，用时 {elapsed:.2f}s，速率 {args.messages / elapsed:,.0f} msg/s")
+    latencies_ms = [x * 1000 for x in driver.latencies]
+    if latencies_ms:
+        print(f"PUBACK 延迟(ms): mean={statistics.mean(latencies_ms):.2f} "
+              f"p50={percentile(latencies_ms, 50):.2f} p95={percentile(latencies_ms, 95):.2f} "
+              f"p99={percentile(latencies_ms, 99):.2f} max={max(latencies_ms):.2f}")
+
+    if broker is not None:
+        # 先等待回放帧全部推送完成
+        deadline = time.time() + 30
+        while broker.stats["replayed"] < len(broker.replay_frames) and time.time() < deadline:
+            time.sleep(0.05)
+        for i in range(args.reconnects):
+            broker.kick_all_threadsafe()
+            # 等待客户端感知断开并重连
+            deadline = time.time() + 30
+            while len(driver.reconnect_times) <= i and time.time() < deadline:
+                time.sleep(0.05)
+        if driver.reconnect_times:
+            print(f"重连恢复时间(s): {', '.join(f'{x:.2f}' for x in driver.reconnect_times)}")
+        if args.replay:
+            print(f"回放帧: 发送 {broker.stats['replayed']}，客户端接收 {driver.received}")
+        print(f"MockBroker 统计: {broker.stats}")
+
+    driver.stop()
+    if broker is not None:
+        broker.stop_threadsafe()
+
+
+if __name__ == '__main__':
+    main()